@@ -6,16 +6,22 @@ from pathlib import Path
 parent_dir = Path(__file__).resolve().parent.parent
 sys.path.append(str(parent_dir))
 
-# Import the FastAPI app
+# Import the FastAPI app. The slim entry point defers heavy imports and serves
+# from a prebuilt bundle (see artifact_bundle.py); API_ENTRYPOINT=full runs the
+# complete recommendation_service instead.
 try:
-    from recommendation_service import app
+    if os.getenv('API_ENTRYPOINT', 'slim') == 'full':
+        from recommendation_service import app
+    else:
+        from slim_service import app
 except ImportError as e:
+    import_error = str(e)
     from fastapi import FastAPI
     app = FastAPI()
     
     @app.get("/health")
     async def health_check():
-        return {"status": "error", "message": f"Failed to import app: {str(e)}"}
+        return {"status": "error", "message": f"Failed to import app: {import_error}"}
 
 # Vercel serverless function handler
 from fastapi.middleware.cors import CORSMiddleware
@@ -0,0 +1,242 @@
+"""
+Prebuilt, memory-mapped catalog bundle for the slim serving entry point
+
+A bundle is a directory holding everything retrieval needs at request time:
+
+    manifest.json          row count, column layout, embedding model info
+    embeddings.npy         L2-normalised float32 product embeddings
+    price.npy, rating.npy  parsed numeric columns (NaN where unparseable)
+    popularity.npy         scoring.popularity_scores of the rating counts
+    flags.npy              scoring.attribute_flags bitmasks (eco-friendly, handmade, local)
+    <col>.codes.npy        categorical codes for the category columns
+    col_<col>.offsets.npy  string arena offsets for every CSV column
+    col_<col>.utf8         string arena bytes for every CSV column
+    variants.json          listings collapsed into each row, when built with --dedup
+    encoder/               the ONNX query encoder (see query_encoder.py)
+
+Everything is opened with mmap, so loading a bundle costs a few page-table
+entries rather than a CSV parse and a catalog-wide embedding pass. Only numpy
+is needed to read a bundle; building one needs pandas and an encoder.
+
+    python artifact_bundle.py build --csv products.csv --output artifacts/bundle
+"""
+
+import os
+import json
+import shutil
+from datetime import datetime
+from typing import Dict, List
+
+BUNDLE_DIR = os.getenv('BUNDLE_DIR', 'artifacts/bundle')
+CATEGORY_COLUMNS = ['main_category', 'sub_category']
+MANIFEST_FILE = 'manifest.json'
+VARIANTS_FILE = 'variants.json'
+BUNDLE_VERSION = 2
+
+class StringArena:
+    """Packed UTF-8 strings addressed by an offsets array; empty means missing"""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def get(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return bytes(self.data[start:end]).decode('utf-8')
+
+    def take(self, indices) -> List[str]:
+        return [self.get(i) for i in indices]
+
+    @staticmethod
+    def pack(values) -> tuple:
+        """Return (offsets, data) numpy arrays for an iterable of str-or-None"""
+        import numpy as np
+
+        encoded = [b'' if value is None else str(value).encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+    def save(self, directory: str, name: str):
+        import numpy as np
+
+        np.save(os.path.join(directory, f"{name}.offsets.npy"), self.offsets)
+        with open(os.path.join(directory, f"{name}.utf8"), 'wb') as f:
+            f.write(bytes(self.data))
+
+    @classmethod
+    def open(cls, directory: str, name: str) -> 'StringArena':
+        import numpy as np
+
+        offsets = np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode='r')
+        data_path = os.path.join(directory, f"{name}.utf8")
+        if os.path.getsize(data_path) == 0:
+            data = np.zeros(0, dtype=np.uint8)
+        else:
+            data = np.memmap(data_path, dtype=np.uint8, mode='r')
+        return cls(offsets, data)
+
+class ArtifactBundle:
+    """Read-only view over a bundle directory"""
+
+    def __init__(self, directory: str):
+        import numpy as np
+
+        with open(os.path.join(directory, MANIFEST_FILE), encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported bundle version {self.manifest.get('version')} in {directory}; "
+                             f"rebuild it with artifact_bundle.py build")
+
+        self.directory = directory
+        self.columns: List[str] = self.manifest['columns']
+        self.embeddings = np.load(os.path.join(directory, 'embeddings.npy'), mmap_mode='r')
+        self.prices = np.load(os.path.join(directory, 'price.npy'), mmap_mode='r')
+        self.ratings = np.load(os.path.join(directory, 'rating.npy'), mmap_mode='r')
+        self.popularity = np.load(os.path.join(directory, 'popularity.npy'), mmap_mode='r')
+        self.flags = np.load(os.path.join(directory, 'flags.npy'), mmap_mode='r')
+        self.category_codes = {
+            col: np.load(os.path.join(directory, f"{col}.codes.npy"), mmap_mode='r')
+            for col in self.manifest['categories']
+        }
+        self.arenas = {col: StringArena.open(directory, _column_file(col)) for col in self.columns}
+        self._variants = None
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    @property
+    def encoder_dir(self) -> str:
+        return os.path.join(self.directory, 'encoder')
+
+    @property
+    def variants(self) -> Dict[int, List[Dict[str, str]]]:
+        """Row -> listings collapsed into it at build time; read on first use, empty without dedup"""
+        if self._variants is None:
+            self._variants = {}
+            if self.manifest.get('variants'):
+                with open(os.path.join(self.directory, self.manifest['variants']), encoding='utf-8') as f:
+                    self._variants = {int(row): listings for row, listings in json.load(f).items()}
+        return self._variants
+
+    def category_codes_matching(self, column: str, needle: str) -> List[int]:
+        """Codes whose category label contains needle (case-insensitive)"""
+        needle = needle.lower()
+        return [code for code, label in enumerate(self.manifest['categories'][column]) if needle in label.lower()]
+
+    def rows(self, indices) -> List[Dict[str, str]]:
+        """Hydrate the given rows as {column: value} dicts, skipping missing values"""
+        values = {col: self.arenas[col].take(indices) for col in self.columns}
+        return [
+            {col: values[col][n] for col in self.columns if values[col][n]}
+            for n in range(len(indices))
+        ]
+
+    def describe(self, indices) -> str:
+        """Product list text in the same "col: value, ..." format the service sends to the LLM"""
+        return '\n'.join(
+            ', '.join(f"{col}: {value}" for col, value in row.items())
+            for row in self.rows(indices)
+        )
+
+def _column_file(column: str) -> str:
+    return 'col_' + ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in column)
+
+def load_bundle(directory: str = BUNDLE_DIR) -> ArtifactBundle:
+    return ArtifactBundle(directory)
+
+def build_bundle(csv_path: str, output_dir: str = BUNDLE_DIR, encoder_dir: str = None, backend: str = None, skiprows: int = 3,
+                 dedup: bool = False):
+    """Parse the catalog, embed it once and write a bundle directory
+
+    With dedup, near-duplicate listings are collapsed first (dedup.py) and
+    only their representatives are embedded and written; the collapsed
+    listings go to VARIANTS_FILE, keyed by representative row.
+    """
+    import numpy as np
+    import pandas as pd
+    from catalog import (assign_product_ids, get_product_texts, parse_prices, parse_rating_counts, parse_ratings,
+                         read_products_csv)
+    from scoring import attribute_flags, popularity_scores
+    from query_encoder import EMBEDDING_MODEL_NAME, ONNX_MODEL_DIR, load_query_encoder
+
+    products_df = read_products_csv(csv_path, skiprows=skiprows).reset_index(drop=True)
+    print(f"Loaded {len(products_df)} products.")
+    dedup_stats, variants_file = None, None
+    os.makedirs(output_dir, exist_ok=True)
+    if dedup:
+        from dedup import collapse_duplicates
+        dedup_result = collapse_duplicates(products_df, product_ids=assign_product_ids(products_df))
+        products_df, dedup_stats = dedup_result.products_df, dedup_result.stats()
+        print(f"Collapsed duplicates: {dedup_stats}")
+        variants_file = VARIANTS_FILE
+        with open(os.path.join(output_dir, variants_file), 'w', encoding='utf-8') as f:
+            json.dump({str(row): listings for row, listings in dedup_result.variants.items()}, f)
+
+    print("Computing product embeddings...")
+    encoder = load_query_encoder(backend)
+    embeddings = np.asarray(encoder.encode(get_product_texts(products_df), show_progress_bar=True, batch_size=256), dtype=np.float32)
+    embeddings /= np.clip(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12, None)
+    np.save(os.path.join(output_dir, 'embeddings.npy'), embeddings)
+
+    np.save(os.path.join(output_dir, 'price.npy'), parse_prices(products_df))
+    np.save(os.path.join(output_dir, 'rating.npy'), parse_ratings(products_df))
+    np.save(os.path.join(output_dir, 'popularity.npy'), popularity_scores(parse_rating_counts(products_df)))
+    np.save(os.path.join(output_dir, 'flags.npy'), attribute_flags(products_df))
+
+    categories = {}
+    for col in CATEGORY_COLUMNS:
+        if col in products_df.columns:
+            labels = products_df[col].fillna('').astype(str).astype('category')
+            categories[col] = list(labels.cat.categories)
+            np.save(os.path.join(output_dir, f"{col}.codes.npy"), labels.cat.codes.to_numpy().astype(np.int32))
+
+    columns = [str(col) for col in products_df.columns]
+    for col in columns:
+        values = [None if pd.isnull(value) else value for value in products_df[col].tolist()]
+        StringArena(*StringArena.pack(values)).save(output_dir, _column_file(col))
+
+    encoder_source = encoder_dir or ONNX_MODEL_DIR
+    if os.path.isdir(encoder_source):
+        shutil.copytree(encoder_source, os.path.join(output_dir, 'encoder'), dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns('model.onnx'))
+    else:
+        print(f"Warning: no ONNX encoder at {encoder_source}; the slim service will need ONNX_MODEL_DIR")
+
+    manifest = {
+        "version": BUNDLE_VERSION,
+        "rows": len(products_df),
+        "columns": columns,
+        "categories": categories,
+        "embedding_model": EMBEDDING_MODEL_NAME,
+        "embedding_dim": int(embeddings.shape[1]),
+        "source_csv": os.path.basename(csv_path),
+        "dedup": dedup_stats,
+        "variants": variants_file,
+        "created_at": datetime.now().isoformat(),
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Wrote bundle for {len(products_df)} products to {output_dir}")
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Build a memory-mapped catalog bundle for the slim service")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build_parser = subparsers.add_parser('build', help='Build a bundle from the catalog CSV')
+    build_parser.add_argument('--csv', type=str, default='products.csv', help='Catalog CSV')
+    build_parser.add_argument('--output', type=str, default=BUNDLE_DIR, help='Bundle directory')
+    build_parser.add_argument('--encoder-dir', type=str, default=None, help='ONNX encoder to ship with the bundle')
+    build_parser.add_argument('--backend', type=str, default=None, help='Encoder backend used to embed the catalog')
+    build_parser.add_argument('--skiprows', type=int, default=3, help='Junk lines at the top of the CSV')
+    build_parser.add_argument('--dedup', action='store_true', help='Collapse near-duplicate listings before embedding')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_bundle(args.csv, args.output, args.encoder_dir, args.backend, args.skiprows, args.dedup)
+
+if __name__ == "__main__":
+    main()
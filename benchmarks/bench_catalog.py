@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Memory and hydration cost of the compact catalog (compact_catalog.py) against
+the plain DataFrame it replaced
+
+For each catalog size and representation, in a fresh interpreter:
+  - rss_mb: process RSS once the catalog is loaded and the CSV DataFrame is
+    gone (for "compact"), after gc and malloc_trim so freed memory is not counted
+  - structure_mb: deep size of the DataFrame, or CompactCatalog.nbytes
+  - hydration latency for batches of row indices: rows as dicts (the
+    /recommend/page path) and the LLM product text (the /recommend path),
+    which the DataFrame builds with iloc + to_dict / iterrows
+
+    python benchmarks/bench_catalog.py --sizes 100000 1000000 --output catalog.json
+"""
+
+import ctypes
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from retrieval import current_rss_mb, percentiles
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+BATCH_SIZES = [20, 100, 1000]
+MODES = ['dataframe', 'compact']
+
+def release_freed_memory():
+    gc.collect()
+    try:
+        ctypes.CDLL('libc.so.6').malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+def dataframe_describe(products_df, indices) -> str:
+    """The iterrows serialisation the service used before the compact catalog"""
+    import pandas as pd
+    lines = []
+    for _, row in products_df.iloc[indices].iterrows():
+        lines.append(', '.join(f"{col}: {row[col]}" for col in products_df.columns if pd.notnull(row[col])))
+    return '\n'.join(lines)
+
+def dataframe_rows(products_df, indices):
+    import pandas as pd
+    return [{col: value for col, value in values.items() if pd.notnull(value)}
+            for values in products_df.iloc[indices].to_dict('records')]
+
+def measure(csv_path: str, mode: str, repeats: int):
+    """Runs inside the subprocess for one catalog size and representation"""
+    import numpy as np
+    from catalog import parse_prices, parse_ratings, read_products_csv
+    from compact_catalog import CompactCatalog
+
+    release_freed_memory()
+    baseline_rss = current_rss_mb()
+    start = time.perf_counter()
+    products_df = read_products_csv(csv_path).reset_index(drop=True)
+    rows = len(products_df)
+    if mode == 'compact':
+        catalog = CompactCatalog.from_dataframe(products_df, parse_prices(products_df), parse_ratings(products_df))
+        del products_df
+        structure_bytes = catalog.nbytes
+        describe, hydrate = catalog.describe, catalog.rows
+    else:
+        catalog = products_df
+        structure_bytes = int(products_df.memory_usage(deep=True).sum())
+        describe = lambda indices: dataframe_describe(catalog, indices)
+        hydrate = lambda indices: dataframe_rows(catalog, indices)
+    load_s = time.perf_counter() - start
+    release_freed_memory()
+
+    result = {
+        "rows": rows,
+        "mode": mode,
+        "load_s": round(load_s, 3),
+        "rss_mb": round(current_rss_mb() - baseline_rss, 1),
+        "structure_mb": round(structure_bytes / 2**20, 1),
+        "hydrate": {},
+    }
+    rng = np.random.default_rng(0)
+    for batch in BATCH_SIZES:
+        for name, fn in (("rows", hydrate), ("describe", describe)):
+            samples = []
+            for _ in range(repeats):
+                indices = rng.choice(rows, min(batch, rows), replace=False).tolist()
+                start = time.perf_counter()
+                fn(indices)
+                samples.append((time.perf_counter() - start) * 1000)
+            result["hydrate"][f"{name}/{batch}"] = percentiles(samples)
+    return result
+
+def run_size(rows: int, mode: str, args):
+    from synthetic_catalog import ensure_catalog
+    csv_path = os.path.abspath(ensure_catalog(args.data_dir, rows, args.seed))
+    command = [sys.executable, __file__, '--measure', csv_path, '--mode', mode, '--repeats', str(args.repeats)]
+    print(f"Benchmarking {rows} rows ({mode})...")
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=str(parent_dir))
+    if completed.returncode != 0:
+        print(completed.stderr[-2000:])
+        return {"rows": rows, "mode": mode, "error": completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the compact catalog against the DataFrame")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Catalog sizes in rows')
+    parser.add_argument('--repeats', type=int, default=50, help='Hydration calls per batch size')
+    parser.add_argument('--data-dir', type=str, default='benchmarks/data', help='Cache for generated catalogs')
+    parser.add_argument('--seed', type=int, default=42, help='Catalog generator seed')
+    parser.add_argument('--output', type=str, default=None, help='Write the JSON results here')
+    parser.add_argument('--measure', type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--mode', choices=MODES, default='compact', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.mode, args.repeats)))
+        return
+
+    results = [run_size(rows, mode, args) for rows in args.sizes for mode in MODES]
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
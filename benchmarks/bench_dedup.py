@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Effect of ingest-time duplicate collapsing (dedup.py)
+
+For each catalog size: how long clustering takes, how many rows and
+embedding bytes it removes, and the share of duplicates among each query's
+top 100 results before and after. A result is a duplicate when a listing
+of the same product ranked above it, judged independently of dedup.py's
+clusters: on the synthetic catalog by the generator's ground truth
+(adjective, noun and sub category, whatever the colour and price), on a CSV
+by name_key within main and sub category, ignoring price. Embeddings come from a hashed
+bag-of-words encoder so that listings with similar text get similar vectors
+the way they would with the real model, without loading it; pass --csv to
+run on a real catalog instead of a synthetic one.
+
+    python benchmarks/bench_dedup.py --rows 100000 --output dedup.json
+    python benchmarks/bench_dedup.py --csv sample_products.csv
+"""
+
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+DEFAULT_ROWS = [10_000, 100_000]
+TOP_N = 100
+QUERIES = [
+    "wireless headphones for my brother who loves music",
+    "yoga mat for my girlfriend who loves fitness",
+    "coffee mug set for a colleague",
+    "cookbook for someone who loves baking",
+    "smartwatch for a runner",
+    "handmade gift for my mother",
+]
+
+class HashingEncoder:
+    """Unit-normalised hashed bag of words, 384-dimensional like all-MiniLM-L6-v2"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        import numpy as np
+        from dedup import hash_token
+        vectors = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        cache = {}
+        for i, sentence in enumerate(sentences):
+            for token in re.findall(r"[0-9a-z]+", sentence.lower()):
+                bucket = cache.get(token)
+                if bucket is None:
+                    bucket = cache[token] = hash_token(token) % self.dim
+                vectors[i, bucket] += 1
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+def top_rows(embeddings, query_embs, top_n: int):
+    import numpy as np
+    sims = query_embs @ embeddings.T
+    top_n = min(top_n, embeddings.shape[0])
+    result = []
+    for row in sims:
+        top = np.argpartition(-row, top_n - 1)[:top_n]
+        result.append(top[np.argsort(-row[top], kind='stable')])
+    return result
+
+def reference_clusters(products_df, synthetic: bool):
+    """Duplicate groups to judge the results by, one integer id per row"""
+    import pandas as pd
+    from dedup import name_key
+
+    names = products_df['name'].fillna('').astype(str)
+    if synthetic:
+        # Generated names are "<adjective> <noun> - <colour>"
+        keys = names.str.rsplit(' - ', n=1).str[0]
+    else:
+        keys = names.map(name_key)
+    categories = products_df['main_category'].fillna('').astype(str) + '|' + products_df['sub_category'].fillna('').astype(str)
+    codes, _ = pd.factorize(categories + '|' + keys)
+    return codes
+
+def run(products_df, label, max_hamming: int, synthetic: bool = False):
+    import numpy as np
+    from catalog import get_product_texts
+    from dedup import collapse_duplicates, duplicate_share
+
+    encoder = HashingEncoder()
+    query_embs = encoder.encode(QUERIES)
+
+    start = time.perf_counter()
+    embeddings = encoder.encode(get_product_texts(products_df))
+    encode_before_s = time.perf_counter() - start
+
+    dedup_result = collapse_duplicates(products_df, max_hamming)
+    # Not dedup_result.clusters: every cluster keeps one row, so the share after would be 0 by construction
+    clusters = reference_clusters(products_df, synthetic)
+
+    start = time.perf_counter()
+    deduped_embeddings = encoder.encode(get_product_texts(dedup_result.products_df))
+    encode_after_s = time.perf_counter() - start
+
+    before = [duplicate_share(rows.tolist(), clusters) for rows in top_rows(embeddings, query_embs, TOP_N)]
+    # Deduplicated rows map back to the original catalog through keep
+    after = [duplicate_share(dedup_result.keep[rows].tolist(), clusters)
+             for rows in top_rows(deduped_embeddings, query_embs, TOP_N)]
+
+    return {
+        "catalog": label,
+        **dedup_result.stats(),
+        "embeddings_mb_before": round(embeddings.nbytes / 2**20, 1),
+        "embeddings_mb_after": round(deduped_embeddings.nbytes / 2**20, 1),
+        "encode_s_before": round(encode_before_s, 3),
+        "encode_s_after": round(encode_after_s, 3),
+        f"top{TOP_N}_duplicate_share_before": round(float(np.mean(before)), 4),
+        f"top{TOP_N}_duplicate_share_after": round(float(np.mean(after)), 4),
+    }
+
+def main():
+    import argparse
+    import pandas as pd
+    from catalog import read_products_csv
+    from dedup import DEDUP_MAX_HAMMING
+    from synthetic_catalog import HEADER, generate_rows
+
+    parser = argparse.ArgumentParser(description="Benchmark ingest-time duplicate collapsing")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='Synthetic catalog sizes')
+    parser.add_argument('--csv', type=str, default=None, help='Benchmark this catalog CSV instead')
+    parser.add_argument('--max-hamming', type=int, default=DEDUP_MAX_HAMMING, help='SimHash distance threshold (0 disables)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=str, default=None, help='Write the JSON results here')
+    args = parser.parse_args()
+
+    if args.csv:
+        results = [run(read_products_csv(args.csv), args.csv, args.max_hamming)]
+    else:
+        results = [run(pd.DataFrame(generate_rows(rows, args.seed), columns=HEADER), f"synthetic_{rows}", args.max_hamming,
+                       synthetic=True)
+                   for rows in args.rows]
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Cost of the multi-signal scoring stage (scoring.py)
+
+Per request, CandidateScorer.rank runs over the similarity pool; this times
+it for several pool sizes and signal mixes against a synthetic catalog.
+Load-time cost (attribute keyword flags, popularity) is reported once per
+catalog size, since it is paid at startup rather than per request.
+
+    python benchmarks/bench_scoring.py --rows 100000 1000000 --output scoring.json
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+DEFAULT_ROWS = [100_000, 1_000_000]
+POOL_SIZES = [100, 500, 2500]
+CASES = {
+    "similarity_only": ({"budget": 0, "rating": 0, "popularity": 0, "attributes": 0}, {}, {}),
+    "all_signals": ({}, {"budget_range": {"min": 500, "max": 2000}}, {"eco_friendly": True, "handmade": True}),
+    "sort_by_price": ({}, {"budget_range": {"max": 2000}}, {"sort_by": "price"}),
+    "sort_by_rating": ({}, {}, {"sort_by": "rating", "local": True}),
+}
+
+def percentiles(samples_ms):
+    import numpy as np
+    samples = np.array(samples_ms)
+    return {
+        "mean_us": round(float(samples.mean()) * 1000, 1),
+        "p50_us": round(float(np.percentile(samples, 50)) * 1000, 1),
+        "p95_us": round(float(np.percentile(samples, 95)) * 1000, 1),
+    }
+
+def run(rows: int, repeats: int, seed: int):
+    import numpy as np
+    import pandas as pd
+    from catalog import parse_prices, parse_rating_counts, parse_ratings
+    from schemas import FilterOptions, OccasionInfo
+    from scoring import CandidateScorer, attribute_flags, popularity_scores
+    from synthetic_catalog import HEADER, generate_rows
+
+    products_df = pd.DataFrame(generate_rows(rows, seed), columns=HEADER)
+    rng = np.random.default_rng(seed)
+
+    start = time.perf_counter()
+    prices, ratings = parse_prices(products_df), parse_ratings(products_df)
+    flags = attribute_flags(products_df)
+    popularity = popularity_scores(parse_rating_counts(products_df))
+    load_s = time.perf_counter() - start
+
+    result = {"rows": rows, "load_signals_s": round(load_s, 3),
+              "flagged_share": round(float((flags > 0).mean()), 3), "rank": {}}
+    for pool in POOL_SIZES:
+        for case, (weights, occasion, options) in CASES.items():
+            scorer = CandidateScorer(prices, ratings, popularity, flags, weights)
+            occasion_info = OccasionInfo(occasion="birthday", **occasion)
+            filter_options = FilterOptions(**options)
+            samples = []
+            for _ in range(repeats):
+                candidates = rng.choice(rows, pool, replace=False)
+                sims = rng.random(pool, dtype=np.float32)
+                start = time.perf_counter()
+                scorer.rank(candidates, sims, occasion_info, filter_options, top_n=100)
+                samples.append((time.perf_counter() - start) * 1000)
+            result["rank"][f"pool_{pool}/{case}"] = percentiles(samples)
+    return result
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the candidate scoring stage")
+    parser.add_argument('--rows', type=int, nargs='+', default=DEFAULT_ROWS, help='Catalog sizes')
+    parser.add_argument('--repeats', type=int, default=200, help='rank() calls per case')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=str, default=None, help='Write the JSON results here')
+    args = parser.parse_args()
+
+    results = [run(rows, args.repeats, args.seed) for rows in args.rows]
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Cold-start comparison: full recommendation_service vs the slim bundle entry point
+
+Each entry point runs in a fresh interpreter, the way a serverless worker
+starts. Reported per entry point:
+  - import_s:      time to import the app module
+  - ready_s:       time from import until retrieval is usable
+  - first_query_s: latency of the first retrieval call
+  - process_s:     wall time of the whole subprocess, interpreter start included
+  - peak_rss_mb:   peak resident set size
+  - heavy_modules: which of torch / pandas / sklearn / sentence_transformers got imported
+
+    python benchmarks/cold_start.py --csv products.csv --bundle artifacts/bundle
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+QUERY = "Birthday gift for my 25-year-old girlfriend who loves fitness and yoga"
+HEAVY_MODULES = ['torch', 'pandas', 'sklearn', 'sentence_transformers']
+
+def measure(entry, csv_path):
+    """Runs inside the subprocess"""
+    start = time.perf_counter()
+    if entry == 'full':
+        import recommendation_service as service
+    else:
+        import slim_service as service
+    import_s = time.perf_counter() - start
+
+    from schemas import FilterOptions, OccasionInfo, RecipientProfile
+
+    start = time.perf_counter()
+    if entry == 'full':
+        service.CSV_PATH = csv_path
+        service.load_products()
+    else:
+        service.get_engine()
+    ready_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if entry == 'full':
+        service.find_top_products(QUERY, RecipientProfile(), OccasionInfo(occasion="birthday"), FilterOptions())
+    else:
+        service.get_engine().top_products(QUERY, FilterOptions())
+    first_query_s = time.perf_counter() - start
+
+    return {
+        "entry": entry,
+        "import_s": round(import_s, 3),
+        "ready_s": round(ready_s, 3),
+        "first_query_s": round(first_query_s, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+
+def run_subprocess(entry, csv_path, bundle_dir):
+    env = dict(os.environ)
+    env.setdefault('OPENROUTER_API_KEY', 'benchmark')
+    env['BUNDLE_DIR'] = bundle_dir
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, __file__, '--measure', entry, '--csv', csv_path],
+        capture_output=True, text=True, check=True, cwd=str(parent_dir), env=env,
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["process_s"] = round(time.perf_counter() - start, 3)
+    return result
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Measure cold-start and import time of the API entry points")
+    parser.add_argument('--csv', type=str, default='products.csv', help='Catalog CSV for the full service')
+    parser.add_argument('--bundle', type=str, default='artifacts/bundle', help='Bundle directory for the slim service')
+    parser.add_argument('--runs', type=int, default=3, help='Cold starts per entry point')
+    parser.add_argument('--output', type=str, default=None, help='Write the JSON report here')
+    parser.add_argument('--measure', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.csv)))
+        return
+
+    report = {
+        entry: [run_subprocess(entry, os.path.abspath(args.csv), os.path.abspath(args.bundle)) for _ in range(args.runs)]
+        for entry in ('full', 'slim')
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Parity, latency and memory check for the ONNX query encoder
+
+Compares the int8 ONNX backend against the reference SentenceTransformer:
+cosine agreement of the vectors, per-query encode latency, import/load time
+and peak RSS. Each backend is measured in a fresh subprocess so that the
+memory numbers are not polluted by the other runtime.
+
+    python benchmarks/encoder_parity.py --csv sample_products.csv
+"""
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+
+QUERIES = [
+    "I need a gift for my tech-savvy brother who loves gaming",
+    "Birthday gift for my 25-year-old girlfriend who loves fitness and yoga",
+    "Affordable gift under 1000 rupees for my colleague who drinks a lot of coffee",
+    "Gift for someone who loves reading cooking books and trying new recipes",
+    "Stylish accessory for my fashion-conscious sister",
+]
+
+def load_texts(csv_path):
+    """Example queries plus product texts from the catalog"""
+    texts = list(QUERIES)
+    if csv_path and os.path.exists(csv_path):
+        import pandas as pd
+        df = pd.read_csv(csv_path, on_bad_lines='skip', low_memory=False, skiprows=3)
+        columns = [col for col in ['name', 'main_category', 'sub_category', 'description'] if col in df.columns]
+        texts += [' | '.join(str(v) for v in row if pd.notnull(v)) for row in df[columns].itertuples(index=False)]
+    return texts
+
+def measure_backend(backend, repeats):
+    """Runs inside the subprocess: time import, load and single-query encodes"""
+    start = time.perf_counter()
+    from query_encoder import load_query_encoder
+    import numpy as np
+    import_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    encoder = load_query_encoder(backend)
+    load_s = time.perf_counter() - start
+
+    encoder.encode([QUERIES[0]])  # warm-up
+    latencies = []
+    for i in range(repeats):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        encoder.encode([query])
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies = np.array(latencies)
+    return {
+        "backend": backend,
+        "import_s": round(import_s, 3),
+        "load_s": round(load_s, 3),
+        "query_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+        "query_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "torch_imported": 'torch' in sys.modules,
+    }
+
+def run_subprocess(backend, repeats):
+    output = subprocess.run(
+        [sys.executable, __file__, '--measure-backend', backend, '--repeats', str(repeats)],
+        capture_output=True, text=True, check=True, cwd=str(parent_dir),
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def parity(texts):
+    import numpy as np
+    from query_encoder import load_query_encoder
+
+    reference = load_query_encoder('torch').encode(texts, batch_size=64, normalize_embeddings=True)
+    candidate = load_query_encoder('onnx').encode(texts, batch_size=64)
+    cosines = np.sum(reference * candidate, axis=1)
+    return {
+        "texts": len(texts),
+        "cosine_mean": round(float(cosines.mean()), 5),
+        "cosine_min": round(float(cosines.min()), 5),
+        "cosine_p01": round(float(np.percentile(cosines, 1)), 5),
+    }
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Compare the ONNX query encoder with the reference model")
+    parser.add_argument('--csv', type=str, default='sample_products.csv', help='Catalog used for parity texts')
+    parser.add_argument('--repeats', type=int, default=200, help='Single-query encodes per backend')
+    parser.add_argument('--min-cosine', type=float, default=0.98, help='Fail if any vector agrees less than this')
+    parser.add_argument('--output', type=str, default=None, help='Write the JSON report here')
+    parser.add_argument('--measure-backend', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure_backend:
+        print(json.dumps(measure_backend(args.measure_backend, args.repeats)))
+        return
+
+    report = {
+        "parity": parity(load_texts(args.csv)),
+        "backends": [run_subprocess(backend, args.repeats) for backend in ('torch', 'onnx')],
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if report["parity"]["cosine_min"] < args.min_cosine:
+        print(f"❌ Parity below {args.min_cosine}")
+        sys.exit(1)
+    print("✅ ONNX encoder matches the reference model")
+
+if __name__ == "__main__":
+    main()
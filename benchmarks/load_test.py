@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Closed- and open-loop load generator for the recommendation API
+
+Open loop (--rate): requests are scheduled at a fixed or Poisson arrival
+rate whether or not earlier ones have finished, which is how real traffic
+behaves. Each sample records both the service time (from actual send) and
+the response time measured from the *intended* send time, so queueing in
+the client or server is not hidden by coordinated omission.
+
+Closed loop (--concurrency): N workers each send the next request as soon
+as the previous one returns. If --rate is also given, it is the expected
+throughput, and latencies longer than the expected per-worker interval are
+back-filled HdrHistogram-style to correct for the requests that would have
+been sent meanwhile.
+
+Prompts are replayed from a JSONL corpus (a "prompt", "body" or "title"
+field per line), falling back to built-in examples. Wishlist and cart
+traffic uses product ids from --product-ids, one per line as written by
+`python catalog.py ids`, so adds hit real products rather than the 404
+path. Runs are saved as JSON and can be compared with --compare.
+
+    python benchmarks/load_test.py --endpoint recommend --rate 50 --duration 60 --corpus requests.jsonl
+    python catalog.py ids --csv products.csv --output product_ids.txt
+    python benchmarks/load_test.py --endpoint mixed --concurrency 100 --duration 60 --product-ids product_ids.txt
+"""
+
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import requests
+
+DEFAULT_PROMPTS = [
+    "I need a gift for my tech-savvy brother who loves gaming",
+    "Birthday gift for my 25-year-old girlfriend who loves fitness and yoga",
+    "Affordable gift under 1000 rupees for my colleague who drinks a lot of coffee",
+    "Gift for someone who loves reading cooking books and trying new recipes",
+    "Stylish accessory for my fashion-conscious sister",
+]
+MIXED_WEIGHTS = {"recommend": 0.4, "greeting-card": 0.2, "wishlist": 0.2, "cart": 0.2}
+PERCENTILES = [50, 90, 95, 99, 99.9]
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (about 1% relative precision) with coordinated-omission correction"""
+
+    def __init__(self, precision: float = 0.01):
+        self.base = math.log1p(precision)
+        self.counts: Counter = Counter()
+        self.total = 0
+        self.max_ms = 0.0
+
+    def _bucket(self, value_ms: float) -> int:
+        return int(math.log(max(value_ms, 0.001) * 1000) / self.base)
+
+    def _value(self, bucket: int) -> float:
+        return math.exp((bucket + 0.5) * self.base) / 1000
+
+    def record(self, value_ms: float, expected_interval_ms: Optional[float] = None):
+        self.counts[self._bucket(value_ms)] += 1
+        self.total += 1
+        self.max_ms = max(self.max_ms, value_ms)
+        if expected_interval_ms:
+            missed = value_ms - expected_interval_ms
+            while missed >= expected_interval_ms:
+                self.counts[self._bucket(missed)] += 1
+                self.total += 1
+                missed -= expected_interval_ms
+
+    def percentile(self, p: float) -> float:
+        if not self.total:
+            return 0.0
+        rank = math.ceil(self.total * p / 100)
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return min(self._value(bucket), self.max_ms)
+        return self.max_ms
+
+    def summary(self) -> Dict:
+        result = {f"p{p:g}_ms": round(self.percentile(p), 2) for p in PERCENTILES}
+        result["max_ms"] = round(self.max_ms, 2)
+        result["samples"] = self.total
+        return result
+
+    def to_dict(self) -> Dict:
+        """Bucket upper bounds in ms -> counts, for plotting or merging later"""
+        return {f"{self._value(b):.3f}": c for b, c in sorted(self.counts.items())}
+
+def load_corpus(path: Optional[str]) -> List[str]:
+    if not path or not os.path.exists(path):
+        return list(DEFAULT_PROMPTS)
+    prompts = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                prompts.append(line)
+                continue
+            text = record.get('prompt') or record.get('body') or record.get('title')
+            if text:
+                prompts.append(text)
+    return prompts or list(DEFAULT_PROMPTS)
+
+def load_product_ids(path: Optional[str]) -> List[str]:
+    if not path:
+        return []
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.prompts = load_corpus(args.corpus)
+        self.product_ids = load_product_ids(args.product_ids)
+        self.rng = random.Random(args.seed)
+        self.rng_lock = threading.Lock()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.service = defaultdict(LatencyHistogram)   # endpoint -> service time
+        self.response = defaultdict(LatencyHistogram)  # endpoint -> CO-corrected response time
+        self.statuses = defaultdict(Counter)
+        self.completed = 0
+        self.measure_from = None
+
+    def session(self) -> requests.Session:
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=4)
+            self.local.session.mount('http://', adapter)
+            self.local.session.mount('https://', adapter)
+        return self.local.session
+
+    def pick_endpoint(self, rng: random.Random) -> str:
+        if self.args.endpoint != 'mixed':
+            return self.args.endpoint
+        roll, cumulative = rng.random(), 0.0
+        for endpoint, weight in MIXED_WEIGHTS.items():
+            cumulative += weight
+            if roll < cumulative:
+                return endpoint
+        return 'recommend'
+
+    def send(self, endpoint: str, rng: random.Random):
+        base = self.args.url.rstrip('/')
+        prompt = rng.choice(self.prompts)
+        user_id = f"load-user-{rng.randrange(self.args.users)}"
+        product_id = rng.choice(self.product_ids) if self.product_ids else None
+        timeout = self.args.timeout
+        session = self.session()
+        if endpoint == 'recommend':
+            return session.post(f"{base}/recommend", json={"prompt": prompt}, timeout=timeout)
+        if endpoint == 'greeting-card':
+            return session.post(f"{base}/greeting-card", timeout=timeout, json={
+                "recipient_name": "Alex", "occasion": "birthday",
+                "message_style": rng.choice(["funny", "formal", "emotional", "romantic"]),
+                "personal_message": prompt,
+            })
+        if endpoint in ('wishlist', 'cart'):
+            if rng.random() < 0.5:
+                return session.post(f"{base}/{endpoint}/{user_id}", params={"product_id": product_id}, timeout=timeout)
+            return session.get(f"{base}/{endpoint}/{user_id}", timeout=timeout)
+        raise ValueError(f"Unknown endpoint: {endpoint}")
+
+    def execute(self, intended_start: float, expected_interval_ms: Optional[float] = None):
+        with self.rng_lock:
+            rng = random.Random(self.rng.getrandbits(64))
+        endpoint = self.pick_endpoint(rng)
+        actual_start = time.perf_counter()
+        try:
+            status = str(self.send(endpoint, rng).status_code)
+        except requests.RequestException as e:
+            status = type(e).__name__
+        end = time.perf_counter()
+        if intended_start < self.measure_from:
+            return  # warm-up
+        service_ms = (end - actual_start) * 1000
+        response_ms = (end - intended_start) * 1000
+        with self.lock:
+            self.service[endpoint].record(service_ms)
+            self.response[endpoint].record(response_ms, expected_interval_ms)
+            self.statuses[endpoint][status] += 1
+            self.completed += 1
+
+    def run_open(self):
+        args = self.args
+        start = time.perf_counter()
+        self.measure_from = start + args.warmup
+        deadline = self.measure_from + args.duration
+        next_send = start
+        with ThreadPoolExecutor(max_workers=args.max_workers) as pool:
+            while next_send < deadline:
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.execute, next_send)
+                gap = self.rng.expovariate(args.rate) if args.arrivals == 'poisson' else 1 / args.rate
+                next_send += gap
+        return time.perf_counter() - self.measure_from
+
+    def run_closed(self):
+        args = self.args
+        start = time.perf_counter()
+        self.measure_from = start + args.warmup
+        deadline = self.measure_from + args.duration
+        expected_interval_ms = args.concurrency / args.rate * 1000 if args.rate else None
+
+        def worker():
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    return
+                self.execute(now, expected_interval_ms)
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - self.measure_from
+
+    def run(self) -> Dict:
+        elapsed = self.run_closed() if self.args.concurrency else self.run_open()
+        endpoints = {}
+        for endpoint in sorted(self.statuses):
+            statuses = self.statuses[endpoint]
+            total = sum(statuses.values())
+            errors = sum(count for status, count in statuses.items() if not status.startswith('2'))
+            endpoints[endpoint] = {
+                "requests": total,
+                "throughput_rps": round(total / elapsed, 2),
+                "error_rate": round(errors / total, 4) if total else 0.0,
+                "statuses": dict(statuses),
+                "service_time": self.service[endpoint].summary(),
+                "response_time": self.response[endpoint].summary(),
+                "response_time_histogram": self.response[endpoint].to_dict(),
+            }
+        return {
+            "meta": {
+                "timestamp": datetime.now().isoformat(),
+                "url": self.args.url,
+                "endpoint": self.args.endpoint,
+                "mode": "closed" if self.args.concurrency else "open",
+                "rate": self.args.rate,
+                "arrivals": self.args.arrivals,
+                "concurrency": self.args.concurrency,
+                "duration_s": self.args.duration,
+                "corpus_size": len(self.prompts),
+                "seed": self.args.seed,
+            },
+            "elapsed_s": round(elapsed, 2),
+            "completed": self.completed,
+            "throughput_rps": round(self.completed / elapsed, 2),
+            "endpoints": endpoints,
+        }
+
+def print_report(report: Dict):
+    meta = report["meta"]
+    target = f"{meta['rate']} rps" if meta["mode"] == "open" else f"{meta['concurrency']} workers"
+    print(f"\n{meta['mode']}-loop run against {meta['url']} ({target}, {report['elapsed_s']}s)")
+    print(f"{'endpoint':<15}{'rps':>8}{'errors':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'p99.9':>10}{'max':>10}")
+    for endpoint, stats in report["endpoints"].items():
+        r = stats["response_time"]
+        print(f"{endpoint:<15}{stats['throughput_rps']:>8}{stats['error_rate']:>8.2%}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['p99.9_ms']:>10}{r['max_ms']:>10}")
+
+def compare(report: Dict, baseline_path: str):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\nResponse time vs {baseline_path} ({baseline['meta']['timestamp']}):")
+    for endpoint, stats in report["endpoints"].items():
+        before = baseline["endpoints"].get(endpoint)
+        if not before:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            old, new = before["response_time"][key], stats["response_time"][key]
+            print(f"  {endpoint:<15}{key:<8}{old:>10} -> {new:>10}  x{new / max(old, 1e-9):.2f}")
+        print(f"  {endpoint:<15}{'rps':<8}{before['throughput_rps']:>10} -> {stats['throughput_rps']:>10}")
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Load-test the recommendation API")
+    parser.add_argument('--url', type=str, default='http://localhost:8000', help='Service base URL')
+    parser.add_argument('--endpoint', choices=['recommend', 'greeting-card', 'wishlist', 'cart', 'mixed'], default='recommend')
+    parser.add_argument('--rate', type=float, default=None, help='Open loop: arrivals per second; closed loop: expected rps')
+    parser.add_argument('--arrivals', choices=['poisson', 'constant'], default='poisson', help='Open-loop arrival process')
+    parser.add_argument('--concurrency', type=int, default=None, help='Closed loop with this many workers')
+    parser.add_argument('--duration', type=float, default=30, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='Unmeasured seconds before the run')
+    parser.add_argument('--max-workers', type=int, default=1000, help='Open-loop in-flight request limit')
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request timeout in seconds')
+    parser.add_argument('--users', type=int, default=1000, help='Distinct user ids for wishlist/cart')
+    parser.add_argument('--corpus', type=str, default='requests.jsonl', help='JSONL prompt corpus')
+    parser.add_argument('--product-ids', type=str, default=None,
+                        help='Product ids for wishlist/cart adds, one per line (python catalog.py ids)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None, help='Save the run as JSON')
+    parser.add_argument('--compare', type=str, default=None, help='Earlier run to compare against')
+    args = parser.parse_args()
+
+    if not args.concurrency and not args.rate:
+        parser.error("give --rate for an open-loop run or --concurrency for a closed-loop run")
+    if args.endpoint in ('wishlist', 'cart', 'mixed') and not load_product_ids(args.product_ids):
+        parser.error(f"--endpoint {args.endpoint} needs --product-ids (write them with: python catalog.py ids)")
+
+    report = LoadTest(args).run()
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved run to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
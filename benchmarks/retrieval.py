@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmark for recommendation_service
+
+For each catalog size, in a fresh interpreter:
+  - startup: import time and load_products() time (CSV parse + embedding)
+  - memory: peak/current RSS, compact catalog size, embedding matrix size
+  - find_top_products latency with no filters, with each FilterOptions
+    field on its own, and with all of them together
+
+Catalogs come from synthetic_catalog.py and are cached under --data-dir.
+The default --encoder random swaps the transformer for a seeded random
+projection so large catalogs finish in minutes and the numbers isolate the
+service's own code; --encoder model uses the configured embedding backend.
+
+Results are written as JSON; pass --compare to diff against an earlier run:
+
+    python benchmarks/retrieval.py --sizes 10000 100000 --output bench.json
+    python benchmarks/retrieval.py --sizes 10000 100000 --compare bench.json
+"""
+
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+parent_dir = Path(__file__).resolve().parent.parent
+sys.path.append(str(parent_dir))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 5_000_000]
+QUERIES = [
+    "I need a gift for my tech-savvy brother who loves gaming",
+    "Birthday gift for my 25-year-old girlfriend who loves fitness and yoga",
+    "Affordable gift under 1000 rupees for my colleague who drinks a lot of coffee",
+    "Gift for someone who loves reading cooking books and trying new recipes",
+    "Stylish accessory for my fashion-conscious sister",
+]
+FILTER_CASES = {
+    "none": {},
+    "category": {"category": "electronics"},
+    "price_min": {"price_min": 500},
+    "price_max": {"price_max": 2000},
+    "rating_min": {"rating_min": 4.0},
+    "eco_friendly": {"eco_friendly": True},
+    "handmade": {"handmade": True},
+    "local": {"local": True},
+    "sort_by": {"sort_by": "rating"},
+    "all": {"category": "electronics", "price_min": 500, "price_max": 5000, "rating_min": 4.0,
+            "eco_friendly": True, "handmade": True, "local": True, "sort_by": "price"},
+}
+
+class RandomEncoder:
+    """Seeded random unit vectors with the shape of all-MiniLM-L6-v2 output"""
+
+    def __init__(self, dim: int = 384, seed: int = 0):
+        import numpy as np
+        self.dim = dim
+        self.rng = np.random.default_rng(seed)
+
+    def encode(self, sentences, batch_size: int = 32, show_progress_bar: bool = False, **kwargs):
+        import numpy as np
+        vectors = self.rng.standard_normal((len(sentences), self.dim), dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def current_rss_mb() -> float:
+    try:
+        with open('/proc/self/statm') as f:
+            return round(int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20, 1)
+    except (OSError, ValueError):
+        return None
+
+def peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+def percentiles(samples_ms):
+    import numpy as np
+    samples = np.array(samples_ms)
+    return {
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "max_ms": round(float(samples.max()), 3),
+    }
+
+def measure(csv_path: str, encoder: str, repeats: int):
+    """Runs inside the subprocess for one catalog size"""
+    os.environ.setdefault('OPENROUTER_API_KEY', 'benchmark')
+    baseline_rss = current_rss_mb()
+
+    start = time.perf_counter()
+    import recommendation_service as service
+    import_s = time.perf_counter() - start
+
+    if encoder == 'random':
+        service.load_query_encoder = lambda backend=None: RandomEncoder()
+    service.CSV_PATH = csv_path
+
+    start = time.perf_counter()
+    service.load_products()
+    load_s = time.perf_counter() - start
+    if service.load_state["status"] != "ready":
+        raise RuntimeError(f"load_products failed: {service.load_state['error']}")
+
+    result = {
+        "rows": len(service.product_catalog),
+        "import_s": round(import_s, 3),
+        "load_products_s": round(load_s, 3),
+        "startup_s": round(import_s + load_s, 3),
+        "memory": {
+            "baseline_rss_mb": baseline_rss,
+            "rss_after_load_mb": current_rss_mb(),
+            "peak_rss_mb": peak_rss_mb(),
+            "catalog_mb": round(service.product_catalog.nbytes / 2**20, 1),
+            "embeddings_mb": round(service.product_embeddings.nbytes / 2**20, 1),
+        },
+        "find_top_products": {},
+    }
+
+    from schemas import FilterOptions, OccasionInfo, RecipientProfile
+    recipient = RecipientProfile(interests=["gaming"], hobbies=["reading"])
+    occasion = OccasionInfo(occasion="birthday")
+    for case, options in FILTER_CASES.items():
+        filter_options = FilterOptions(**options)
+        service.find_top_products(QUERIES[0], recipient, occasion, filter_options)  # warm-up
+        samples = []
+        for i in range(repeats):
+            start = time.perf_counter()
+            service.find_top_products(QUERIES[i % len(QUERIES)], recipient, occasion, filter_options)
+            samples.append((time.perf_counter() - start) * 1000)
+        result["find_top_products"][case] = percentiles(samples)
+    result["memory"]["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def run_size(rows: int, args):
+    from synthetic_catalog import ensure_catalog
+    csv_path = os.path.abspath(ensure_catalog(args.data_dir, rows, args.seed))
+    command = [sys.executable, __file__, '--measure', csv_path, '--encoder', args.encoder, '--repeats', str(args.repeats)]
+    print(f"Benchmarking {rows} rows...")
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=str(parent_dir))
+    if completed.returncode != 0:
+        print(completed.stderr[-2000:])
+        return {"rows": rows, "error": completed.stderr.strip().splitlines()[-1] if completed.stderr else "failed"}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=str(parent_dir), check=True).stdout.strip()
+    except Exception:
+        return None
+
+def compare(current, baseline_path):
+    """Print the ratio of each timing to the baseline run; >1 means slower"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    previous = {r["rows"]: r for r in baseline["results"] if "error" not in r}
+    print(f"\nComparison against {baseline_path} (commit {baseline['meta'].get('commit')}):")
+    for result in current["results"]:
+        before = previous.get(result["rows"])
+        if before is None or "error" in result:
+            continue
+        print(f"  {result['rows']} rows")
+        for key in ("load_products_s", "startup_s"):
+            print(f"    {key:<28} {before[key]:>10.3f} -> {result[key]:>10.3f}  x{result[key] / max(before[key], 1e-9):.2f}")
+        for case, stats in result["find_top_products"].items():
+            old = before["find_top_products"].get(case)
+            if old:
+                print(f"    {'find_top_products/' + case:<28} {old['p50_ms']:>10.3f} -> {stats['p50_ms']:>10.3f}  "
+                      f"x{stats['p50_ms'] / max(old['p50_ms'], 1e-9):.2f}")
+        old_rss, new_rss = before["memory"]["peak_rss_mb"], result["memory"]["peak_rss_mb"]
+        print(f"    {'peak_rss_mb':<28} {old_rss:>10.1f} -> {new_rss:>10.1f}  x{new_rss / max(old_rss, 1e-9):.2f}")
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark catalog loading and retrieval")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Catalog sizes in rows')
+    parser.add_argument('--encoder', choices=['random', 'model'], default='random', help='Embedding model to use')
+    parser.add_argument('--repeats', type=int, default=20, help='find_top_products calls per filter case')
+    parser.add_argument('--data-dir', type=str, default='benchmarks/data', help='Cache for generated catalogs')
+    parser.add_argument('--seed', type=int, default=42, help='Catalog generator seed')
+    parser.add_argument('--output', type=str, default=None, help='Write the JSON results here')
+    parser.add_argument('--compare', type=str, default=None, help='Earlier JSON results to compare against')
+    parser.add_argument('--measure', type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.encoder, args.repeats)))
+        return
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "encoder": args.encoder,
+            "repeats": args.repeats,
+        },
+        "results": [run_size(rows, args) for rows in args.sizes],
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        compare(report, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Synthetic catalog generator shaped like sample_products.csv
+
+Writes the three junk lines the loader skips, then name, main_category,
+sub_category, description, actual_price, ratings and no_of_ratings columns.
+Prices and rating counts use the "₹1,299" and "1,234" formats of the real
+dump, and a small share of rows carry missing or unparseable values so the
+filter and popularity paths see realistic data.
+Output is deterministic for a given --rows and --seed.
+
+    python benchmarks/synthetic_catalog.py --rows 100000 --output benchmarks/data/catalog_100000.csv
+"""
+
+import csv
+import os
+import random
+
+CATEGORIES = {
+    "Electronics": ["Audio", "Wearables", "Mobile Accessories", "Computer Accessories", "Cameras", "Smart Home"],
+    "Home & Kitchen": ["Drinkware", "Decor", "Cookware", "Storage", "Bedding", "Lighting"],
+    "Fashion": ["Accessories", "Watches", "Bags", "Footwear", "Jewellery", "Clothing"],
+    "Sports": ["Fitness", "Yoga", "Cycling", "Outdoor", "Team Sports", "Swimming"],
+    "Books": ["Cooking", "Fiction", "Self Help", "Children", "Science", "Travel"],
+    "Toys & Games": ["Board Games", "Puzzles", "STEM Kits", "Plush", "Outdoor Play", "Art Supplies"],
+    "Beauty": ["Skincare", "Fragrance", "Haircare", "Makeup", "Bath", "Grooming"],
+}
+ADJECTIVES = [
+    "Premium", "Wireless", "Portable", "Handmade", "Eco-Friendly", "Classic", "Smart", "Compact",
+    "Deluxe", "Vintage", "Organic", "Ergonomic", "Minimalist", "Luxury", "Rechargeable", "Personalised",
+]
+NOUNS = {
+    "Audio": ["Headphones", "Earbuds", "Speaker", "Soundbar"],
+    "Wearables": ["Smartwatch", "Fitness Band", "Smart Ring"],
+    "Drinkware": ["Coffee Mug Set", "Tumbler", "Water Bottle", "Tea Infuser"],
+    "Fitness": ["Resistance Bands", "Dumbbell Set", "Skipping Rope", "Foam Roller"],
+    "Yoga": ["Yoga Mat", "Yoga Blocks", "Meditation Cushion"],
+    "Cooking": ["Recipe Book", "Baking Guide", "Spice Cookbook"],
+}
+COLOURS = ["Black", "White", "Blue", "Red", "Green", "Rose Gold", "Grey", "Beige"]
+FEATURES = [
+    "with 30-hour battery life", "made from recycled materials", "crafted by local artisans",
+    "with a lifetime warranty", "perfect for daily use", "in a premium gift box",
+    "with noise cancellation", "that is dishwasher safe", "with adjustable straps",
+    "designed for beginners", "with fast charging", "in a set of 4",
+]
+HEADER = ["name", "main_category", "sub_category", "description", "actual_price", "ratings", "no_of_ratings"]
+
+def generate_rows(rows: int, seed: int = 42):
+    rng = random.Random(seed)
+    categories = list(CATEGORIES.items())
+    for _ in range(rows):
+        main_category, sub_categories = rng.choice(categories)
+        sub_category = rng.choice(sub_categories)
+        noun = rng.choice(NOUNS.get(sub_category, [sub_category.rstrip('s') + " Kit", sub_category + " Set"]))
+        adjective = rng.choice(ADJECTIVES)
+        colour = rng.choice(COLOURS)
+        name = f"{adjective} {noun} - {colour}"
+        description = f"{adjective} {noun.lower()} {rng.choice(FEATURES)} and {rng.choice(FEATURES)}"
+
+        roll = rng.random()
+        if roll < 0.02:
+            price = ""
+        elif roll < 0.03:
+            price = "Price on request"
+        else:
+            price = f"₹{int(rng.lognormvariate(7, 1)):,}"
+
+        roll = rng.random()
+        if roll < 0.03:
+            rating = ""
+        elif roll < 0.04:
+            rating = "Get"
+        else:
+            rating = f"{rng.uniform(2.5, 5.0):.1f}"
+
+        roll = rng.random()
+        if roll < 0.03:
+            rating_count = ""
+        else:
+            rating_count = f"{int(rng.lognormvariate(5, 2)):,}"
+        yield [name, main_category, sub_category, description, price, rating, rating_count]
+
+def write_catalog(path: str, rows: int, seed: int = 42):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write("Skip this line\nSkip this line too\nSkip this third line\n")
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        writer.writerows(generate_rows(rows, seed))
+    print(f"Wrote {rows} synthetic products to {path}")
+
+def _cached_header(path: str) -> list:
+    with open(path, encoding='utf-8', newline='') as f:
+        for _ in range(3):
+            f.readline()
+        return next(csv.reader(f), [])
+
+def ensure_catalog(data_dir: str, rows: int, seed: int = 42) -> str:
+    """Path of a cached synthetic catalog with the given row count, generating it if needed
+
+    A cached file written with a different HEADER is regenerated.
+    """
+    path = os.path.join(data_dir, f"catalog_{rows}_{seed}.csv")
+    if not os.path.exists(path) or _cached_header(path) != HEADER:
+        write_catalog(path, rows, seed)
+    return path
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate a synthetic product catalog CSV")
+    parser.add_argument('--rows', type=int, required=True, help='Number of products')
+    parser.add_argument('--output', type=str, required=True, help='CSV path')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    args = parser.parse_args()
+    write_catalog(args.output, args.rows, args.seed)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Catalog CSV helpers shared by the recommendation service and the artifact builder
+
+    python catalog.py ids --csv products.csv --output product_ids.txt   # stable ids, one per line
+"""
+
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+from typing import List
+
+TEXT_COLUMNS = ['name', 'main_category', 'sub_category', 'description']
+PRICE_COLUMN = 'actual_price'
+RATING_COLUMN = 'ratings'
+RATING_COUNT_COLUMN = 'no_of_ratings'
+PRODUCT_ID_COLUMN = os.getenv('PRODUCT_ID_COLUMN', 'product_id')
+# Hashed into an id when the CSV has no PRODUCT_ID_COLUMN: the product URL if there is one,
+# else the fields that name the product
+ID_HASH_COLUMNS = [['link'], ['name', 'main_category', 'sub_category']]
+
+def read_products_csv(csv_path: str, skiprows: int = 3) -> pd.DataFrame:
+    """Load the catalog CSV, skipping bad lines and rows without a name"""
+    products_df = pd.read_csv(csv_path, on_bad_lines='skip', low_memory=False, skiprows=skiprows)
+    if 'name' in products_df.columns:
+        products_df = products_df.dropna(subset=['name'])
+    else:
+        print("Warning: 'name' column not found in CSV. Keeping all rows.")
+    return products_df
+
+def get_product_text(row) -> str:
+    # Combine relevant fields for embedding
+    fields = []
+    for col in TEXT_COLUMNS:
+        if col in row and pd.notnull(row[col]):
+            fields.append(str(row[col]))
+    return ' | '.join(fields)
+
+def get_product_texts(products_df: pd.DataFrame) -> List[str]:
+    """get_product_text for every row, without the per-row Series overhead of iterrows"""
+    columns = [col for col in TEXT_COLUMNS if col in products_df.columns]
+    return [
+        ' | '.join(str(value) for value in values if pd.notnull(value))
+        for values in products_df[columns].itertuples(index=False, name=None)
+    ]
+
+def parse_prices(products_df: pd.DataFrame) -> np.ndarray:
+    """Numeric prices with currency symbols stripped; NaN where unparseable"""
+    if PRICE_COLUMN not in products_df.columns:
+        return np.full(len(products_df), np.nan, dtype=np.float32)
+    cleaned = products_df[PRICE_COLUMN].astype(str).str.replace('₹', '', regex=False).str.replace(',', '', regex=False)
+    return pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype=np.float32)
+
+def parse_ratings(products_df: pd.DataFrame) -> np.ndarray:
+    """Numeric ratings; NaN where missing or unparseable"""
+    if RATING_COLUMN not in products_df.columns:
+        return np.full(len(products_df), np.nan, dtype=np.float32)
+    return pd.to_numeric(products_df[RATING_COLUMN], errors='coerce').to_numpy(dtype=np.float32)
+
+def parse_rating_counts(products_df: pd.DataFrame) -> np.ndarray:
+    """Number of ratings per product ("1,234" style); NaN where missing or unparseable"""
+    if RATING_COUNT_COLUMN not in products_df.columns:
+        return np.full(len(products_df), np.nan, dtype=np.float32)
+    cleaned = products_df[RATING_COUNT_COLUMN].astype(str).str.replace(',', '', regex=False)
+    return pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype=np.float32)
+
+def assign_product_ids(products_df: pd.DataFrame) -> np.ndarray:
+    """Stable id per row, independent of row order and of other rows
+
+    The PRODUCT_ID_COLUMN value where the CSV has one, otherwise the first
+    16 hex digits of a SHA-1 over the ID_HASH_COLUMNS fields, so ids survive
+    reordering, dropped rows and deduplication. Returned as a bytes array.
+    """
+    hash_columns = next((columns for columns in ID_HASH_COLUMNS if all(col in products_df.columns for col in columns)),
+                        [col for col in TEXT_COLUMNS if col in products_df.columns])
+    texts = pd.Series([''] * len(products_df), index=products_df.index)
+    for n, col in enumerate(hash_columns):
+        texts = (texts + '|' if n else texts) + products_df[col].fillna('').astype(str)
+    ids = [hashlib.sha1(text.encode('utf-8')).hexdigest()[:16] for text in texts]
+    if PRODUCT_ID_COLUMN in products_df.columns:
+        given = products_df[PRODUCT_ID_COLUMN]
+        ids = [str(value) if pd.notnull(value) and str(value) else hashed for value, hashed in zip(given, ids)]
+    return np.array([product_id.encode('utf-8') for product_id in ids], dtype=np.bytes_)
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Catalog CSV helpers")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    ids_parser = subparsers.add_parser('ids', help='Write the stable product id of every row, one per line')
+    ids_parser.add_argument('--csv', type=str, default='products.csv', help='Catalog CSV')
+    ids_parser.add_argument('--output', type=str, default='product_ids.txt', help='Output file')
+    ids_parser.add_argument('--skiprows', type=int, default=3, help='Junk lines at the top of the CSV')
+    args = parser.parse_args()
+
+    if args.command == 'ids':
+        ids = assign_product_ids(read_products_csv(args.csv, skiprows=args.skiprows))
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.writelines(product_id.decode('utf-8') + '\n' for product_id in ids)
+        print(f"Wrote {len(ids)} product ids to {args.output}")
+
+if __name__ == "__main__":
+    main()
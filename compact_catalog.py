@@ -0,0 +1,166 @@
+"""
+Compact in-memory catalog for request-time hydration
+
+read_csv leaves every text column as an object column of Python strings,
+roughly 50-100 bytes of overhead per cell on top of the text. Requests only
+ever need a few hundred rows at a time, so the service keeps the catalog in
+a columnar form instead and hydrates rows on demand:
+
+    numeric columns      numpy arrays in their parsed dtype
+    repetitive text      int32 codes into a label list (categories, ratings, ...)
+    other text           a StringArena: one UTF-8 buffer plus int64 offsets
+
+plus the parsed price and rating arrays used for filtering and scoring, and
+the stable product ids (catalog.assign_product_ids) that ProductIdIndex resolves.
+Hydrated values are the original CSV values, so product text sent to the LLM
+is unchanged.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from artifact_bundle import StringArena
+
+# Text columns with fewer distinct values than this share of rows are stored as codes
+CATEGORY_MAX_SHARE = 0.5
+
+class CompactCatalog:
+    """Columnar, read-only catalog; row positions match the embedding matrix"""
+
+    def __init__(self, rows: int, columns: List[str], numeric: Dict[str, np.ndarray], codes: Dict[str, np.ndarray],
+                 labels: Dict[str, List[str]], arenas: Dict[str, StringArena],
+                 prices: Optional[np.ndarray] = None, ratings: Optional[np.ndarray] = None,
+                 ids: Optional[np.ndarray] = None):
+        self.columns = columns
+        self.numeric = numeric
+        self.codes = codes
+        self.labels = labels
+        self.arenas = arenas
+        self.prices = prices
+        self.ratings = ratings
+        self.ids = ids
+        self._rows = rows
+
+    @classmethod
+    def from_dataframe(cls, products_df: pd.DataFrame, prices: Optional[np.ndarray] = None,
+                       ratings: Optional[np.ndarray] = None, ids: Optional[np.ndarray] = None) -> 'CompactCatalog':
+        numeric, codes, labels, arenas = {}, {}, {}, {}
+        columns = [str(col) for col in products_df.columns]
+        for name, col in zip(columns, products_df.columns):
+            series = products_df[col]
+            if pd.api.types.is_numeric_dtype(series.dtype):
+                numeric[name] = series.to_numpy()
+                continue
+            values = series.where(series.isna(), series.astype(str))
+            if values.nunique(dropna=True) < CATEGORY_MAX_SHARE * max(len(values), 1):
+                column_codes, column_labels = pd.factorize(values)
+                codes[name] = column_codes.astype(np.int32)
+                labels[name] = list(column_labels)
+            else:
+                arenas[name] = StringArena(*StringArena.pack(None if pd.isnull(value) else value for value in values))
+        return cls(len(products_df), columns, numeric, codes, labels, arenas, prices, ratings, ids)
+
+    def __len__(self):
+        return self._rows
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate heap footprint of the stored columns"""
+        total = sum(values.nbytes for values in self.numeric.values())
+        total += sum(values.nbytes for values in self.codes.values())
+        total += sum(len(label) + 50 for column_labels in self.labels.values() for label in column_labels)
+        total += sum(arena.offsets.nbytes + arena.data.nbytes for arena in self.arenas.values())
+        for array in (self.prices, self.ratings, self.ids):
+            total += array.nbytes if array is not None else 0
+        return total
+
+    def column(self, name: str, indices) -> List[Any]:
+        """Values of one column for the given rows, None where missing"""
+        indices = np.asarray(indices, dtype=np.int64)
+        if name in self.numeric:
+            values = self.numeric[name][indices]
+            missing = pd.isnull(values)
+            return [None if gap else value for value, gap in zip(values.tolist(), missing)]
+        if name in self.codes:
+            column_labels = self.labels[name]
+            return [column_labels[code] if code >= 0 else None for code in self.codes[name][indices].tolist()]
+        if name in self.arenas:
+            return [value or None for value in self.arenas[name].take(indices.tolist())]
+        raise KeyError(name)
+
+    def product_ids(self, indices) -> List[str]:
+        return [self.ids[row].decode('utf-8') for row in indices]
+
+    def rows(self, indices) -> List[Dict[str, Any]]:
+        """Hydrate the given rows as {column: value} dicts, skipping missing values"""
+        values = [self.column(name, indices) for name in self.columns]
+        return [
+            {name: column[n] for name, column in zip(self.columns, values) if column[n] is not None}
+            for n in range(len(indices))
+        ]
+
+    def describe(self, indices) -> str:
+        """Product list text for the LLM, one "col: value, ..." line per product"""
+        return '\n'.join(
+            ', '.join(f"{name}: {value}" for name, value in row.items())
+            for row in self.rows(indices)
+        )
+
+    def contains(self, name: str, needle: str) -> np.ndarray:
+        """Rows whose value in column name contains needle, ignoring case; all False if no such column"""
+        mask = np.zeros(len(self), dtype=bool)
+        needle = needle.casefold()
+        if name in self.codes:
+            matching = [code for code, label in enumerate(self.labels[name]) if needle in label.casefold()]
+            mask[np.isin(self.codes[name], matching)] = True
+        elif name in self.arenas and not needle:
+            mask[np.diff(np.asarray(self.arenas[name].offsets)) > 0] = True
+        elif name in self.arenas and not needle.isascii():
+            # bytes.lower() only folds ASCII, so non-ASCII needles are matched on the decoded values
+            values = self.arenas[name].take(range(len(self)))
+            mask[:] = [needle in value.casefold() for value in values]
+        elif name in self.arenas:
+            # Search the packed bytes directly, mapping each hit back to its row through the offsets
+            arena = self.arenas[name]
+            haystack, key = bytes(arena.data).lower(), needle.encode('utf-8')
+            offsets = np.asarray(arena.offsets)
+            position = haystack.find(key)
+            while position != -1:
+                row = int(np.searchsorted(offsets, position, side='right')) - 1
+                end = int(offsets[row + 1])
+                if position + len(key) <= end:
+                    mask[row] = True
+                    position = haystack.find(key, end)
+                else:
+                    position = haystack.find(key, position + 1)
+        elif name in self.numeric:
+            values = pd.Series(self.numeric[name])
+            mask[:] = values.notna() & values.astype(str).str.lower().str.contains(needle, regex=False)
+        return mask
+
+class ProductIdIndex:
+    """Product id -> catalog row, by binary search over the sorted ids
+
+    Several ids may point at one row: after deduplication the ids of
+    collapsed listings resolve to their representative.
+    """
+
+    def __init__(self, ids: np.ndarray, rows: np.ndarray):
+        order = np.argsort(ids, kind='stable')
+        self.ids = np.asarray(ids)[order]
+        self.rows = np.asarray(rows, dtype=np.int64)[order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, product_id: str) -> Optional[int]:
+        key = str(product_id).encode('utf-8')
+        position = int(np.searchsorted(self.ids, key))
+        if position < len(self.ids) and self.ids[position] == key:
+            return int(self.rows[position])
+        return None
+
+    def rows_for(self, product_ids: Iterable[str]) -> List[Optional[int]]:
+        return [self.row(product_id) for product_id in product_ids]
@@ -0,0 +1,100 @@
+"""
+Short-lived cache of ranked candidate lists behind opaque pagination cursors
+
+/recommend ranks CURSOR_DEPTH candidates once and stores their row ids and
+scores here; a cursor is the entry key plus an offset, so every later page is
+a slice of the stored arrays instead of another similarity scan. Entries
+expire CURSOR_TTL seconds after their last use and the least recently used
+are evicted once the cache holds more than CURSOR_CACHE_BYTES. The cache is
+per process: behind several workers, page requests need sticky routing or
+they will find their cursor expired.
+"""
+
+import base64
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from metrics import record_cache
+
+CURSOR_TTL = float(os.getenv('CURSOR_TTL', '900'))
+CURSOR_CACHE_BYTES = int(os.getenv('CURSOR_CACHE_BYTES', str(64 * 1024 * 1024)))
+# Rough size of the request context kept with each entry
+CONTEXT_BYTES = 2048
+
+class CursorEntry:
+    def __init__(self, ids: np.ndarray, scores: np.ndarray, context: Any):
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.context = context
+        self.last_used = time.monotonic()
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + self.scores.nbytes + CONTEXT_BYTES
+
+class CursorCache:
+    """LRU + TTL cache of CursorEntry objects, bounded by total bytes"""
+
+    def __init__(self, max_bytes: int = CURSOR_CACHE_BYTES, ttl: float = CURSOR_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: OrderedDict = OrderedDict()
+        self.nbytes = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _drop(self, key: str):
+        self.nbytes -= self.entries.pop(key).nbytes
+
+    def _evict(self):
+        cutoff = time.monotonic() - self.ttl
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if entry.last_used >= cutoff and self.nbytes <= self.max_bytes:
+                break
+            self._drop(key)
+
+    def put(self, ids: np.ndarray, scores: np.ndarray, context: Any) -> str:
+        entry = CursorEntry(ids, scores, context)
+        key = secrets.token_urlsafe(12)
+        with self.lock:
+            self.entries[key] = entry
+            self.nbytes += entry.nbytes
+            self._evict()
+        return key
+
+    def get(self, key: str) -> Optional[CursorEntry]:
+        with self.lock:
+            self._evict()
+            entry = self.entries.get(key)
+            record_cache("cursor", entry is not None)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                self.entries.move_to_end(key)
+            return entry
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.nbytes}
+
+def encode_cursor(key: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{key}:{offset}".encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """(key, offset); raises ValueError for a malformed cursor"""
+    try:
+        key, offset = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().rsplit(':', 1)
+        offset = int(offset)
+    except Exception as e:
+        raise ValueError(f"Malformed cursor: {cursor}") from e
+    if offset < 0:
+        raise ValueError(f"Malformed cursor: {cursor}")
+    return key, offset
@@ -0,0 +1,263 @@
+"""
+Near-duplicate collapsing for the product catalog at ingest
+
+Marketplace dumps list the same item many times: once per seller, colour or
+size. Two passes find those clusters before anything is embedded:
+
+  1. name key: the name lowercased, with bracketed text, plain colour and
+     size words and punctuation dropped, as a sorted token set. Exact key
+     matches are the same product.
+  2. SimHash: a 64-bit fingerprint of each pass-1 group's name tokens. Groups
+     that share one of SIMHASH_BANDS 16-bit bands (LSH) are compared, and
+     those within DEDUP_MAX_HAMMING bits are merged. Descriptions are left
+     out: shared marketing copy makes unrelated products look alike.
+
+A name match alone is not enough in either pass: the listings must also share
+main_category and sub_category, and their prices must be within a factor of
+DEDUP_PRICE_RATIO (or both be missing). Words that can name a material or a
+product ("gold", "light", "set") are never dropped from the key.
+
+Each cluster keeps one representative (most ratings, then best rating, then
+first seen); the others become its variants. With DEDUP_PRODUCTS=1 the
+service loads the collapsed catalog, so duplicates cost no encode time, index
+memory or LLM prompt slots.
+"""
+
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from catalog import PRICE_COLUMN, parse_prices, parse_rating_counts, parse_ratings
+
+DEDUP_PRODUCTS = os.getenv('DEDUP_PRODUCTS', '0') == '1'
+DEDUP_MAX_HAMMING = int(os.getenv('DEDUP_MAX_HAMMING', '3'))
+DEDUP_PRICE_RATIO = float(os.getenv('DEDUP_PRICE_RATIO', '1.5'))
+SIMHASH_BANDS = 4
+# LSH buckets above this size are compared against their first member only, not pairwise
+MAX_PAIRWISE_BUCKET = 64
+SIMHASH_CHUNK_ROWS = 50_000
+VARIANT_FIELDS = ['name', PRICE_COLUMN]
+
+# Only words that describe a variant of the same product; materials and nouns that
+# double as colours (gold, silver, rose, cream, olive, charcoal, light) stay in the key
+COLOUR_WORDS = {
+    "black", "white", "blue", "red", "green", "yellow", "pink", "purple", "grey", "gray", "brown",
+    "beige", "navy", "maroon", "multicolor", "multicolour", "turquoise", "teal", "violet",
+}
+SIZE_WORDS = {"xs", "s", "m", "l", "xl", "xxl", "xxxl", "small", "medium", "large"}
+_BRACKETS = re.compile(r"\([^)]*\)|\[[^\]]*\]")
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+def name_key(name: str) -> str:
+    words = _NON_WORD.sub(' ', _BRACKETS.sub(' ', str(name).lower())).split()
+    return ' '.join(sorted({w for w in words if w not in COLOUR_WORDS and w not in SIZE_WORDS}))
+
+def simhashes(texts: List[str]) -> np.ndarray:
+    """64-bit SimHash per text over its lowercase word tokens, as uint64"""
+    vocabulary: Dict[str, int] = {}
+    token_ids, offsets = [], np.zeros(len(texts) + 1, dtype=np.int64)
+    for i, text in enumerate(texts):
+        tokens = set(_NON_WORD.sub(' ', text.lower()).split())
+        token_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+        offsets[i + 1] = len(token_ids)
+
+    # +1/-1 per bit for every vocabulary token, from a stable 64-bit hash
+    token_hashes = np.array([hash_token(token) for token in vocabulary], dtype=np.uint64)
+    bit_signs = ((token_hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)).astype(np.int8) * 2 - 1
+
+    token_ids = np.asarray(token_ids, dtype=np.int64)
+    weights = np.uint64(1) << np.arange(64, dtype=np.uint64)
+    result = np.zeros(len(texts), dtype=np.uint64)
+    for start in range(0, len(texts), SIMHASH_CHUNK_ROWS):
+        end = min(start + SIMHASH_CHUNK_ROWS, len(texts))
+        lo, hi = offsets[start], offsets[end]
+        if hi == lo:
+            continue
+        # reduceat needs every start index in bounds, so trailing empty ranges are clamped;
+        # it also repeats the next row for empty ranges, so those are zeroed afterwards
+        starts = np.minimum(offsets[start:end] - lo, hi - lo - 1)
+        sums = np.add.reduceat(bit_signs[token_ids[lo:hi]].astype(np.int32), starts, axis=0)
+        empty = offsets[start + 1:end + 1] == offsets[start:end]
+        sums[empty] = 0
+        result[start:end] = ((sums > 0).astype(np.uint64) * weights).sum(axis=1, dtype=np.uint64)
+    return result
+
+def hash_token(token: str) -> int:
+    """Stable 64-bit FNV-1a (Python's hash() is salted per process)"""
+    h = 0xcbf29ce484222325
+    for byte in token.encode('utf-8'):
+        h = ((h ^ byte) * 0x100000001b3) & 0xffffffffffffffff
+    return h
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    return np.unpackbits(values.astype('>u8').view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+def _lower_column(products_df: pd.DataFrame, column: str) -> np.ndarray:
+    if column not in products_df.columns:
+        return np.full(len(products_df), '', dtype=object)
+    return products_df[column].fillna('').astype(str).str.lower().to_numpy(dtype=object)
+
+def _prices_close(a: float, b: float) -> bool:
+    if a != a or b != b:
+        return a != a and b != b
+    low, high = min(a, b), max(a, b)
+    return low > 0 and high <= low * DEDUP_PRICE_RATIO
+
+def _prices_close_array(anchor: float, prices: np.ndarray) -> np.ndarray:
+    if anchor != anchor:
+        return np.isnan(prices)
+    with np.errstate(invalid='ignore'):
+        low, high = np.minimum(prices, anchor), np.maximum(prices, anchor)
+        return (low > 0) & (high <= low * DEDUP_PRICE_RATIO)
+
+def cluster_products(products_df: pd.DataFrame, max_hamming: int = DEDUP_MAX_HAMMING) -> np.ndarray:
+    """Cluster id per row (the lowest row position in its cluster)"""
+    n = len(products_df)
+    categories = _lower_column(products_df, 'main_category') + '|' + _lower_column(products_df, 'sub_category')
+    names = products_df['name'].fillna('').astype(str).tolist() if 'name' in products_df.columns else [''] * n
+    prices = parse_prices(products_df).astype(np.float64)
+
+    # Pass 1: identical normalised names within a category. A name that normalises to
+    # nothing carries no evidence, so it gets a key of its own.
+    name_keys = [name_key(name) for name in names]
+    codes, _ = pd.factorize(pd.Series([f"{category}|{key}" if key else f"#{row}"
+                                       for row, (category, key) in enumerate(zip(categories, name_keys))]))
+
+    # Split each key by price: walking a key's rows from cheapest, a row joins the current
+    # group while it is within DEDUP_PRICE_RATIO of the group's cheapest row
+    groups = np.empty(n, dtype=np.int64)
+    group_count, previous_code, anchor_price = 0, None, None
+    code_list, price_list = codes.tolist(), prices.tolist()
+    for row in np.lexsort((prices, codes)).tolist():
+        code, price = code_list[row], price_list[row]
+        if code != previous_code or not _prices_close(anchor_price, price):
+            group_count += 1
+            previous_code, anchor_price = code, price
+        groups[row] = group_count - 1
+    first = np.full(group_count, n, dtype=np.int64)
+    np.minimum.at(first, groups, np.arange(n))
+    if max_hamming <= 0 or group_count < 2:
+        return first[groups]
+
+    # Pass 2: SimHash over the names of the pass-1 groups, candidates from shared LSH bands.
+    # A group only joins a leader that has not itself joined another, so near matches of a
+    # follower cannot chain onto its cluster. A leader that is absorbed brings its followers.
+    leader = np.arange(group_count)
+    followers: Dict[int, List[int]] = {}
+    hashes = simhashes([names[row] for row in first])
+    mergeable = np.array([bool(name_keys[row]) for row in first])
+    group_categories = categories[first]
+    group_prices = np.full(group_count, np.nan)
+    np.fmin.at(group_prices, groups, prices)
+    band_bits = 64 // SIMHASH_BANDS
+    for band in range(SIMHASH_BANDS):
+        band_values = (hashes >> np.uint64(band * band_bits)) & np.uint64((1 << band_bits) - 1)
+        order = np.argsort(band_values, kind='stable')
+        sorted_values = band_values[order]
+        starts = np.flatnonzero(np.r_[True, sorted_values[1:] != sorted_values[:-1]])
+        for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+            if end - start < 2:
+                continue
+            members = np.sort(order[start:end])
+            anchors = members if end - start <= MAX_PAIRWISE_BUCKET else members[:1]
+            for a in anchors:
+                if leader[a] != a or not mergeable[a]:
+                    continue
+                others = members[members > a]
+                others = others[(leader[others] == others) & mergeable[others]
+                                & (group_categories[others] == group_categories[a])]
+                if len(others):
+                    close = others[(_popcount(hashes[others] ^ hashes[a]) <= max_hamming)
+                                   & _prices_close_array(group_prices[a], group_prices[others])]
+                    for b in close.tolist():
+                        moved = [b] + followers.pop(b, [])
+                        leader[moved] = a
+                        followers.setdefault(int(a), []).extend(moved)
+    # Name each cluster after its lowest row; group order follows price, not row position
+    cluster_first = np.full(group_count, n, dtype=np.int64)
+    np.minimum.at(cluster_first, leader, first)
+    return cluster_first[leader[groups]]
+
+class DedupResult:
+    """Representatives, their variants, and what the collapse saved"""
+
+    def __init__(self, products_df: pd.DataFrame, keep: np.ndarray, clusters: np.ndarray, positions: np.ndarray,
+                 variants: Dict[int, List[Dict[str, str]]], seconds: float):
+        self.products_df = products_df
+        self.keep = keep
+        self.clusters = clusters
+        # Row of products_df that each original row is now represented by
+        self.positions = positions
+        self.variants = variants
+        self.seconds = seconds
+
+    def stats(self) -> Dict:
+        before, after = len(self.clusters), len(self.keep)
+        return {
+            "rows_before": before,
+            "rows_after": after,
+            "reduction": round(1 - after / before, 4) if before else 0.0,
+            "clusters_with_variants": len(self.variants),
+            "seconds": round(self.seconds, 3),
+        }
+
+def collapse_duplicates(products_df: pd.DataFrame, max_hamming: int = DEDUP_MAX_HAMMING,
+                        product_ids: Optional[np.ndarray] = None) -> DedupResult:
+    """One representative row per cluster; variants maps new row position -> the other listings
+
+    With product_ids (catalog.assign_product_ids, one per row), each variant also
+    carries its product_id.
+    """
+    start = time.perf_counter()
+    products_df = products_df.reset_index(drop=True)
+    clusters = cluster_products(products_df, max_hamming)
+
+    # Representative: most ratings, then best rating, then first seen
+    rank = pd.DataFrame({
+        "cluster": clusters,
+        "count": np.nan_to_num(parse_rating_counts(products_df), nan=-1),
+        "rating": np.nan_to_num(parse_ratings(products_df), nan=-1),
+        "row": np.arange(len(products_df)),
+    }).sort_values(["cluster", "count", "rating", "row"], ascending=[True, False, False, True])
+    representatives = rank.drop_duplicates("cluster")
+    keep = np.sort(representatives["row"].to_numpy())
+
+    # New row position of each cluster's representative, indexed by cluster id
+    target = np.zeros(len(products_df), dtype=np.int64)
+    target[representatives["cluster"].to_numpy()] = np.searchsorted(keep, representatives["row"].to_numpy())
+    dropped = np.setdiff1d(np.arange(len(products_df)), keep, assume_unique=True)
+    fields = [col for col in VARIANT_FIELDS if col in products_df.columns]
+    variants: Dict[int, List[Dict[str, str]]] = {}
+    records = products_df.iloc[dropped][fields].to_dict('records')
+    dropped_ids = [product_id.decode('utf-8') for product_id in product_ids[dropped]] if product_ids is not None else None
+    for n, (position, record) in enumerate(zip(target[clusters[dropped]].tolist(), records)):
+        variant = {field: str(value) for field, value in record.items() if pd.notnull(value)}
+        if dropped_ids is not None:
+            variant['product_id'] = dropped_ids[n]
+        variants.setdefault(position, []).append(variant)
+
+    deduped = products_df.iloc[keep].reset_index(drop=True)
+    return DedupResult(deduped, keep, clusters, target[clusters], variants, time.perf_counter() - start)
+
+def duplicate_share(result_rows: List[int], clusters: np.ndarray) -> float:
+    """Share of results whose cluster already appeared earlier in the list"""
+    if not result_rows:
+        return 0.0
+    seen, duplicates = set(), 0
+    for row in result_rows:
+        cluster = clusters[row]
+        duplicates += cluster in seen
+        seen.add(cluster)
+    return duplicates / len(result_rows)
+
+def maybe_collapse(products_df: pd.DataFrame, product_ids: Optional[np.ndarray] = None) -> Optional[DedupResult]:
+    """collapse_duplicates when DEDUP_PRODUCTS=1, else None"""
+    if not DEDUP_PRODUCTS:
+        return None
+    result = collapse_duplicates(products_df, product_ids=product_ids)
+    print(f"Collapsed duplicates: {result.stats()}")
+    return result
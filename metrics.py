@@ -0,0 +1,201 @@
+"""
+Per-stage latency spans and Prometheus metrics for the API services
+
+Wrap a stage in `with span("encode_query"):` to record its duration in the
+gift_stage_duration_seconds histogram. MetricsMiddleware times whole
+requests and, when ENABLE_SERVER_TIMING=1, returns the request's spans in a
+Server-Timing header. Metrics live in process memory, so with several
+uvicorn workers each worker exposes its own series on /metrics.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+
+ENABLE_SERVER_TIMING = os.getenv('ENABLE_SERVER_TIMING', '0') == '1'
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Spans recorded during the current request, or None outside a request
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar('request_spans', default=None)
+
+def _format_labels(label_names: Sequence[str], label_values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            else:
+                state[len(self.buckets)] += 1
+            state[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+                cumulative += state[len(self.buckets)]
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(state[-1])}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+stage_duration = Histogram(
+    'gift_stage_duration_seconds', 'Time spent in each request stage', ['stage'])
+request_duration = Histogram(
+    'gift_http_request_duration_seconds', 'HTTP request latency', ['method', 'route', 'status'])
+requests_total = Counter(
+    'gift_http_requests_total', 'HTTP requests served', ['method', 'route', 'status'])
+cache_requests_total = Counter(
+    'gift_cache_requests_total', 'Cache lookups by cache and result', ['cache', 'result'])
+upstream_requests_total = Counter(
+    'gift_upstream_requests_total', 'OpenRouter requests by HTTP status', ['status'])
+upstream_errors_total = Counter(
+    'gift_upstream_errors_total', 'OpenRouter requests that failed, by status code or exception', ['reason'])
+llm_tokens_total = Counter(
+    'gift_llm_tokens_total', 'Tokens reported by OpenRouter usage', ['kind'])
+
+REGISTRY = [
+    stage_duration,
+    request_duration,
+    requests_total,
+    cache_requests_total,
+    upstream_requests_total,
+    upstream_errors_total,
+    llm_tokens_total,
+]
+
+@contextmanager
+def span(stage: str):
+    """Time a block as one request stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_duration.observe(elapsed, stage=stage)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((stage, elapsed))
+
+def record_cache(cache: str, hit: bool):
+    cache_requests_total.inc(cache=cache, result='hit' if hit else 'miss')
+
+def record_upstream_response(response):
+    """Count an OpenRouter response, its errors and its token usage"""
+    upstream_requests_total.inc(status=response.status_code)
+    if response.status_code != 200:
+        upstream_errors_total.inc(reason=response.status_code)
+        return
+    try:
+        usage = response.json().get('usage') or {}
+    except Exception:
+        return
+    for kind in ('prompt_tokens', 'completion_tokens'):
+        if usage.get(kind):
+            llm_tokens_total.inc(usage[kind], kind=kind.replace('_tokens', ''))
+
+def record_upstream_exception(error: Exception):
+    upstream_errors_total.inc(reason=type(error).__name__)
+
+def render_latest() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+def server_timing_header(spans: List[Tuple[str, float]]) -> str:
+    """Server-Timing value with the durations of repeated stages summed"""
+    totals: Dict[str, float] = {}
+    for stage, elapsed in spans:
+        totals[stage] = totals.get(stage, 0.0) + elapsed
+    return ', '.join(f"{stage};dur={elapsed * 1000:.2f}" for stage, elapsed in totals.items())
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency and collecting per-request spans"""
+
+    def __init__(self, app, server_timing: bool = ENABLE_SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        spans: List[Tuple[str, float]] = []
+        token = _request_spans.set(spans)
+        start = time.perf_counter()
+        status = {'code': 500}
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+                if self.server_timing and spans:
+                    headers = list(message.get('headers', []))
+                    headers.append((b'server-timing', server_timing_header(spans).encode('latin-1')))
+                    message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_spans.reset(token)
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            elapsed = time.perf_counter() - start
+            request_duration.observe(elapsed, method=scope['method'], route=route_path, status=status['code'])
+            requests_total.inc(method=scope['method'], route=route_path, status=status['code'])
@@ -0,0 +1,285 @@
+"""
+OpenRouter chat-completions client and the prompt builders shared by the
+recommendation service and the slim serverless entry point
+"""
+
+import os
+import json
+import re
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import record_upstream_exception, record_upstream_response, span
+from schemas import RecipientProfile, OccasionInfo
+
+# Load environment variables from .env.local if it exists
+if os.path.exists('.env.local'):
+    load_dotenv('.env.local')
+
+OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
+OPENROUTER_API_URL = os.getenv('OPENROUTER_API_URL', "https://openrouter.ai/api/v1/chat/completions")
+MODEL = "google/gemini-2.0-flash-exp:free"
+# Bulk card/note generation: items per LLM call, concurrent calls, retries for items missing from a reply
+CARD_BATCH_SIZE = int(os.getenv('CARD_BATCH_SIZE', '20'))
+CARD_BATCH_CONCURRENCY = int(os.getenv('CARD_BATCH_CONCURRENCY', '4'))
+CARD_BATCH_RETRIES = int(os.getenv('CARD_BATCH_RETRIES', '1'))
+CARD_BATCH_MAX_ITEMS = int(os.getenv('CARD_BATCH_MAX_ITEMS', '500'))
+
+def chat_completion(messages: List[Dict[str, str]], max_tokens: int, temperature: float) -> requests.Response:
+    """POST a chat-completions request and return the raw response"""
+    headers = {
+        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+        "HTTP-Referer": "http://localhost:8000",
+        "X-Title": "Gift Recommendation AI"
+    }
+    data = {
+        "model": MODEL,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+    with span("openrouter"):
+        try:
+            response = requests.post(OPENROUTER_API_URL, headers=headers, json=data)
+        except Exception as e:
+            record_upstream_exception(e)
+            raise
+    record_upstream_response(response)
+    return response
+
+def analyze_recipient_from_prompt(prompt: str) -> RecipientProfile:
+    """Extract recipient information from prompt using AI"""
+    try:
+        system_prompt = """
+        You are an expert at analyzing gift requests. Extract detailed information about the recipient from the user's prompt.
+        Return a JSON object with these fields:
+        - age: number or null
+        - gender: string or null
+        - interests: array of strings
+        - hobbies: array of strings
+        - relationship: string
+        - personality: array of strings
+        - lifestyle: array of strings
+        - preferences: array of strings
+        """
+
+        response = chat_completion(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Analyze this gift request: {prompt}"}
+            ],
+            max_tokens=1000,
+            temperature=0.3,
+        )
+        if response.status_code == 200:
+            result = response.json()
+            analysis_text = result['choices'][0]['message']['content']
+            # Try to parse JSON from the response
+            try:
+                analysis = json.loads(analysis_text)
+                return RecipientProfile(**analysis)
+            except:
+                # Fallback to basic extraction
+                return RecipientProfile(relationship="friend")
+        return RecipientProfile(relationship="friend")
+    except Exception as e:
+        print(f"Error analyzing recipient: {e}")
+        return RecipientProfile(relationship="friend")
+
+def build_recommendation_messages(prompt: str, recipient_profile: RecipientProfile, occasion_info: OccasionInfo, products_text: str, n: int) -> List[Dict[str, str]]:
+    """Chat messages asking the LLM to pick and explain the best n products"""
+    # Enhanced system prompt with explainability
+    system_prompt = f"""
+    You are an expert gift recommendation AI. Given a user prompt and a list of products, select the {n} most suitable products for the user.
+
+    Recipient Profile:
+    - Age: {recipient_profile.age or 'Not specified'}
+    - Interests: {', '.join(recipient_profile.interests) or 'Not specified'}
+    - Hobbies: {', '.join(recipient_profile.hobbies) or 'Not specified'}
+    - Relationship: {recipient_profile.relationship or 'Not specified'}
+    - Personality: {', '.join(recipient_profile.personality) or 'Not specified'}
+
+    Occasion: {occasion_info.occasion}
+    Mood: {occasion_info.mood or 'Not specified'}
+
+    For each recommendation, include:
+    1. Product name
+    2. Why this gift is perfect (explainability)
+    3. How it matches the recipient's profile
+    4. Why it fits the occasion
+
+    Only recommend products from the provided list.
+    """
+
+    user_prompt = f"User prompt: {prompt}\n\nProduct list:\n{products_text}\n\nReturn a numbered list of the top {n} product recommendations with detailed explanations."
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+def build_enhanced_prompt(prompt: str, recipient_profile: RecipientProfile, occasion_info: OccasionInfo) -> str:
+    """Query text for the embedding model, enriched with recipient and occasion info"""
+    enhanced_prompt = f"{prompt}"
+    if recipient_profile:
+        enhanced_prompt += f" Recipient: {recipient_profile.interests} {recipient_profile.hobbies} {recipient_profile.personality}"
+    if occasion_info:
+        enhanced_prompt += f" Occasion: {occasion_info.occasion} {occasion_info.mood}"
+    return enhanced_prompt
+
+def generate_greeting_card(recipient_name: str, occasion: str, message_style: str, personal_message: str = None) -> Dict[str, str]:
+    """Generate AI greeting card content"""
+    try:
+        system_prompt = f"""
+        You are an expert greeting card writer. Create a personalized greeting card for {occasion}.
+        Style: {message_style}
+        Recipient: {recipient_name}
+        Personal message: {personal_message or 'None provided'}
+
+        Return a JSON object with:
+        - title: card title
+        - message: main greeting message
+        - signature: suggested signature
+        """
+
+        response = chat_completion(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Create a {message_style} greeting card for {recipient_name} for {occasion}"}
+            ],
+            max_tokens=500,
+            temperature=0.7,
+        )
+        if response.status_code == 200:
+            result = response.json()
+            card_text = result['choices'][0]['message']['content']
+            try:
+                return json.loads(card_text)
+            except:
+                return {
+                    "title": f"Happy {occasion}!",
+                    "message": card_text,
+                    "signature": "With love"
+                }
+        return {"title": "Greeting Card", "message": "Happy occasion!", "signature": "Best wishes"}
+    except Exception as e:
+        print(f"Error generating greeting card: {e}")
+        return {"title": "Greeting Card", "message": "Happy occasion!", "signature": "Best wishes"}
+
+def generate_thank_you_note(gift_name: str, sender_name: str, occasion: str, message_style: str) -> str:
+    """Generate thank you note"""
+    try:
+        system_prompt = f"""
+        You are an expert at writing thank you notes. Create a {message_style} thank you note.
+        Gift: {gift_name}
+        Sender: {sender_name}
+        Occasion: {occasion}
+        """
+
+        response = chat_completion(
+            [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Write a {message_style} thank you note for {gift_name} from {sender_name}"}
+            ],
+            max_tokens=300,
+            temperature=0.7,
+        )
+        if response.status_code == 200:
+            result = response.json()
+            return result['choices'][0]['message']['content']
+        return f"Thank you so much for the {gift_name}! It's perfect for {occasion}."
+    except Exception as e:
+        print(f"Error generating thank you note: {e}")
+        return f"Thank you for the {gift_name}!"
+
+def _parse_json_array(text: str) -> List[Any]:
+    """A JSON array from an LLM reply, tolerating a ```json fence around it"""
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, flags=re.DOTALL)
+    parsed = json.loads(fenced.group(1) if fenced else text)
+    if isinstance(parsed, dict):
+        parsed = next((value for value in parsed.values() if isinstance(value, list)), [])
+    return parsed if isinstance(parsed, list) else []
+
+def _generate_in_batches(items: List[Dict[str, Any]], system_prompt: str, fields: List[str],
+                         tokens_per_item: int, fallback: Callable[[Dict[str, Any]], Any],
+                         convert: Callable[[Dict[str, Any]], Any]) -> List[Any]:
+    """Generate one result per item with CARD_BATCH_SIZE items per LLM call
+
+    Each call sends the items as a JSON array tagged with "id" and expects a
+    JSON array of objects carrying the same ids and the given fields back.
+    Items missing or malformed in a reply are retried in later calls, up to
+    CARD_BATCH_RETRIES times, and then get their fallback.
+    """
+    results: List[Optional[Any]] = [None] * len(items)
+
+    def run_chunk(indices: List[int]):
+        payload = [{"id": n, **items[i]} for n, i in enumerate(indices)]
+        try:
+            response = chat_completion(
+                [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": json.dumps(payload)}
+                ],
+                max_tokens=min(8192, tokens_per_item * len(indices)),
+                temperature=0.7,
+            )
+            if response.status_code != 200:
+                print(f"Batch generation error: {response.status_code} - {response.text}")
+                return
+            replies = _parse_json_array(response.json()['choices'][0]['message']['content'])
+        except Exception as e:
+            print(f"Batch generation error: {e}")
+            return
+        for reply in replies:
+            if not isinstance(reply, dict) or not all(isinstance(reply.get(field), str) for field in fields):
+                continue
+            n = reply.get('id')
+            if isinstance(n, int) and 0 <= n < len(indices) and results[indices[n]] is None:
+                results[indices[n]] = convert(reply)
+
+    pending = list(range(len(items)))
+    with ThreadPoolExecutor(max_workers=CARD_BATCH_CONCURRENCY) as pool:
+        for _ in range(CARD_BATCH_RETRIES + 1):
+            chunks = [pending[start:start + CARD_BATCH_SIZE] for start in range(0, len(pending), CARD_BATCH_SIZE)]
+            list(pool.map(run_chunk, chunks))
+            pending = [i for i in pending if results[i] is None]
+            if not pending:
+                break
+    for i in pending:
+        results[i] = fallback(items[i])
+    return results
+
+def generate_greeting_cards(cards: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """generate_greeting_card for many cards (recipient_name, occasion, message_style, personal_message) at once"""
+    system_prompt = """
+    You are an expert greeting card writer. The user sends a JSON array of card requests, each with an id,
+    recipient_name, occasion, message_style and an optional personal_message. Write one personalized card per request.
+
+    Return only a JSON array with one object per request:
+    - id: the request id
+    - title: card title
+    - message: main greeting message
+    - signature: suggested signature
+    """
+    return _generate_in_batches(
+        cards, system_prompt, ["title", "message", "signature"], tokens_per_item=400,
+        fallback=lambda card: {"title": "Greeting Card", "message": "Happy occasion!", "signature": "Best wishes"},
+        convert=lambda reply: {"title": reply["title"], "message": reply["message"], "signature": reply["signature"]},
+    )
+
+def generate_thank_you_notes(notes: List[Dict[str, Any]]) -> List[str]:
+    """generate_thank_you_note for many notes (gift_name, sender_name, occasion, message_style) at once"""
+    system_prompt = """
+    You are an expert at writing thank you notes. The user sends a JSON array of note requests, each with an id,
+    gift_name, sender_name, occasion and message_style. Write one thank you note per request in its style.
+
+    Return only a JSON array with one object per request:
+    - id: the request id
+    - note: the thank you note
+    """
+    return _generate_in_batches(
+        notes, system_prompt, ["note"], tokens_per_item=250,
+        fallback=lambda note: f"Thank you so much for the {note['gift_name']}! It's perfect for {note['occasion']}.",
+        convert=lambda reply: reply["note"],
+    )
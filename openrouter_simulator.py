@@ -0,0 +1,258 @@
+"""
+Local stand-in for the OpenRouter chat-completions endpoint
+
+Point the services at it for offline, reproducible performance runs:
+
+    python openrouter_simulator.py --port 8100 --latency lognormal:800:0.4 --tokens-per-sec 60 --rate-429 0.02
+    OPENROUTER_API_URL=http://localhost:8100/api/v1/chat/completions uvicorn recommendation_service:app
+
+Replies are canned but shaped like the real ones (recipient-analysis JSON,
+greeting-card JSON, thank-you text, numbered recommendation lists built from
+the products in the prompt, and JSON arrays for batched cards and notes, with
+--batch-drop leaving items out to exercise client retries). Latency, error injection and output are all
+derived from a hash of (seed, request body, how often that body was seen),
+so the same request sequence gets the same answers on every run regardless
+of concurrency, and a retried request gets a fresh draw.
+
+Latency specs: fixed:<ms>, uniform:<min_ms>:<max_ms>, normal:<mean_ms>:<sd_ms>,
+lognormal:<median_ms>:<sigma>. Total latency is the drawn time to first token
+plus completion tokens at --tokens-per-sec; with "stream": true the tokens
+are sent as server-sent events at that rate.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+config = {
+    "latency": os.getenv('SIM_LATENCY', 'lognormal:600:0.4'),
+    "tokens_per_sec": float(os.getenv('SIM_TOKENS_PER_SEC', '80')),
+    "rate_429": float(os.getenv('SIM_RATE_429', '0')),
+    "rate_5xx": float(os.getenv('SIM_RATE_5XX', '0')),
+    "seed": int(os.getenv('SIM_SEED', '0')),
+    "batch_drop": float(os.getenv('SIM_BATCH_DROP', '0')),
+}
+
+app = FastAPI()
+
+_seen_lock = threading.Lock()
+_seen: Counter = Counter()
+stats: Counter = Counter()
+
+INTERESTS = ["gaming", "fitness", "yoga", "coffee", "reading", "cooking", "fashion", "music",
+             "travel", "photography", "gardening", "technology", "art", "hiking"]
+RELATIONSHIPS = ["brother", "sister", "girlfriend", "boyfriend", "colleague", "friend",
+                 "mother", "father", "wife", "husband", "son", "daughter"]
+
+def parse_latency(spec: str):
+    """Return a function rng -> seconds for a latency spec"""
+    kind, *params = spec.split(':')
+    values = [float(p) for p in params]
+    if kind == 'fixed':
+        return lambda rng: values[0] / 1000
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1]) / 1000
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1])) / 1000
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1]) / 1000
+    raise ValueError(f"Unknown latency spec: {spec}")
+
+def request_rng(body: bytes) -> random.Random:
+    """Deterministic RNG for this body and its occurrence count"""
+    digest = hashlib.sha256(body).hexdigest()
+    with _seen_lock:
+        occurrence = _seen[digest]
+        _seen[digest] += 1
+    seed = hashlib.sha256(f"{config['seed']}:{digest}:{occurrence}".encode()).digest()
+    return random.Random(int.from_bytes(seed[:8], 'big'))
+
+def count_tokens(text: str) -> int:
+    """Rough token count: about 4 characters per token, like most BPE vocabularies"""
+    return max(1, len(text) // 4)
+
+def canned_reply(messages: List[Dict[str, str]], rng: random.Random) -> str:
+    system = next((m['content'] for m in messages if m.get('role') == 'system'), '')
+    user = next((m['content'] for m in reversed(messages) if m.get('role') == 'user'), '')
+
+    if 'JSON array of' in system:
+        return batch_reply(system, user, rng)
+
+    if 'analyzing gift requests' in system:
+        lowered = user.lower()
+        interests = [word for word in INTERESTS if word in lowered] or rng.sample(INTERESTS, 2)
+        age = re.search(r'(\d{1,2})[- ]year', lowered)
+        return json.dumps({
+            "age": int(age.group(1)) if age else None,
+            "gender": None,
+            "interests": interests,
+            "hobbies": rng.sample(INTERESTS, 1),
+            "relationship": next((r for r in RELATIONSHIPS if r in lowered), "friend"),
+            "personality": ["thoughtful"],
+            "lifestyle": ["active"] if rng.random() < 0.5 else ["relaxed"],
+            "preferences": [],
+        })
+
+    if 'greeting card writer' in system:
+        return json.dumps({
+            "title": rng.choice(["Celebrating You!", "Happy Day!", "Warmest Wishes"]),
+            "message": f"{user} — wishing you joy, laughter and everything you love.",
+            "signature": rng.choice(["With love", "Best wishes", "Cheers"]),
+        })
+
+    if 'thank you notes' in system:
+        return f"Thank you so much! {user.replace('Write a', 'This was a').rstrip('.')} — it truly made my day."
+
+    if 'gift recommendation AI' in system:
+        wanted = re.search(r'top (\d+) product', user)
+        count = int(wanted.group(1)) if wanted else 10
+        names = re.findall(r'^name: ([^,\n]+)', user, flags=re.MULTILINE)
+        lines = []
+        for i, name in enumerate(names[:count], start=1):
+            lines.append(f"{i}. {name}\n   Why: a thoughtful match for the recipient's interests.\n"
+                         f"   Profile fit: {rng.randint(6, 10)}/10. Occasion fit: {rng.randint(6, 10)}/10.")
+        return '\n'.join(lines) or "No suitable products were provided."
+
+    return "This is a simulated response."
+
+def batch_reply(system: str, user: str, rng: random.Random) -> str:
+    """JSON array answering a batched card or note request, item by item"""
+    try:
+        items = json.loads(user)
+    except json.JSONDecodeError:
+        return "[]"
+    replies = []
+    for item in items:
+        if rng.random() < config["batch_drop"]:
+            continue
+        if 'greeting card writer' in system:
+            replies.append({
+                "id": item.get('id'),
+                "title": rng.choice(["Celebrating You!", "Happy Day!", "Warmest Wishes"]),
+                "message": f"Dear {item.get('recipient_name')}, wishing you a wonderful {item.get('occasion')}!",
+                "signature": rng.choice(["With love", "Best wishes", "Cheers"]),
+            })
+        else:
+            replies.append({
+                "id": item.get('id'),
+                "note": f"Dear {item.get('sender_name')}, thank you so much for the {item.get('gift_name')} — "
+                        f"it made my {item.get('occasion')} truly special.",
+            })
+    return json.dumps(replies)
+
+def error_response(rng: random.Random):
+    roll = rng.random()
+    if roll < config["rate_429"]:
+        stats["429"] += 1
+        return JSONResponse(status_code=429, headers={"Retry-After": "1"},
+                            content={"error": {"code": 429, "message": "Rate limit exceeded (simulated)"}})
+    if roll < config["rate_429"] + config["rate_5xx"]:
+        status = rng.choice([500, 502, 503])
+        stats[str(status)] += 1
+        return JSONResponse(status_code=status,
+                            content={"error": {"code": status, "message": "Upstream error (simulated)"}})
+    return None
+
+@app.post("/api/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.body()
+    payload = json.loads(body or b'{}')
+    rng = request_rng(body)
+    stats["requests"] += 1
+
+    first_token_s = parse_latency(config["latency"])(rng)
+    error = error_response(rng)
+    if error is not None:
+        await asyncio.sleep(first_token_s)
+        return error
+
+    messages = payload.get('messages', [])
+    content = canned_reply(messages, rng)
+    completion_tokens = count_tokens(content)
+    max_tokens = payload.get('max_tokens')
+    if max_tokens and completion_tokens > max_tokens:
+        content = content[:max_tokens * 4]
+        completion_tokens = max_tokens
+    prompt_tokens = sum(count_tokens(m.get('content', '')) for m in messages)
+    completion_id = f"gen-sim-{uuid.UUID(int=rng.getrandbits(128)).hex[:24]}"
+    model = payload.get('model', 'simulated')
+    stats["completion_tokens"] += completion_tokens
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+             "total_tokens": prompt_tokens + completion_tokens}
+
+    if payload.get('stream'):
+        return StreamingResponse(stream_tokens(completion_id, model, content, first_token_s, usage),
+                                 media_type='text/event-stream')
+
+    generation_s = completion_tokens / config["tokens_per_sec"] if config["tokens_per_sec"] > 0 else 0
+    await asyncio.sleep(first_token_s + generation_s)
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+async def stream_tokens(completion_id: str, model: str, content: str, first_token_s: float, usage: Dict):
+    await asyncio.sleep(first_token_s)
+    chunk_chars = 16  # ~4 tokens per event
+    delay = (chunk_chars / 4) / config["tokens_per_sec"] if config["tokens_per_sec"] > 0 else 0
+    for start in range(0, len(content), chunk_chars):
+        event = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "model": model,
+            "choices": [{"index": 0, "delta": {"content": content[start:start + chunk_chars]}, "finish_reason": None}],
+        }
+        yield f"data: {json.dumps(event)}\n\n"
+        await asyncio.sleep(delay)
+    final = {"id": completion_id, "object": "chat.completion.chunk", "model": model,
+             "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+    yield f"data: {json.dumps(final)}\n\n"
+    yield "data: [DONE]\n\n"
+
+@app.get("/stats")
+def get_stats():
+    return {"config": config, "stats": dict(stats)}
+
+@app.post("/reset")
+def reset():
+    """Forget seen requests and counters so a run can be replayed from scratch"""
+    with _seen_lock:
+        _seen.clear()
+    stats.clear()
+    return {"reset": True}
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Deterministic OpenRouter simulator")
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--latency', type=str, default=config["latency"], help='Time-to-first-token distribution')
+    parser.add_argument('--tokens-per-sec', type=float, default=config["tokens_per_sec"], help='Generation rate')
+    parser.add_argument('--rate-429', type=float, default=config["rate_429"], help='Share of requests answered 429')
+    parser.add_argument('--rate-5xx', type=float, default=config["rate_5xx"], help='Share answered 500/502/503')
+    parser.add_argument('--seed', type=int, default=config["seed"])
+    parser.add_argument('--batch-drop', type=float, default=config["batch_drop"], help='Share of batch items left out of replies')
+    args = parser.parse_args()
+
+    parse_latency(args.latency)  # fail fast on a bad spec
+    config.update(latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+                  rate_429=args.rate_429, rate_5xx=args.rate_5xx, seed=args.seed, batch_drop=args.batch_drop)
+    uvicorn.run(app, host="0.0.0.0", port=args.port)
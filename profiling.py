@@ -0,0 +1,146 @@
+"""
+On-demand statistical profiling of individual requests
+
+A request is profiled when it carries an `X-Profile` header equal to
+PROFILE_TOKEN, or when the admin toggle has switched on sampling of a
+fraction of requests. Endpoints decorated with @profiled then run with a
+sampler thread that snapshots the handler's stack every PROFILE_INTERVAL_MS
+and writes collapsed stacks ("frame;frame;frame count", the input format of
+flamegraph.pl, inferno and speedscope) to PROFILE_DIR. At most one profile
+is taken per PROFILE_MIN_INTERVAL seconds. With profiling off, the cost per
+request is a header lookup and a ContextVar read.
+"""
+
+import functools
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+PROFILE_MIN_INTERVAL = float(os.getenv('PROFILE_MIN_INTERVAL', '10'))
+
+# Admin toggle: fraction of requests to profile without a header
+settings = {"sample_rate": 0.0}
+
+_profile_request: ContextVar[Optional[Dict]] = ContextVar('profile_request', default=None)
+_slot_lock = threading.Lock()
+_last_profile_at = 0.0
+
+class StackSampler(threading.Thread):
+    """Samples one thread's Python stack at a fixed interval"""
+
+    def __init__(self, thread_id: int, interval_ms: float = PROFILE_INTERVAL_MS):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def write_collapsed(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+def _acquire_slot() -> bool:
+    """Rate limit: allow one profile per PROFILE_MIN_INTERVAL seconds"""
+    global _last_profile_at
+    with _slot_lock:
+        now = time.monotonic()
+        if now - _last_profile_at < PROFILE_MIN_INTERVAL:
+            return False
+        _last_profile_at = now
+        return True
+
+def check_admin_token(token: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and bool(token) and hmac.compare_digest(token, PROFILE_TOKEN)
+
+def profiled(func):
+    """Profile the wrapped (sync) endpoint when the current request asked for it"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        request = _profile_request.get()
+        # The slot is only taken here, so requests to routes that are not @profiled never use it up
+        if request is None or not _acquire_slot():
+            return func(*args, **kwargs)
+
+        sampler = StackSampler(threading.get_ident())
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            sampler.stop()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            name = f"{datetime.now().strftime('%Y%m%dT%H%M%S')}-{func.__name__}-{request['id']}.folded"
+            sampler.write_collapsed(os.path.join(PROFILE_DIR, name))
+            request['file'] = name
+            print(f"Profiled {func.__name__} in {time.perf_counter() - start:.3f}s "
+                  f"({sum(sampler.samples.values())} samples) -> {name}")
+    return wrapper
+
+def list_profiles(limit: int = 50) -> List[str]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    return sorted(os.listdir(PROFILE_DIR), reverse=True)[:limit]
+
+class ProfilingMiddleware:
+    """Decides per request whether @profiled endpoints should be sampled"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not (PROFILE_TOKEN or settings["sample_rate"] > 0):
+            await self.app(scope, receive, send)
+            return
+
+        requested = False
+        for key, value in scope.get('headers', []):
+            if key == b'x-profile':
+                requested = check_admin_token(value.decode('latin-1'))
+                break
+        if not requested and settings["sample_rate"] > 0:
+            requested = random.random() < settings["sample_rate"]
+        if not requested:
+            await self.app(scope, receive, send)
+            return
+
+        request = {"id": f"{random.getrandbits(32):08x}", "file": None}
+        token = _profile_request.set(request)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start' and request['file']:
+                headers = list(message.get('headers', []))
+                headers.append((b'x-profile-file', request['file'].encode('latin-1')))
+                message = {**message, 'headers': headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _profile_request.reset(token)
@@ -0,0 +1,139 @@
+"""
+Query encoder backends for the recommendation service.
+
+The default backend is the PyTorch SentenceTransformer. Setting
+EMBEDDING_BACKEND=onnx switches to an int8-quantized ONNX export of the same
+model running on onnxruntime, which never imports torch.
+
+Export the ONNX model once (this step does need torch and transformers):
+    python query_encoder.py export --output artifacts/onnx-minilm
+"""
+
+import os
+from typing import List, Union
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_BACKEND = os.getenv('EMBEDDING_BACKEND', 'torch')
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', 'artifacts/onnx-minilm')
+ONNX_MODEL_FILE = 'model_quantized.onnx'
+EMBEDDING_DIM = 384
+MAX_SEQ_LENGTH = 256  # all-MiniLM-L6-v2 truncates at 256 word pieces
+
+class OnnxQueryEncoder:
+    """Drop-in replacement for SentenceTransformer.encode on an ONNX export"""
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, threads: int = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token='[PAD]')
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, ONNX_MODEL_FILE),
+            options,
+            providers=['CPUExecutionProvider'],
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts: List[str]):
+        import numpy as np
+
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.input_names:
+            feeds['token_type_ids'] = np.zeros_like(input_ids)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalisation, matching the
+        # Pooling + Normalize modules of the sentence-transformers pipeline
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, show_progress_bar: bool = False, **kwargs):
+        import numpy as np
+
+        single = isinstance(sentences, str)
+        if single:
+            sentences = [sentences]
+        if len(sentences) == 0:
+            return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+
+        # Sort by length so each batch pads to a similar size, then restore order
+        order = np.argsort([-len(s) for s in sentences], kind='stable')
+        chunks = []
+        for start in range(0, len(sentences), batch_size):
+            batch = [sentences[i] for i in order[start:start + batch_size]]
+            chunks.append(self._encode_batch(batch))
+            if show_progress_bar:
+                print(f"Encoded {min(start + batch_size, len(sentences))}/{len(sentences)}", end='\r')
+        if show_progress_bar:
+            print()
+        embeddings = np.empty((len(sentences), chunks[0].shape[1]), dtype=np.float32)
+        embeddings[order] = np.vstack(chunks)
+        return embeddings[0] if single else embeddings
+
+def load_query_encoder(backend: str = None):
+    """Return an object exposing SentenceTransformer-compatible encode()"""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == 'onnx':
+        return OnnxQueryEncoder(ONNX_MODEL_DIR)
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL_NAME)
+
+def export_onnx_model(output_dir: str = ONNX_MODEL_DIR, model_name: str = EMBEDDING_MODEL_NAME):
+    """Export the transformer to ONNX and quantize its weights to int8"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    hub_name = model_name if '/' in model_name else f"sentence-transformers/{model_name}"
+    tokenizer = AutoTokenizer.from_pretrained(hub_name)
+    model = AutoModel.from_pretrained(hub_name).eval()
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.save_pretrained(output_dir)
+
+    dummy = tokenizer(["export this sentence"], return_tensors='pt')
+    input_names = ['input_ids', 'attention_mask', 'token_type_ids']
+    output_names = ['last_hidden_state', 'pooler_output']
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']}
+    dynamic_axes['pooler_output'] = {0: 'batch'}
+
+    fp32_path = os.path.join(output_dir, 'model.onnx')
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(dummy[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    quantize_dynamic(fp32_path, os.path.join(output_dir, ONNX_MODEL_FILE), weight_type=QuantType.QInt8)
+    print(f"Exported quantized model to {os.path.join(output_dir, ONNX_MODEL_FILE)}")
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Query encoder utilities")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help='Export an int8 ONNX copy of the embedding model')
+    export_parser.add_argument('--output', type=str, default=ONNX_MODEL_DIR, help='Output directory')
+    export_parser.add_argument('--model', type=str, default=EMBEDDING_MODEL_NAME, help='Model name')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export_onnx_model(args.output, args.model)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,10 @@
 import os
+import json
+import threading
+import time
 import pandas as pd
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
 
 # Load environment variables from .env.local if it exists
@@ -13,8 +17,10 @@ if not OPENROUTER_API_KEY:
 
 CSV_PATH = 'products.csv'
 RECOMMENDATION_COUNT = 50
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+CANDIDATE_COUNT = 100
+OPENROUTER_API_URL = os.getenv('OPENROUTER_API_URL', "https://openrouter.ai/api/v1/chat/completions")
 MODEL = "google/gemini-2.0-flash-exp:free"
+MAX_RETRIES = 3
 
 # Load and clean the CSV (skip bad lines, handle large files)
 def load_products(csv_path):
@@ -30,15 +36,7 @@ def load_products(csv_path):
         print(f"Error loading CSV: {e}")
         exit(1)
 
-def get_recommendations(prompt, products_df, n=RECOMMENDATION_COUNT):
-    # Prepare a summary of products for the LLM (truncate for token limit)
-    product_samples = products_df.sample(min(100, len(products_df)))  # Sample 100 products for context
-    product_descriptions = []
-    for _, row in product_samples.iterrows():
-        desc = ', '.join([f"{col}: {row[col]}" for col in products_df.columns if pd.notnull(row[col])])
-        product_descriptions.append(desc)
-    products_text = '\n'.join(product_descriptions)
-
+def request_recommendations(prompt, products_text, n=RECOMMENDATION_COUNT, session=None):
     system_prompt = f"""
 You are a product recommendation AI. Given a user prompt and a list of products, select the {n} most suitable products for the user. Only recommend products from the provided list. For each recommendation, include the product name and a short reason why it matches the prompt.
 """
@@ -58,19 +56,167 @@ You are a product recommendation AI. Given a user prompt and a list of products,
         "max_tokens": 2048,
         "temperature": 0.7,
     }
-    response = requests.post(OPENROUTER_API_URL, headers=headers, json=data)
+    return (session or requests).post(OPENROUTER_API_URL, headers=headers, json=data)
+
+def get_recommendations(prompt, products_df, n=RECOMMENDATION_COUNT):
+    # Prepare a summary of products for the LLM (truncate for token limit)
+    product_samples = products_df.sample(min(100, len(products_df)))  # Sample 100 products for context
+    product_descriptions = []
+    for _, row in product_samples.iterrows():
+        desc = ', '.join([f"{col}: {row[col]}" for col in products_df.columns if pd.notnull(row[col])])
+        product_descriptions.append(desc)
+    products_text = '\n'.join(product_descriptions)
+
+    response = request_recommendations(prompt, products_text, n)
     if response.status_code != 200:
         print(f"OpenRouter API error: {response.status_code} - {response.text}")
         exit(1)
     result = response.json()
     return result['choices'][0]['message']['content']
 
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def read_batch(path):
+    """Prompts from a JSONL file as (id, record) pairs; ids default to the line number"""
+    items = []
+    with open(path, encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if not record.get('prompt'):
+                print(f"Skipping line {line_no}: no prompt")
+                continue
+            items.append((str(record.get('id', line_no)), record))
+    return items
+
+def completed_ids(output_path):
+    """Ids already answered successfully in a previous (possibly interrupted) run"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # partial line from a crash
+            if 'error' not in result:
+                done.add(str(result['id']))
+    return done
+
+def retry_delay(response, attempt):
+    """Seconds to wait before retrying: Retry-After when it is a number of seconds, else exponential backoff"""
+    try:
+        return max(0.0, float(response.headers['Retry-After']))
+    except (KeyError, ValueError):
+        # Missing, or an HTTP date, which is not worth parsing for a short wait
+        return 2 ** attempt
+
+def recommend_one(engine, record, limiter, session):
+    from schemas import FilterOptions
+
+    filter_options = FilterOptions(**record['filter_options']) if record.get('filter_options') else None
+    top_idx = engine.top_products(record['prompt'], filter_options, top_n=CANDIDATE_COUNT)
+    products_text = engine.bundle.describe(top_idx)
+
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.wait()
+        try:
+            response = request_recommendations(record['prompt'], products_text, RECOMMENDATION_COUNT, session)
+        except requests.RequestException:
+            # Connection errors and timeouts are transient, like 429 and 5xx
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(2 ** attempt)
+            continue
+        if response.status_code == 200:
+            return {"recommendations": response.json()['choices'][0]['message']['content'], "candidates": len(top_idx)}
+        if (response.status_code != 429 and response.status_code < 500) or attempt == MAX_RETRIES:
+            raise RuntimeError(f"OpenRouter API error: {response.status_code} - {response.text}")
+        time.sleep(retry_delay(response, attempt))
+
+def run_batch(input_path, output_path, bundle_dir, workers, rate_limit):
+    items = read_batch(input_path)
+    done = completed_ids(output_path)
+    pending = [(item_id, record) for item_id, record in items if item_id not in done]
+    print(f"{len(items)} prompts, {len(items) - len(pending)} already done, {len(pending)} to run.")
+    if not pending:
+        return
+
+    from retrieval_engine import load_retrieval_engine
+
+    engine = load_retrieval_engine(bundle_dir)
+    print(f"Loaded bundle with {len(engine.bundle)} products.")
+    limiter = RateLimiter(rate_limit)
+    session = requests.Session()
+    session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=workers))
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=workers))
+
+    # Repair a line cut short by a crash before appending
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        with open(output_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b'\n'
+        if needs_newline:
+            with open(output_path, 'a', encoding='utf-8') as f:
+                f.write('\n')
+
+    failed = 0
+    start = time.time()
+    with open(output_path, 'a', encoding='utf-8') as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(recommend_one, engine, record, limiter, session): (item_id, record)
+                   for item_id, record in pending}
+        for n, future in enumerate(as_completed(futures), start=1):
+            item_id, record = futures[future]
+            result = {"id": item_id, "prompt": record['prompt']}
+            try:
+                result.update(future.result())
+            except Exception as e:
+                result["error"] = str(e)
+                failed += 1
+            out.write(json.dumps(result) + '\n')
+            out.flush()
+            if n % 10 == 0 or n == len(pending):
+                print(f"{n}/{len(pending)} done ({failed} failed, {n / (time.time() - start):.2f}/s)")
+    if failed:
+        print(f"{failed} prompts failed; rerun the same command to retry them.")
+
 def main():
     import argparse
     parser = argparse.ArgumentParser(description="Product Recommendation by Prompt using OpenRouter Gemini Flash 2.0")
-    parser.add_argument('--prompt', type=str, required=True, help='User prompt for recommendations')
+    parser.add_argument('--prompt', type=str, help='User prompt for recommendations')
+    parser.add_argument('--batch', type=str, help='JSONL file of {"id", "prompt", "filter_options"} records')
+    parser.add_argument('--output', type=str, default='recommendations.jsonl', help='Batch results (appended, resumable)')
+    parser.add_argument('--bundle', type=str, default=None, help='Catalog bundle directory (see artifact_bundle.py)')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent batch prompts')
+    parser.add_argument('--rate-limit', type=float, default=None, help='Max LLM requests per second')
     args = parser.parse_args()
 
+    if args.batch:
+        from artifact_bundle import BUNDLE_DIR
+        run_batch(args.batch, args.output, args.bundle or BUNDLE_DIR, args.workers, args.rate_limit)
+        return
+    if not args.prompt:
+        parser.error("one of --prompt or --batch is required")
+
     products_df = load_products(CSV_PATH)
     print(f"Loaded {len(products_df)} products.")
     recommendations = get_recommendations(args.prompt, products_df, n=RECOMMENDATION_COUNT)
@@ -78,4 +224,4 @@ def main():
     print(recommendations)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main() 
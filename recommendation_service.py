@@ -1,33 +1,78 @@
 import os
-import pandas as pd
-import requests
 import json
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, Query
+import pandas as pd
+from datetime import datetime
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional, Dict, Any, Iterator, Tuple
 import numpy as np
+import threading
+import time
 import uuid
 
 # Embedding imports
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from query_encoder import EMBEDDING_BACKEND, EMBEDDING_MODEL_NAME, load_query_encoder
 
-# Load environment variables from .env.local if it exists
-if os.path.exists('.env.local'):
-    load_dotenv('.env.local')
+from metrics import MetricsMiddleware, render_latest, span
+from profiling import ProfilingMiddleware, check_admin_token, list_profiles, profiled
+import profiling
+from user_store import get_user_store
+from cursor_cache import CursorCache, decode_cursor, encode_cursor
+from user_embeddings import EVENT_WEIGHTS, UserEmbeddings, blend
+from catalog import assign_product_ids, get_product_texts, parse_prices, parse_rating_counts, parse_ratings, read_products_csv
+from compact_catalog import CompactCatalog, ProductIdIndex
+from dedup import maybe_collapse
+from scoring import SCORING_POOL_FACTOR, CandidateScorer, attribute_flags, popularity_scores
+from openrouter_client import (
+    OPENROUTER_API_KEY,
+    CARD_BATCH_MAX_ITEMS,
+    analyze_recipient_from_prompt,
+    build_enhanced_prompt,
+    build_recommendation_messages,
+    chat_completion,
+    generate_greeting_card,
+    generate_greeting_cards,
+    generate_thank_you_note,
+    generate_thank_you_notes,
+)
+from schemas import (
+    RecipientProfile,
+    OccasionInfo,
+    FilterOptions,
+    PromptRequest,
+    BatchPromptRequest,
+    BulkProductsRequest,
+    BulkCartRequest,
+    BulkUsersRequest,
+    GreetingCardRequest,
+    GreetingCardBatchRequest,
+    ThankYouRequest,
+    ThankYouBatchRequest,
+    ProfilingSettings,
+)
 
-OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 if not OPENROUTER_API_KEY:
     raise ValueError("OPENROUTER_API_KEY not found in environment or .env.local")
 
 CSV_PATH = 'products.csv'
 RECOMMENDATION_COUNT = 50
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
-MODEL = "google/gemini-2.0-flash-exp:free"
-EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+EMBEDDING_CHUNK_SIZE = 4096
+CANDIDATE_COUNT = 100
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', '1000'))
+BATCH_LLM_CONCURRENCY = int(os.getenv('BATCH_LLM_CONCURRENCY', '4'))
+BATCH_JOB_DIR = os.getenv('BATCH_JOB_DIR', 'batch_jobs')
+# Analysed batch requests retrieved per encode call, and how long the first of them may wait for company
+BATCH_RETRIEVAL_GROUP = int(os.getenv('BATCH_RETRIEVAL_GROUP', '64'))
+BATCH_RETRIEVAL_WAIT = float(os.getenv('BATCH_RETRIEVAL_WAIT', '0.5'))
+# Upper bound on similarity-matrix elements scored at once (queries x products)
+BATCH_SCORE_ELEMENTS = 32 * 1024 * 1024
+# Ranked candidates kept behind a /recommend cursor for later pages
+CURSOR_DEPTH = int(os.getenv('CURSOR_DEPTH', '1000'))
+PAGE_SIZE = 20
+
+_NO_PRODUCTS = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32))
 
 app = FastAPI()
 app.add_middleware(
@@ -37,284 +82,328 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(ProfilingMiddleware)
 
-products_df = None
+# Catalog rows in compact columnar form (compact_catalog.py), hydrated per request
+product_catalog: Optional[CompactCatalog] = None
 product_embeddings = None
 embedding_model = None
 
-# In-memory storage for user data (replace with database in production)
-wishlists = {}
-carts = {}
-user_profiles = {}
-
-class RecipientProfile(BaseModel):
-    age: Optional[int] = None
-    gender: Optional[str] = None
-    interests: List[str] = []
-    hobbies: List[str] = []
-    relationship: Optional[str] = None
-    personality: List[str] = []
-    lifestyle: List[str] = []
-    preferences: List[str] = []
-
-class OccasionInfo(BaseModel):
-    occasion: str
-    mood: Optional[str] = None
-    formality: Optional[str] = None
-    budget_range: Optional[Dict[str, float]] = None
-
-class FilterOptions(BaseModel):
-    category: Optional[str] = None
-    price_min: Optional[float] = None
-    price_max: Optional[float] = None
-    eco_friendly: Optional[bool] = None
-    handmade: Optional[bool] = None
-    local: Optional[bool] = None
-    rating_min: Optional[float] = None
-    sort_by: Optional[str] = None  # price, rating, popularity
-
-class PromptRequest(BaseModel):
-    prompt: str
-    recipient_profile: Optional[RecipientProfile] = None
-    occasion_info: Optional[OccasionInfo] = None
-    filter_options: Optional[FilterOptions] = None
-
-class GreetingCardRequest(BaseModel):
-    recipient_name: str
-    occasion: str
-    message_style: str  # funny, formal, emotional, romantic
-    personal_message: Optional[str] = None
-
-class ThankYouRequest(BaseModel):
-    gift_name: str
-    sender_name: str
-    occasion: str
-    message_style: str
-
-def get_product_text(row) -> str:
-    # Combine relevant fields for embedding
-    fields = []
-    for col in ['name', 'main_category', 'sub_category', 'description']:
-        if col in row and pd.notnull(row[col]):
-            fields.append(str(row[col]))
-    return ' | '.join(fields)
-
-def analyze_recipient_from_prompt(prompt: str) -> RecipientProfile:
-    """Extract recipient information from prompt using AI"""
-    try:
-        system_prompt = """
-        You are an expert at analyzing gift requests. Extract detailed information about the recipient from the user's prompt.
-        Return a JSON object with these fields:
-        - age: number or null
-        - gender: string or null
-        - interests: array of strings
-        - hobbies: array of strings
-        - relationship: string
-        - personality: array of strings
-        - lifestyle: array of strings
-        - preferences: array of strings
-        """
-        
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "HTTP-Referer": "http://localhost:8000",
-            "X-Title": "Gift Recommendation AI"
-        }
-        data = {
-            "model": MODEL,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Analyze this gift request: {prompt}"}
-            ],
-            "max_tokens": 1000,
-            "temperature": 0.3,
-        }
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=data)
-        if response.status_code == 200:
-            result = response.json()
-            analysis_text = result['choices'][0]['message']['content']
-            # Try to parse JSON from the response
-            try:
-                analysis = json.loads(analysis_text)
-                return RecipientProfile(**analysis)
-            except:
-                # Fallback to basic extraction
-                return RecipientProfile(relationship="friend")
-        return RecipientProfile(relationship="friend")
-    except Exception as e:
-        print(f"Error analyzing recipient: {e}")
-        return RecipientProfile(relationship="friend")
+# Per-product arrays for vectorized scoring and filtering, built alongside product_catalog
+product_norms = None
+product_prices = None
+product_ratings = None
+product_category_codes = None
+product_category_names = None
+product_scorer = None
+# Representative row -> the listings collapsed into it at ingest (DEDUP_PRODUCTS=1)
+product_variants: Dict[int, List[Dict[str, str]]] = {}
+# Stable product ids (catalog.assign_product_ids) -> rows; wishlists and carts store these ids
+product_id_index: Optional[ProductIdIndex] = None
+
+# Catalog loading state: loading -> ready, or degraded if the CSV or embeddings failed
+load_state = {
+    "status": "loading",
+    "stage": "pending",
+    "products_total": 0,
+    "products_embedded": 0,
+    "dedup": None,
+    "error": None,
+    "started_at": None,
+    "finished_at": None,
+}
+load_state_lock = threading.Lock()
+
+# Wishlists and carts live in user_store (USER_STORE_URL); this holds the
+# per-user preference vectors derived from them, rebuilt from the store when cold
+user_vectors = None
+
+# Ranked candidate lists behind /recommend cursors
+cursor_cache = CursorCache()
+
+# Offline batch jobs: job_id -> status, results are appended to BATCH_JOB_DIR/<job_id>.jsonl
+batch_jobs = {}
+batch_jobs_lock = threading.Lock()
 
 @app.on_event("startup")
+def start_background_load():
+    """Load the catalog off the event loop so the server is reachable while embedding"""
+    thread = threading.Thread(target=load_products, name="catalog-loader", daemon=True)
+    thread.start()
+
+def _set_load_state(**changes):
+    with load_state_lock:
+        load_state.update(changes)
+
 def load_products():
-    global products_df, product_embeddings, embedding_model
+    global product_catalog, product_embeddings, embedding_model
+    global product_norms, product_prices, product_ratings, product_category_codes, product_category_names
+    global user_vectors, product_scorer, product_variants, product_id_index
+    _set_load_state(status="loading", stage="reading_csv", error=None,
+                    products_total=0, products_embedded=0, dedup=None,
+                    started_at=datetime.now().isoformat(), finished_at=None)
     try:
-        products_df = pd.read_csv(CSV_PATH, on_bad_lines='skip', low_memory=False, skiprows=3)
-        if 'name' in products_df.columns:
-            products_df = products_df.dropna(subset=['name'])
+        df = read_products_csv(CSV_PATH)
+        if df.empty:
+            raise ValueError("no products found")
+        print(f"Loaded {len(df)} products.")
+        ids = assign_product_ids(df)
+        _set_load_state(stage="deduplicating")
+        dedup_result = maybe_collapse(df, ids)
+        variants = {}
+        if dedup_result is not None:
+            df, variants = dedup_result.products_df, dedup_result.variants
+            # Collapsed listings' ids keep resolving, to their representative
+            id_index = ProductIdIndex(ids, dedup_result.positions)
+            ids = ids[dedup_result.keep]
+            _set_load_state(dedup=dedup_result.stats())
         else:
-            print("Warning: 'name' column not found in CSV. Keeping all rows.")
-        print(f"Loaded {len(products_df)} products.")
-        
-        # Load embedding model
-        print("Loading embedding model...")
-        embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-        
-        # Compute embeddings for all products
+            id_index = ProductIdIndex(ids, np.arange(len(ids)))
+        prices, ratings = parse_prices(df), parse_ratings(df)
+        if 'main_category' in df.columns:
+            category_codes, category_names = pd.factorize(df['main_category'].fillna('').astype(str).str.lower())
+        else:
+            category_codes, category_names = np.zeros(len(df), dtype=np.int64), pd.Index([''])
+        scorer = CandidateScorer(prices, ratings, popularity_scores(parse_rating_counts(df)), attribute_flags(df))
+        compact = CompactCatalog.from_dataframe(df, prices, ratings, ids)
+    except Exception as e:
+        print(f"Error loading CSV: {e}")
+        product_catalog = None
+        product_embeddings = None
+        embedding_model = None
+        _set_load_state(status="degraded", stage="failed", error=f"CSV: {e}", finished_at=datetime.now().isoformat())
+        return
+
+    try:
+        _set_load_state(stage="loading_model", products_total=len(df))
+        print(f"Loading embedding model {EMBEDDING_MODEL_NAME} ({EMBEDDING_BACKEND} backend)...")
+        model = load_query_encoder()
+
+        # Compute embeddings in chunks so /health can report progress
+        _set_load_state(stage="embedding")
         print("Computing product embeddings...")
-        product_texts = [get_product_text(row) for _, row in products_df.iterrows()]
-        product_embeddings = embedding_model.encode(product_texts, show_progress_bar=True, batch_size=256)
-        print(f"Computed embeddings for {len(product_embeddings)} products.")
+        product_texts = get_product_texts(df)
+        embeddings = None
+        for start in range(0, len(product_texts), EMBEDDING_CHUNK_SIZE):
+            chunk = model.encode(product_texts[start:start + EMBEDDING_CHUNK_SIZE], batch_size=256)
+            if embeddings is None:
+                embeddings = np.empty((len(product_texts), chunk.shape[1]), dtype=chunk.dtype)
+            embeddings[start:start + len(chunk)] = chunk
+            _set_load_state(products_embedded=start + len(chunk))
+        print(f"Computed embeddings for {len(product_texts)} products.")
+        norms = np.maximum(np.linalg.norm(embeddings, axis=1), 1e-12).astype(embeddings.dtype)
     except Exception as e:
-        print(f"Error loading CSV or embeddings: {e}")
-        products_df = pd.DataFrame()
+        # Keyword fallback still works without embeddings
+        print(f"Error computing embeddings: {e}")
+        product_catalog, product_id_index = compact, id_index
         product_embeddings = None
         embedding_model = None
+        product_norms = None
+        _set_load_state(status="degraded", stage="failed", error=f"Embeddings: {e}", finished_at=datetime.now().isoformat())
+        return
 
-def find_top_products(prompt: str, recipient_profile: RecipientProfile, occasion_info: OccasionInfo, filter_options: FilterOptions, top_n: int = 100) -> List[int]:
-    global product_embeddings, embedding_model, products_df
-    if embedding_model is None or product_embeddings is None or products_df is None or products_df.empty:
-        return []
+    # Publish everything at once so requests never see a half-loaded catalog
+    product_prices, product_ratings = prices, ratings
+    product_category_codes, product_category_names = category_codes, list(category_names)
+    product_norms = norms
+    product_scorer = scorer
+    product_variants = variants
+    product_id_index = id_index
+    user_vectors = UserEmbeddings(embeddings.shape[1])
+    product_catalog, product_embeddings, embedding_model = compact, embeddings, model
+    _set_load_state(status="ready", stage="done", finished_at=datetime.now().isoformat())
+
+def find_top_products(prompt: str, recipient_profile: RecipientProfile, occasion_info: OccasionInfo, filter_options: FilterOptions, top_n: int = 100, user_id: Optional[str] = None) -> List[int]:
+    return find_ranked_products(prompt, recipient_profile, occasion_info, filter_options, top_n, user_id)[0].tolist()
+
+def find_ranked_products(prompt: str, recipient_profile: RecipientProfile, occasion_info: OccasionInfo, filter_options: FilterOptions, top_n: int = 100, user_id: Optional[str] = None, depth: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Row ids of the top_n products, best first, and their ranking scores
+
+    With depth > top_n the ranking continues past top_n, up to depth rows, for
+    cursor pagination. The first top_n are exactly what top_n alone returns.
+    """
+    if embedding_model is None or product_embeddings is None or not product_catalog:
+        return _NO_PRODUCTS
     
     try:
         # Create enhanced prompt with recipient and occasion info
-        enhanced_prompt = f"{prompt}"
-        if recipient_profile:
-            enhanced_prompt += f" Recipient: {recipient_profile.interests} {recipient_profile.hobbies} {recipient_profile.personality}"
-        if occasion_info:
-            enhanced_prompt += f" Occasion: {occasion_info.occasion} {occasion_info.mood}"
-        
-        prompt_emb = embedding_model.encode([enhanced_prompt])[0]
-        sims = cosine_similarity([prompt_emb], product_embeddings)[0]
+        enhanced_prompt = build_enhanced_prompt(prompt, recipient_profile, occasion_info)
         
-        # Apply filters
-        filtered_indices = []
-        for i, sim in enumerate(sims):
-            if filter_options:
-                row = products_df.iloc[i]
-                # Price filter
-                if filter_options.price_min and pd.notnull(row.get('actual_price', 0)):
-                    try:
-                        price = float(str(row.get('actual_price', 0)).replace('₹', '').replace(',', ''))
-                        if price < filter_options.price_min:
-                            continue
-                    except:
-                        pass
-                if filter_options.price_max and pd.notnull(row.get('actual_price', 0)):
-                    try:
-                        price = float(str(row.get('actual_price', 0)).replace('₹', '').replace(',', ''))
-                        if price > filter_options.price_max:
-                            continue
-                    except:
-                        pass
-                # Category filter
-                if filter_options.category and filter_options.category.lower() not in str(row.get('main_category', '')).lower():
-                    continue
-                # Rating filter
-                if filter_options.rating_min and pd.notnull(row.get('ratings', 0)):
-                    try:
-                        rating = float(row.get('ratings', 0))
-                        if rating < filter_options.rating_min:
-                            continue
-                    except:
-                        pass
-            filtered_indices.append(i)
+        with span("encode_query"):
+            prompt_emb = embedding_model.encode([enhanced_prompt])[0]
+        if user_id:
+            with span("personalize"):
+                prompt_emb = blend(prompt_emb, _user_vector(user_id))
+        with span("similarity"):
+            sims = _similarities([prompt_emb])[0]
         
-        # Sort by similarity and take top N
-        filtered_sims = [sims[i] for i in filtered_indices]
-        top_filtered_idx = np.argsort(filtered_sims)[::-1][:top_n]
-        return [filtered_indices[i] for i in top_filtered_idx]
+        with span("filter"):
+            ranked = _rank(sims, filter_options, top_n, occasion_info)
+            if depth and depth > top_n and len(ranked[0]) == top_n:
+                ranked = _extend_ranking(ranked, _rank(sims, filter_options, depth, occasion_info), depth)
+            return ranked
     except Exception as e:
         print(f"Embedding similarity error: {e}")
-        return []
+        return _NO_PRODUCTS
+
+def find_top_products_batch(reqs: List[PromptRequest], top_n: int = 100) -> List[List[int]]:
+    """find_top_products for many requests: one encode call and one matrix product per chunk of queries"""
+    if embedding_model is None or product_embeddings is None or not product_catalog:
+        return [[] for _ in reqs]
 
-def generate_greeting_card(recipient_name: str, occasion: str, message_style: str, personal_message: str = None) -> Dict[str, str]:
-    """Generate AI greeting card content"""
     try:
-        system_prompt = f"""
-        You are an expert greeting card writer. Create a personalized greeting card for {occasion}.
-        Style: {message_style}
-        Recipient: {recipient_name}
-        Personal message: {personal_message or 'None provided'}
-        
-        Return a JSON object with:
-        - title: card title
-        - message: main greeting message
-        - signature: suggested signature
-        """
-        
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "HTTP-Referer": "http://localhost:8000",
-            "X-Title": "Gift Recommendation AI"
-        }
-        data = {
-            "model": MODEL,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Create a {message_style} greeting card for {recipient_name} for {occasion}"}
-            ],
-            "max_tokens": 500,
-            "temperature": 0.7,
-        }
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=data)
-        if response.status_code == 200:
-            result = response.json()
-            card_text = result['choices'][0]['message']['content']
-            try:
-                return json.loads(card_text)
-            except:
-                return {
-                    "title": f"Happy {occasion}!",
-                    "message": card_text,
-                    "signature": "With love"
-                }
-        return {"title": "Greeting Card", "message": "Happy occasion!", "signature": "Best wishes"}
+        enhanced_prompts = [build_enhanced_prompt(r.prompt, r.recipient_profile, r.occasion_info) for r in reqs]
+        with span("encode_query"):
+            prompt_embs = embedding_model.encode(enhanced_prompts, batch_size=64)
+        if any(r.user_id for r in reqs):
+            with span("personalize"):
+                prompt_embs = np.array([blend(emb, _user_vector(r.user_id)) if r.user_id else emb
+                                        for emb, r in zip(prompt_embs, reqs)])
+
+        # Bound the (queries x products) score matrix so large batches don't exhaust memory
+        chunk = max(1, BATCH_SCORE_ELEMENTS // len(product_embeddings))
+        results = []
+        for start in range(0, len(reqs), chunk):
+            with span("similarity"):
+                sims = _similarities(prompt_embs[start:start + chunk])
+            with span("filter"):
+                for row, r in zip(sims, reqs[start:start + chunk]):
+                    results.append(_filter_and_rank(row, r.filter_options, top_n, r.occasion_info))
+        return results
     except Exception as e:
-        print(f"Error generating greeting card: {e}")
-        return {"title": "Greeting Card", "message": "Happy occasion!", "signature": "Best wishes"}
+        print(f"Embedding similarity error: {e}")
+        return [[] for _ in reqs]
+
+def _similarities(prompt_embs) -> np.ndarray:
+    """Cosine similarity of each query embedding against every product, as a single matrix product"""
+    queries = np.asarray(prompt_embs, dtype=product_embeddings.dtype)
+    queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    return (queries @ product_embeddings.T) / product_norms
 
-def generate_thank_you_note(gift_name: str, sender_name: str, occasion: str, message_style: str) -> str:
-    """Generate thank you note"""
+def _product_rows(ids) -> List[int]:
+    """Catalog rows for stable product ids; unknown ids are skipped"""
+    if product_id_index is None:
+        return []
+    return [row for row in product_id_index.rows_for(ids) if row is not None]
+
+def _rebuild_user_vector(user_id: str):
+    """Recompute a user's centroid from everything in their wishlist and cart"""
+    store = get_user_store()
+    weights = {}
+    for row in _product_rows(store.get_wishlist(user_id)):
+        weights[row] = weights.get(row, 0.0) + EVENT_WEIGHTS["wishlist"]
+    for product_id, quantity in store.get_cart(user_id).items():
+        if quantity <= 0:
+            continue  # add_to_cart accepts negative quantities; they carry no preference
+        for row in _product_rows([product_id]):
+            weights[row] = weights.get(row, 0.0) + EVENT_WEIGHTS["cart"] * quantity
+    rows = list(weights)
+    user_vectors.rebuild(user_id, product_embeddings[rows], [weights[row] for row in rows])
+
+def _user_vector(user_id: Optional[str]) -> Optional[np.ndarray]:
+    if not user_id or user_vectors is None:
+        return None
+    user_vectors.sync(get_user_store().version())
+    if user_id not in user_vectors:
+        _rebuild_user_vector(user_id)
+    return user_vectors.get(user_id)
+
+def _record_user_event(user_id: str, kind: str, items: Dict[str, int]):
+    """Fold newly added products (product_id -> units) into the user's centroid"""
+    if user_vectors is None or not items:
+        return
     try:
-        system_prompt = f"""
-        You are an expert at writing thank you notes. Create a {message_style} thank you note.
-        Gift: {gift_name}
-        Sender: {sender_name}
-        Occasion: {occasion}
-        """
-        
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "HTTP-Referer": "http://localhost:8000",
-            "X-Title": "Gift Recommendation AI"
-        }
-        data = {
-            "model": MODEL,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Write a {message_style} thank you note for {gift_name} from {sender_name}"}
-            ],
-            "max_tokens": 300,
-            "temperature": 0.7,
-        }
-        response = requests.post(OPENROUTER_API_URL, headers=headers, json=data)
-        if response.status_code == 200:
-            result = response.json()
-            return result['choices'][0]['message']['content']
-        return f"Thank you so much for the {gift_name}! It's perfect for {occasion}."
+        user_vectors.sync(get_user_store().version())
+        if user_id not in user_vectors:
+            # The store already includes this event
+            _rebuild_user_vector(user_id)
+            return
+        for product_id, units in items.items():
+            rows = _product_rows([product_id])
+            if rows and units > 0:
+                user_vectors.add(user_id, product_embeddings[rows], EVENT_WEIGHTS[kind] * units)
     except Exception as e:
-        print(f"Error generating thank you note: {e}")
-        return f"Thank you for the {gift_name}!"
+        print(f"User vector update error: {e}")
 
-@app.post("/recommend")
-def recommend_products(req: PromptRequest):
-    if products_df is None or products_df.empty:
+def _forget_user_events(user_id: str):
+    """Removals can't be undone incrementally; drop the vector and rebuild on next use"""
+    if user_vectors is not None:
+        user_vectors.discard(user_id)
+
+def _candidate_mask(filter_options: FilterOptions) -> Optional[np.ndarray]:
+    """Boolean mask of products passing the filters, or None when nothing is filtered"""
+    if not filter_options:
+        return None
+    mask = None
+
+    def narrow(condition):
+        nonlocal mask
+        mask = condition if mask is None else mask & condition
+
+    # Unparseable prices and ratings are NaN and never filtered out
+    if filter_options.price_min:
+        narrow(~(product_prices < filter_options.price_min))
+    if filter_options.price_max:
+        narrow(~(product_prices > filter_options.price_max))
+    if filter_options.rating_min:
+        narrow(~(product_ratings < filter_options.rating_min))
+    if filter_options.category:
+        needle = filter_options.category.lower()
+        codes = [code for code, name in enumerate(product_category_names) if needle in name]
+        narrow(np.isin(product_category_codes, codes))
+    return mask
+
+def _extend_ranking(head: Tuple[np.ndarray, np.ndarray], deeper: Tuple[np.ndarray, np.ndarray], depth: int) -> Tuple[np.ndarray, np.ndarray]:
+    """head followed by the rows of a deeper ranking that head does not already contain, up to depth rows
+
+    The deeper ranking reranks a larger pool, so its top rows can differ from
+    head; keeping head intact keeps the first page independent of the depth.
+    """
+    tail = ~np.isin(deeper[0], head[0])
+    size = depth - len(head[0])
+    return (np.concatenate([head[0], deeper[0][tail][:size]]),
+            np.concatenate([head[1], deeper[1][tail][:size]]))
+
+def _filter_and_rank(sims, filter_options: FilterOptions, top_n: int, occasion_info: Optional[OccasionInfo] = None) -> List[int]:
+    """Indices of the top_n best products that pass the filters"""
+    return _rank(sims, filter_options, top_n, occasion_info)[0].tolist()
+
+def _rank(sims, filter_options: FilterOptions, top_n: int, occasion_info: Optional[OccasionInfo] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Indices and scores of the top_n best products that pass the filters
+
+    The most similar products, SCORING_POOL_FACTOR times as many as asked
+    for, are reranked by product_scorer (budget, rating, popularity,
+    attributes, sort_by).
+    """
+    mask = _candidate_mask(filter_options)
+    if mask is not None:
+        sims = np.where(mask, sims, -np.inf)
+        available = int(mask.sum())
+    else:
+        available = len(sims)
+    k = min(top_n * SCORING_POOL_FACTOR if product_scorer is not None else top_n, available)
+    if k == 0:
+        return _NO_PRODUCTS
+    # Partial selection, then sort only the k winners
+    top = np.argpartition(-sims, k - 1)[:k]
+    if product_scorer is None:
+        top = top[np.argsort(-sims[top], kind='stable')]
+        return top, sims[top]
+    with span("score"):
+        return product_scorer.rank_with_scores(top, sims[top], occasion_info, filter_options, top_n)
+
+def _require_products():
+    if load_state["status"] == "loading":
+        raise HTTPException(status_code=503, detail="Products are still loading.", headers={"Retry-After": "10"})
+    if not product_catalog:
         raise HTTPException(status_code=500, detail="No products loaded.")
-    
+
+def _fill_request_defaults(req: PromptRequest):
     # Analyze recipient if not provided
     if not req.recipient_profile:
-        req.recipient_profile = analyze_recipient_from_prompt(req.prompt)
+        with span("analyze_recipient"):
+            req.recipient_profile = analyze_recipient_from_prompt(req.prompt)
     
     # Set default occasion if not provided
     if not req.occasion_info:
@@ -323,73 +412,29 @@ def recommend_products(req: PromptRequest):
     # Set default filter options if not provided
     if not req.filter_options:
         req.filter_options = FilterOptions()
-    
+
+def _describe_products(rows: List[int]) -> str:
+    """Product list text for the LLM, one "col: value, ..." line per product"""
+    with span("serialize_candidates"):
+        return product_catalog.describe(rows)
+
+def _generate_recommendations(req: PromptRequest, top_idx: List[int]) -> Dict[str, Any]:
+    """Ask the LLM to pick recommendations from the retrieved candidates"""
     prompt = req.prompt
     n = RECOMMENDATION_COUNT
     
-    # Find top products using embeddings and filters
-    top_idx = find_top_products(prompt, req.recipient_profile, req.occasion_info, req.filter_options, top_n=100)
-    
     if len(top_idx) > 0:
-        product_samples = products_df.iloc[top_idx]
+        product_samples = top_idx
     else:
         # Fallback: keyword filtering
-        mask = (
-            products_df['name'].str.contains(prompt, case=False, na=False) |
-            products_df.get('main_category', pd.Series(['']*len(products_df))).str.contains(prompt, case=False, na=False)
-        )
-        filtered = products_df[mask]
-        if len(filtered) > 0:
-            product_samples = filtered.sample(min(100, len(filtered)))
-        else:
-            product_samples = products_df.sample(min(100, len(products_df)))
-    
-    product_descriptions = []
-    for _, row in product_samples.iterrows():
-        desc = ', '.join([f"{col}: {row[col]}" for col in products_df.columns if pd.notnull(row[col])])
-        product_descriptions.append(desc)
-    products_text = '\n'.join(product_descriptions)
-
-    # Enhanced system prompt with explainability
-    system_prompt = f"""
-    You are an expert gift recommendation AI. Given a user prompt and a list of products, select the {n} most suitable products for the user.
-    
-    Recipient Profile:
-    - Age: {req.recipient_profile.age or 'Not specified'}
-    - Interests: {', '.join(req.recipient_profile.interests) or 'Not specified'}
-    - Hobbies: {', '.join(req.recipient_profile.hobbies) or 'Not specified'}
-    - Relationship: {req.recipient_profile.relationship or 'Not specified'}
-    - Personality: {', '.join(req.recipient_profile.personality) or 'Not specified'}
-    
-    Occasion: {req.occasion_info.occasion}
-    Mood: {req.occasion_info.mood or 'Not specified'}
-    
-    For each recommendation, include:
-    1. Product name
-    2. Why this gift is perfect (explainability)
-    3. How it matches the recipient's profile
-    4. Why it fits the occasion
+        matches = np.flatnonzero(product_catalog.contains('name', prompt) | product_catalog.contains('main_category', prompt))
+        if len(matches) == 0:
+            matches = np.arange(len(product_catalog))
+        product_samples = np.random.choice(matches, min(100, len(matches)), replace=False).tolist()
     
-    Only recommend products from the provided list.
-    """
-    
-    user_prompt = f"User prompt: {prompt}\n\nProduct list:\n{products_text}\n\nReturn a numbered list of the top {n} product recommendations with detailed explanations."
-
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "HTTP-Referer": "http://localhost:8000",
-        "X-Title": "Gift Recommendation AI"
-    }
-    data = {
-        "model": MODEL,
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ],
-        "max_tokens": 2048,
-        "temperature": 0.7,
-    }
-    response = requests.post(OPENROUTER_API_URL, headers=headers, json=data)
+    products_text = _describe_products(product_samples)
+    messages = build_recommendation_messages(prompt, req.recipient_profile, req.occasion_info, products_text, n)
+    response = chat_completion(messages, max_tokens=2048, temperature=0.7)
     if response.status_code != 200:
         raise HTTPException(status_code=500, detail=f"OpenRouter API error: {response.status_code} - {response.text}")
     result = response.json()
@@ -401,6 +446,194 @@ def recommend_products(req: PromptRequest):
         "filter_options": req.filter_options.dict()
     }
 
+@app.post("/recommend")
+@profiled
+def recommend_products(req: PromptRequest):
+    _require_products()
+    _fill_request_defaults(req)
+    
+    # The LLM sees the same CANDIDATE_COUNT as without pagination; the ranking continues
+    # to CURSOR_DEPTH so later pages come from the cursor cache
+    top_idx, scores = find_ranked_products(req.prompt, req.recipient_profile, req.occasion_info, req.filter_options,
+                                           top_n=CANDIDATE_COUNT, user_id=req.user_id, depth=CURSOR_DEPTH)
+    result = _generate_recommendations(req, top_idx[:CANDIDATE_COUNT].tolist())
+    next_cursor = None
+    if len(top_idx) > CANDIDATE_COUNT:
+        next_cursor = encode_cursor(cursor_cache.put(top_idx, scores, req), CANDIDATE_COUNT)
+    result["next_cursor"] = next_cursor
+    return result
+
+@app.get("/recommend/page")
+def recommend_page(cursor: str, page_size: int = Query(PAGE_SIZE, ge=1, le=100), explain: bool = False):
+    """The next page of ranked products behind a cursor, with LLM explanations for this page only if asked"""
+    try:
+        key, offset = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    entry = cursor_cache.get(key)
+    if entry is None:
+        raise HTTPException(status_code=410, detail="Cursor expired; call /recommend again.")
+
+    rows = entry.ids[offset:offset + page_size].tolist()
+    products = []
+    scores = entry.scores[offset:offset + page_size].tolist()
+    for row, score, product_id, product in zip(rows, scores, product_catalog.product_ids(rows), product_catalog.rows(rows)):
+        product.update(product_id=product_id, score=round(score, 4))
+        if row in product_variants:
+            product["variants"] = product_variants[row]
+        products.append(product)
+    end = offset + len(rows)
+    response = {"products": products, "next_cursor": encode_cursor(key, end) if end < len(entry.ids) else None}
+
+    if explain and rows:
+        req = entry.context
+        messages = build_recommendation_messages(req.prompt, req.recipient_profile, req.occasion_info,
+                                                 _describe_products(rows), len(rows))
+        llm_response = chat_completion(messages, max_tokens=2048, temperature=0.7)
+        if llm_response.status_code != 200:
+            raise HTTPException(status_code=500, detail=f"OpenRouter API error: {llm_response.status_code} - {llm_response.text}")
+        response["explanations"] = llm_response.json()['choices'][0]['message']['content']
+    return response
+
+def _batch_result(index: int, req: PromptRequest, future) -> Dict[str, Any]:
+    try:
+        return {"index": index, "prompt": req.prompt, **future.result()}
+    except HTTPException as e:
+        return {"index": index, "prompt": req.prompt, "error": e.detail, "status_code": e.status_code}
+    except Exception as e:
+        return {"index": index, "prompt": req.prompt, "error": str(e), "status_code": 500}
+
+def recommend_batch(reqs: List[PromptRequest]) -> Iterator[Dict[str, Any]]:
+    """Yield one result per request, tagged with its index, in completion order
+
+    Requests that already carry a recipient profile are retrieved together
+    up front: one encode call and chunked matrix products. The others go
+    through recipient analysis on whichever of the BATCH_LLM_CONCURRENCY
+    threads recommendation calls leave free, and are retrieved in groups of
+    up to BATCH_RETRIEVAL_GROUP once that many have finished,
+    BATCH_RETRIEVAL_WAIT seconds have passed since the first of them did,
+    or no analysis is left. Closing the generator, as happens when a
+    streaming client disconnects, cancels whatever has not started.
+    """
+    pool = ThreadPoolExecutor(max_workers=BATCH_LLM_CONCURRENCY, thread_name_prefix="batch-llm")
+    analyses, generations = {}, {}
+
+    def retrieve(indices: List[int]):
+        batch = [reqs[i] for i in indices]
+        for index, top_idx in zip(indices, find_top_products_batch(batch, top_n=CANDIDATE_COUNT)):
+            generations[pool.submit(_generate_recommendations, reqs[index], top_idx)] = index
+
+    try:
+        ready = [i for i, req in enumerate(reqs) if req.recipient_profile]
+        for index in ready:
+            _fill_request_defaults(reqs[index])  # no LLM call once the profile is set
+        if ready:
+            retrieve(ready)
+
+        waiting = [i for i, req in enumerate(reqs) if not req.recipient_profile]
+        analysed, first_analysed = [], 0.0
+        while True:
+            # Analyses only take threads the recommendation calls leave free, so those never queue behind them
+            while waiting and len(analyses) + len(generations) < BATCH_LLM_CONCURRENCY:
+                index = waiting.pop(0)
+                analyses[pool.submit(_fill_request_defaults, reqs[index])] = index
+            while len(analysed) >= BATCH_RETRIEVAL_GROUP:
+                retrieve(analysed[:BATCH_RETRIEVAL_GROUP])
+                analysed = analysed[BATCH_RETRIEVAL_GROUP:]
+            if analysed and ((not analyses and not waiting)
+                             or time.monotonic() - first_analysed >= BATCH_RETRIEVAL_WAIT):
+                retrieve(analysed)
+                analysed = []
+            if not analyses and not generations:
+                break
+            timeout = max(0.0, first_analysed + BATCH_RETRIEVAL_WAIT - time.monotonic()) if analysed else None
+            done, _ = wait(set(analyses) | set(generations), timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future in generations:
+                    index = generations.pop(future)
+                    yield _batch_result(index, reqs[index], future)
+                    continue
+                index = analyses.pop(future)
+                if future.exception() is not None:
+                    yield _batch_result(index, reqs[index], future)
+                    continue
+                if not analysed:
+                    first_analysed = time.monotonic()
+                analysed.append(index)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _validate_batch(req: BatchPromptRequest):
+    if not req.requests:
+        raise HTTPException(status_code=400, detail="Batch is empty.")
+    if len(req.requests) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_SIZE} requests.")
+
+@app.post("/recommend/batch")
+def recommend_products_batch(req: BatchPromptRequest):
+    """Stream results as JSON lines as each request completes"""
+    _require_products()
+    _validate_batch(req)
+    lines = (json.dumps(result) + '\n' for result in recommend_batch(req.requests))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+def _run_batch_job(job_id: str, reqs: List[PromptRequest]):
+    with batch_jobs_lock:
+        job = batch_jobs[job_id]
+        job["status"] = "running"
+    try:
+        os.makedirs(BATCH_JOB_DIR, exist_ok=True)
+        with open(os.path.join(BATCH_JOB_DIR, f"{job_id}.jsonl"), 'w', encoding='utf-8') as f:
+            for result in recommend_batch(reqs):
+                f.write(json.dumps(result) + '\n')
+                f.flush()
+                with batch_jobs_lock:
+                    job["completed"] += 1
+                    if "error" in result:
+                        job["failed"] += 1
+        status, error = "done", None
+    except Exception as e:
+        print(f"Batch job {job_id} failed: {e}")
+        status, error = "failed", str(e)
+    with batch_jobs_lock:
+        job.update(status=status, error=error, finished_at=datetime.now().isoformat())
+
+@app.post("/recommend/jobs")
+def create_batch_job(req: BatchPromptRequest):
+    """Run a batch in the background; poll the job and fetch its JSONL results when done"""
+    _require_products()
+    _validate_batch(req)
+    job_id = str(uuid.uuid4())
+    with batch_jobs_lock:
+        batch_jobs[job_id] = {
+            "job_id": job_id,
+            "status": "queued",
+            "total": len(req.requests),
+            "completed": 0,
+            "failed": 0,
+            "error": None,
+            "created_at": datetime.now().isoformat(),
+            "finished_at": None,
+        }
+        job = dict(batch_jobs[job_id])
+    threading.Thread(target=_run_batch_job, args=(job_id, req.requests), name=f"batch-{job_id[:8]}", daemon=True).start()
+    return job
+
+@app.get("/recommend/jobs/{job_id}")
+def get_batch_job(job_id: str):
+    with batch_jobs_lock:
+        if job_id not in batch_jobs:
+            raise HTTPException(status_code=404, detail="Job not found.")
+        return dict(batch_jobs[job_id])
+
+@app.get("/recommend/jobs/{job_id}/results")
+def get_batch_job_results(job_id: str):
+    """Results written so far, one JSON object per line"""
+    path = os.path.join(BATCH_JOB_DIR, f"{job_id}.jsonl")
+    if job_id not in batch_jobs or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Job results not found.")
+    return FileResponse(path, media_type="application/x-ndjson", filename=f"{job_id}.jsonl")
+
 @app.post("/greeting-card")
 def create_greeting_card(req: GreetingCardRequest):
     card_content = generate_greeting_card(
@@ -429,32 +662,130 @@ def create_thank_you_note(req: ThankYouRequest):
         "created_at": datetime.now().isoformat()
     }
 
+def _check_card_batch(size: int):
+    if size > CARD_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {CARD_BATCH_MAX_ITEMS} items.")
+
+@app.post("/greeting-card/batch")
+def create_greeting_cards(req: GreetingCardBatchRequest):
+    """Many cards with one LLM call per CARD_BATCH_SIZE cards, returned in request order"""
+    _check_card_batch(len(req.cards))
+    contents = generate_greeting_cards([card.dict() for card in req.cards])
+    created_at = datetime.now().isoformat()
+    return {"cards": [{"card_id": str(uuid.uuid4()), "content": content, "created_at": created_at} for content in contents]}
+
+@app.post("/thank-you/batch")
+def create_thank_you_notes(req: ThankYouBatchRequest):
+    """Many thank you notes with one LLM call per CARD_BATCH_SIZE notes, returned in request order"""
+    _check_card_batch(len(req.notes))
+    contents = generate_thank_you_notes([note.dict() for note in req.notes])
+    created_at = datetime.now().isoformat()
+    return {"notes": [{"note_id": str(uuid.uuid4()), "content": content, "created_at": created_at} for content in contents]}
+
+def _add_to_wishlist(user_id: str, product_ids: List[str]) -> List[str]:
+    store = get_user_store()
+    before = set(store.get_wishlist(user_id))
+    wishlist = store.add_to_wishlist(user_id, product_ids)
+    _record_user_event(user_id, "wishlist", {product_id: 1 for product_id in product_ids if product_id not in before})
+    return wishlist
+
+def _remove_from_wishlist(user_id: str, product_ids: List[str]) -> List[str]:
+    wishlist = get_user_store().remove_from_wishlist(user_id, product_ids)
+    _forget_user_events(user_id)
+    return wishlist
+
+def _add_to_cart(user_id: str, items: Dict[str, int]) -> Dict[str, int]:
+    cart = get_user_store().add_to_cart(user_id, items)
+    _record_user_event(user_id, "cart", items)
+    return cart
+
+def _remove_from_cart(user_id: str, product_ids: List[str]) -> Dict[str, int]:
+    cart = get_user_store().remove_from_cart(user_id, product_ids)
+    _forget_user_events(user_id)
+    return cart
+
 @app.post("/wishlist/{user_id}")
 def add_to_wishlist(user_id: str, product_id: str):
-    if user_id not in wishlists:
-        wishlists[user_id] = []
-    if product_id not in wishlists[user_id]:
-        wishlists[user_id].append(product_id)
-    return {"message": "Added to wishlist", "wishlist": wishlists[user_id]}
+    return {"message": "Added to wishlist", "wishlist": _add_to_wishlist(user_id, [product_id])}
 
 @app.get("/wishlist/{user_id}")
 def get_wishlist(user_id: str):
-    return {"wishlist": wishlists.get(user_id, [])}
+    return {"wishlist": get_user_store().get_wishlist(user_id)}
+
+@app.delete("/wishlist/{user_id}/{product_id}")
+def remove_from_wishlist(user_id: str, product_id: str):
+    return {"message": "Removed from wishlist", "wishlist": _remove_from_wishlist(user_id, [product_id])}
+
+@app.post("/wishlist/{user_id}/bulk")
+def add_to_wishlist_bulk(user_id: str, req: BulkProductsRequest):
+    return {"message": "Added to wishlist", "wishlist": _add_to_wishlist(user_id, req.product_ids)}
+
+@app.post("/wishlist/{user_id}/remove")
+def remove_from_wishlist_bulk(user_id: str, req: BulkProductsRequest):
+    return {"message": "Removed from wishlist", "wishlist": _remove_from_wishlist(user_id, req.product_ids)}
+
+@app.post("/wishlists")
+def get_wishlists(req: BulkUsersRequest):
+    return {"wishlists": get_user_store().get_wishlists(req.user_ids)}
 
 @app.post("/cart/{user_id}")
 def add_to_cart(user_id: str, product_id: str, quantity: int = 1):
-    if user_id not in carts:
-        carts[user_id] = {}
-    if product_id in carts[user_id]:
-        carts[user_id][product_id] += quantity
-    else:
-        carts[user_id][product_id] = quantity
-    return {"message": "Added to cart", "cart": carts[user_id]}
+    return {"message": "Added to cart", "cart": _add_to_cart(user_id, {product_id: quantity})}
 
 @app.get("/cart/{user_id}")
 def get_cart(user_id: str):
-    return {"cart": carts.get(user_id, {})}
+    return {"cart": get_user_store().get_cart(user_id)}
+
+@app.delete("/cart/{user_id}/{product_id}")
+def remove_from_cart(user_id: str, product_id: str):
+    return {"message": "Removed from cart", "cart": _remove_from_cart(user_id, [product_id])}
+
+@app.post("/cart/{user_id}/bulk")
+def add_to_cart_bulk(user_id: str, req: BulkCartRequest):
+    return {"message": "Added to cart", "cart": _add_to_cart(user_id, req.items)}
+
+@app.post("/cart/{user_id}/remove")
+def remove_from_cart_bulk(user_id: str, req: BulkProductsRequest):
+    return {"message": "Removed from cart", "cart": _remove_from_cart(user_id, req.product_ids)}
+
+@app.post("/carts")
+def get_carts(req: BulkUsersRequest):
+    return {"carts": get_user_store().get_carts(req.user_ids)}
 
 @app.get("/health")
 def health_check():
-    return {"status": "healthy", "products_loaded": len(products_df) if products_df is not None else 0} 
\ No newline at end of file
+    with load_state_lock:
+        catalog = dict(load_state)
+    if catalog["products_total"]:
+        catalog["progress"] = round(catalog["products_embedded"] / catalog["products_total"], 4)
+    return {
+        "status": "healthy",
+        "products_loaded": len(product_catalog) if product_catalog is not None else 0,
+        "catalog": catalog,
+        "user_vectors": user_vectors.stats() if user_vectors is not None else None,
+    }
+
+@app.get("/admin/profiling")
+def get_profiling(x_admin_token: Optional[str] = Header(None)):
+    if not check_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+    return {"sample_rate": profiling.settings["sample_rate"], "profiles": list_profiles()}
+
+@app.post("/admin/profiling")
+def set_profiling(req: ProfilingSettings, x_admin_token: Optional[str] = Header(None)):
+    if not check_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+    profiling.settings["sample_rate"] = min(max(req.sample_rate, 0.0), 1.0)
+    return {"sample_rate": profiling.settings["sample_rate"]}
+
+@app.get("/metrics")
+def metrics():
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4")
+
+@app.get("/ready")
+def readiness_check():
+    """200 only once embedding retrieval is usable; orchestrators should gate traffic on this"""
+    status = load_state["status"]
+    if status != "ready":
+        return JSONResponse(status_code=503, content={"ready": False, "status": status, "error": load_state["error"]})
+    return {"ready": True, "status": status}
@@ -0,0 +1,89 @@
+"""
+Embedding search over a prebuilt catalog bundle
+
+Shared by slim_service and the batch mode of recommend_products.py, so the
+batch CLI can retrieve candidates without importing the FastAPI app.
+Candidates are ranked as in recommendation_service: the SCORING_POOL_FACTOR
+times top_n most similar rows are reranked by scoring.CandidateScorer over
+the bundle's price, rating, popularity and attribute flag arrays, which
+also applies sort_by. numpy, onnxruntime and the bundle are only imported
+when an engine is loaded or queried.
+"""
+
+import os
+from typing import List, Optional
+
+from metrics import span
+from schemas import FilterOptions, OccasionInfo
+
+CANDIDATE_COUNT = 100
+
+class RetrievalEngine:
+    """Embedding search over a memory-mapped bundle"""
+
+    def __init__(self, bundle, encoder):
+        from scoring import CandidateScorer
+
+        self.bundle = bundle
+        self.encoder = encoder
+        self.scorer = CandidateScorer(bundle.prices, bundle.ratings, bundle.popularity, bundle.flags)
+
+    def candidate_mask(self, filter_options: FilterOptions):
+        """Boolean mask of rows passing the filters, or None when nothing is filtered"""
+        import numpy as np
+
+        if not filter_options:
+            return None
+        mask = None
+
+        def narrow(condition):
+            nonlocal mask
+            mask = condition if mask is None else mask & condition
+
+        # Unparseable prices and ratings are NaN and pass, as in recommendation_service
+        if filter_options.price_min:
+            narrow(~(self.bundle.prices < filter_options.price_min))
+        if filter_options.price_max:
+            narrow(~(self.bundle.prices > filter_options.price_max))
+        if filter_options.rating_min:
+            narrow(~(self.bundle.ratings < filter_options.rating_min))
+        if filter_options.category:
+            if 'main_category' in self.bundle.category_codes:
+                codes = self.bundle.category_codes_matching('main_category', filter_options.category)
+                narrow(np.isin(self.bundle.category_codes['main_category'], codes))
+            else:
+                narrow(np.zeros(len(self.bundle), dtype=bool))
+        return mask
+
+    def top_products(self, query: str, filter_options: FilterOptions, top_n: int = CANDIDATE_COUNT,
+                     occasion_info: Optional[OccasionInfo] = None) -> List[int]:
+        import numpy as np
+        from scoring import SCORING_POOL_FACTOR
+
+        with span("encode_query"):
+            query_emb = self.encoder.encode([query])[0]
+        with span("similarity"):
+            # Bundle embeddings are normalised, so the dot product is the cosine similarity
+            sims = self.bundle.embeddings @ query_emb
+        with span("filter"):
+            mask = self.candidate_mask(filter_options)
+            if mask is not None:
+                sims = np.where(mask, sims, -np.inf)
+                available = int(mask.sum())
+            else:
+                available = len(sims)
+            k = min(top_n * SCORING_POOL_FACTOR, available)
+            if k == 0:
+                return []
+            top = np.argpartition(-sims, k - 1)[:k]
+        with span("score"):
+            return self.scorer.rank(top, sims[top], occasion_info, filter_options, top_n).tolist()
+
+def load_retrieval_engine(bundle_dir: str = None) -> RetrievalEngine:
+    """Bundle plus ONNX query encoder; the encoder shipped in the bundle wins over ONNX_MODEL_DIR"""
+    from artifact_bundle import BUNDLE_DIR, load_bundle
+    from query_encoder import ONNX_MODEL_DIR, OnnxQueryEncoder
+
+    bundle = load_bundle(bundle_dir or BUNDLE_DIR)
+    encoder_dir = bundle.encoder_dir if os.path.isdir(bundle.encoder_dir) else ONNX_MODEL_DIR
+    return RetrievalEngine(bundle, OnnxQueryEncoder(encoder_dir))
@@ -0,0 +1,68 @@
+from pydantic import BaseModel
+from typing import List, Optional, Dict
+
+class RecipientProfile(BaseModel):
+    age: Optional[int] = None
+    gender: Optional[str] = None
+    interests: List[str] = []
+    hobbies: List[str] = []
+    relationship: Optional[str] = None
+    personality: List[str] = []
+    lifestyle: List[str] = []
+    preferences: List[str] = []
+
+class OccasionInfo(BaseModel):
+    occasion: str
+    mood: Optional[str] = None
+    formality: Optional[str] = None
+    budget_range: Optional[Dict[str, float]] = None
+
+class FilterOptions(BaseModel):
+    category: Optional[str] = None
+    price_min: Optional[float] = None
+    price_max: Optional[float] = None
+    eco_friendly: Optional[bool] = None
+    handmade: Optional[bool] = None
+    local: Optional[bool] = None
+    rating_min: Optional[float] = None
+    sort_by: Optional[str] = None  # price, rating, popularity
+
+class PromptRequest(BaseModel):
+    prompt: str
+    recipient_profile: Optional[RecipientProfile] = None
+    occasion_info: Optional[OccasionInfo] = None
+    filter_options: Optional[FilterOptions] = None
+    user_id: Optional[str] = None  # personalise with this user's wishlist and cart
+
+class BatchPromptRequest(BaseModel):
+    requests: List[PromptRequest]
+
+class GreetingCardRequest(BaseModel):
+    recipient_name: str
+    occasion: str
+    message_style: str  # funny, formal, emotional, romantic
+    personal_message: Optional[str] = None
+
+class ThankYouRequest(BaseModel):
+    gift_name: str
+    sender_name: str
+    occasion: str
+    message_style: str
+
+class GreetingCardBatchRequest(BaseModel):
+    cards: List[GreetingCardRequest]
+
+class ThankYouBatchRequest(BaseModel):
+    notes: List[ThankYouRequest]
+
+class BulkProductsRequest(BaseModel):
+    product_ids: List[str]
+
+class BulkCartRequest(BaseModel):
+    items: Dict[str, int]  # product_id -> quantity to add
+
+class BulkUsersRequest(BaseModel):
+    user_ids: List[str]
+
+class ProfilingSettings(BaseModel):
+    sample_rate: float  # fraction of requests to profile, 0 disables
@@ -0,0 +1,143 @@
+"""
+Multi-signal ranking of retrieved candidates
+
+Retrieval returns a pool of the most similar products; this stage reorders
+the pool by a weighted sum of per-product signals, all computed with numpy
+over the pool at once:
+
+    similarity   cosine similarity to the (personalised) query
+    budget       1 inside OccasionInfo.budget_range, decaying with distance outside it
+    rating       rating mapped from 1-5 to 0-1
+    popularity   log number of ratings, relative to the most-rated product
+    attributes   share of the requested eco_friendly / handmade / local flags the product has
+
+Missing prices and ratings score a neutral 0.5. Weights default to
+DEFAULT_WEIGHTS and can be overridden with SCORING_WEIGHTS, a JSON object
+such as '{"budget": 0.5, "popularity": 0}'. FilterOptions.sort_by ("price",
+"rating" or "popularity") orders the pool by that field first and uses the
+score to break ties.
+"""
+
+import json
+import os
+import re
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+import numpy as np
+
+from schemas import FilterOptions, OccasionInfo
+
+if TYPE_CHECKING:
+    # Only attribute_flags takes a DataFrame; ranking a bundle must not need pandas
+    import pandas as pd
+
+DEFAULT_WEIGHTS = {"similarity": 1.0, "budget": 0.3, "rating": 0.2, "popularity": 0.1, "attributes": 0.2}
+SCORING_WEIGHTS = {**DEFAULT_WEIGHTS, **json.loads(os.getenv('SCORING_WEIGHTS', '{}'))}
+# Candidates pulled by similarity before rescoring, as a multiple of the requested count
+SCORING_POOL_FACTOR = int(os.getenv('SCORING_POOL_FACTOR', '5'))
+
+# Keyword evidence for the attribute filters, matched case-insensitively against name and description
+ATTRIBUTE_KEYWORDS = {
+    "eco_friendly": ["eco-friendly", "eco friendly", "recycled", "organic", "sustainable", "biodegradable", "bamboo", "reusable"],
+    "handmade": ["handmade", "hand-made", "handcrafted", "hand crafted", "handwoven", "artisan"],
+    "local": ["local", "made in india", "locally"],
+}
+ATTRIBUTE_BITS = {name: 1 << bit for bit, name in enumerate(ATTRIBUTE_KEYWORDS)}
+ATTRIBUTE_TEXT_COLUMNS = ['name', 'description']
+
+def attribute_flags(products_df: 'pd.DataFrame') -> np.ndarray:
+    """Bitmask per product of the ATTRIBUTE_KEYWORDS groups its text mentions"""
+    columns = [col for col in ATTRIBUTE_TEXT_COLUMNS if col in products_df.columns]
+    flags = np.zeros(len(products_df), dtype=np.uint8)
+    if not columns:
+        return flags
+    text = products_df[columns[0]].fillna('').astype(str)
+    for col in columns[1:]:
+        text = text + ' ' + products_df[col].fillna('').astype(str)
+    text = text.str.lower()
+    for name, keywords in ATTRIBUTE_KEYWORDS.items():
+        pattern = r'\b(?:' + '|'.join(re.escape(keyword) for keyword in keywords) + r')\b'
+        flags[text.str.contains(pattern, regex=True).to_numpy()] |= ATTRIBUTE_BITS[name]
+    return flags
+
+def popularity_scores(rating_counts: np.ndarray) -> np.ndarray:
+    """log1p(count) / log1p(max count), 0 where unknown"""
+    counts = np.nan_to_num(np.asarray(rating_counts, dtype=np.float32), nan=0.0)
+    top = float(counts.max()) if len(counts) else 0.0
+    if top <= 0:
+        return np.zeros(len(counts), dtype=np.float32)
+    return (np.log1p(counts) / np.log1p(top)).astype(np.float32)
+
+class CandidateScorer:
+    """Per-product signals for the whole catalog, combined per request over a candidate pool"""
+
+    def __init__(self, prices: np.ndarray, ratings: np.ndarray, popularity: np.ndarray, flags: np.ndarray,
+                 weights: Optional[Dict[str, float]] = None):
+        self.prices = prices
+        self.ratings = ratings
+        self.popularity = popularity
+        self.flags = flags
+        self.weights = {**SCORING_WEIGHTS, **(weights or {})}
+
+    @staticmethod
+    def budget_fit(prices: np.ndarray, budget_range: Optional[Dict[str, float]]) -> Optional[np.ndarray]:
+        if not budget_range:
+            return None
+        low, high = budget_range.get('min'), budget_range.get('max')
+        fit = np.ones(len(prices), dtype=np.float32)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if high:
+                over = prices > high
+                fit[over] = np.exp(-(prices[over] - high) / high)
+            if low:
+                under = prices < low
+                fit[under] = np.clip(prices[under] / low, 0, 1)
+        fit[np.isnan(prices)] = 0.5
+        return fit
+
+    def score(self, candidates: np.ndarray, sims: np.ndarray, occasion_info: Optional[OccasionInfo] = None,
+              filter_options: Optional[FilterOptions] = None) -> np.ndarray:
+        """Combined score for each candidate row; sims are the candidates' similarities"""
+        w = self.weights
+        score = w["similarity"] * np.asarray(sims, dtype=np.float32)
+
+        if w["budget"]:
+            fit = self.budget_fit(self.prices[candidates], occasion_info.budget_range if occasion_info else None)
+            if fit is not None:
+                score += w["budget"] * fit
+        if w["rating"]:
+            ratings = self.ratings[candidates]
+            score += w["rating"] * np.where(np.isnan(ratings), 0.5, np.clip((ratings - 1) / 4, 0, 1))
+        if w["popularity"]:
+            score += w["popularity"] * self.popularity[candidates]
+        if w["attributes"] and filter_options:
+            wanted = [bit for name, bit in ATTRIBUTE_BITS.items() if getattr(filter_options, name, None)]
+            if wanted:
+                flags = self.flags[candidates]
+                matched = sum(((flags & bit) > 0).astype(np.float32) for bit in wanted)
+                score += w["attributes"] * matched / len(wanted)
+        return score
+
+    def rank(self, candidates: np.ndarray, sims: np.ndarray, occasion_info: Optional[OccasionInfo] = None,
+             filter_options: Optional[FilterOptions] = None, top_n: Optional[int] = None) -> np.ndarray:
+        """Candidates reordered best first, honouring filter_options.sort_by"""
+        return self.rank_with_scores(candidates, sims, occasion_info, filter_options, top_n)[0]
+
+    def rank_with_scores(self, candidates: np.ndarray, sims: np.ndarray, occasion_info: Optional[OccasionInfo] = None,
+                         filter_options: Optional[FilterOptions] = None, top_n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """rank() plus the combined score of each returned candidate"""
+        candidates = np.asarray(candidates)
+        score = self.score(candidates, sims, occasion_info, filter_options)
+        sort_by = filter_options.sort_by if filter_options else None
+        if sort_by == 'price':
+            key = np.nan_to_num(self.prices[candidates], nan=np.inf)
+            order = np.lexsort((-score, key))
+        elif sort_by == 'rating':
+            key = np.nan_to_num(self.ratings[candidates], nan=-np.inf)
+            order = np.lexsort((-score, -key))
+        elif sort_by == 'popularity':
+            order = np.lexsort((-score, -self.popularity[candidates]))
+        else:
+            order = np.argsort(-score, kind='stable')
+        order = order[:top_n]
+        return candidates[order], score[order]
@@ -0,0 +1,174 @@
+"""
+Slim serving entry point for serverless deployments (see api/index.py)
+
+Importing this module pulls in FastAPI, pydantic and requests only. numpy,
+onnxruntime and the catalog are loaded on the first request that needs
+retrieval, and the catalog comes from a prebuilt memory-mapped bundle
+(artifact_bundle.py) instead of a CSV parse plus a catalog-wide embedding
+pass, so a cold start does no catalog work at all.
+"""
+
+import threading
+import uuid
+from datetime import datetime
+from fastapi import FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from metrics import MetricsMiddleware, render_latest, span
+from openrouter_client import (
+    CARD_BATCH_MAX_ITEMS,
+    analyze_recipient_from_prompt,
+    build_enhanced_prompt,
+    build_recommendation_messages,
+    chat_completion,
+    generate_greeting_card,
+    generate_greeting_cards,
+    generate_thank_you_note,
+    generate_thank_you_notes,
+)
+from schemas import (
+    OccasionInfo,
+    FilterOptions,
+    PromptRequest,
+    GreetingCardRequest,
+    GreetingCardBatchRequest,
+    ThankYouRequest,
+    ThankYouBatchRequest,
+)
+from retrieval_engine import CANDIDATE_COUNT, RetrievalEngine, load_retrieval_engine
+
+RECOMMENDATION_COUNT = 50
+
+app = FastAPI()
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+app.add_middleware(MetricsMiddleware)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine() -> RetrievalEngine:
+    """Load the bundle and the ONNX encoder once, on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = load_retrieval_engine()
+                print(f"Loaded bundle with {len(_engine.bundle)} products.")
+    return _engine
+
+@app.post("/recommend")
+@app.post("/api/recommend")
+@app.post("/api/ai-recommendations")
+def recommend_products(req: PromptRequest):
+    try:
+        engine = get_engine()
+    except Exception as e:
+        print(f"Error loading bundle: {e}")
+        raise HTTPException(status_code=500, detail="No products loaded.")
+
+    # Analyze recipient if not provided
+    if not req.recipient_profile:
+        with span("analyze_recipient"):
+            req.recipient_profile = analyze_recipient_from_prompt(req.prompt)
+    if not req.occasion_info:
+        req.occasion_info = OccasionInfo(occasion="general")
+    if not req.filter_options:
+        req.filter_options = FilterOptions()
+
+    prompt = req.prompt
+    n = RECOMMENDATION_COUNT
+
+    enhanced_prompt = build_enhanced_prompt(prompt, req.recipient_profile, req.occasion_info)
+    top_idx = engine.top_products(enhanced_prompt, req.filter_options, top_n=CANDIDATE_COUNT, occasion_info=req.occasion_info)
+    if not top_idx:
+        # Fallback: a random sample, as the full service does when nothing matches
+        import numpy as np
+        top_idx = np.random.choice(len(engine.bundle), min(CANDIDATE_COUNT, len(engine.bundle)), replace=False).tolist()
+
+    with span("serialize_candidates"):
+        products_text = engine.bundle.describe(top_idx)
+    messages = build_recommendation_messages(prompt, req.recipient_profile, req.occasion_info, products_text, n)
+    response = chat_completion(messages, max_tokens=2048, temperature=0.7)
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"OpenRouter API error: {response.status_code} - {response.text}")
+    result = response.json()
+
+    return {
+        "recommendations": result['choices'][0]['message']['content'],
+        "recipient_profile": req.recipient_profile.dict(),
+        "occasion_info": req.occasion_info.dict(),
+        "filter_options": req.filter_options.dict()
+    }
+
+@app.post("/greeting-card")
+@app.post("/api/greeting-card")
+def create_greeting_card(req: GreetingCardRequest):
+    card_content = generate_greeting_card(
+        req.recipient_name,
+        req.occasion,
+        req.message_style,
+        req.personal_message
+    )
+    return {
+        "card_id": str(uuid.uuid4()),
+        "content": card_content,
+        "created_at": datetime.now().isoformat()
+    }
+
+@app.post("/thank-you")
+@app.post("/api/thank-you")
+def create_thank_you_note(req: ThankYouRequest):
+    note = generate_thank_you_note(
+        req.gift_name,
+        req.sender_name,
+        req.occasion,
+        req.message_style
+    )
+    return {
+        "note_id": str(uuid.uuid4()),
+        "content": note,
+        "created_at": datetime.now().isoformat()
+    }
+
+def _check_card_batch(size: int):
+    if size > CARD_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {CARD_BATCH_MAX_ITEMS} items.")
+
+@app.post("/greeting-card/batch")
+@app.post("/api/greeting-card/batch")
+def create_greeting_cards(req: GreetingCardBatchRequest):
+    """Many cards with one LLM call per CARD_BATCH_SIZE cards, returned in request order"""
+    _check_card_batch(len(req.cards))
+    contents = generate_greeting_cards([card.dict() for card in req.cards])
+    created_at = datetime.now().isoformat()
+    return {"cards": [{"card_id": str(uuid.uuid4()), "content": content, "created_at": created_at} for content in contents]}
+
+@app.post("/thank-you/batch")
+@app.post("/api/thank-you/batch")
+def create_thank_you_notes(req: ThankYouBatchRequest):
+    """Many thank you notes with one LLM call per CARD_BATCH_SIZE notes, returned in request order"""
+    _check_card_batch(len(req.notes))
+    contents = generate_thank_you_notes([note.dict() for note in req.notes])
+    created_at = datetime.now().isoformat()
+    return {"notes": [{"note_id": str(uuid.uuid4()), "content": content, "created_at": created_at} for content in contents]}
+
+@app.get("/metrics")
+@app.get("/api/metrics")
+def metrics():
+    return PlainTextResponse(render_latest(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health")
+@app.get("/api/health")
+def health_check():
+    return {
+        "status": "healthy",
+        "products_loaded": len(_engine.bundle) if _engine is not None else 0,
+        "bundle_loaded": _engine is not None,
+    }
@@ -0,0 +1,42 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Tests import the service modules from the repository root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+# The service modules refuse to import without an API key; no test talks to OpenRouter
+os.environ.setdefault('OPENROUTER_API_KEY', 'test')
+os.environ['USER_STORE_URL'] = 'memory://'
+
+class HashEncoder:
+    """Deterministic stand-in for the sentence encoder: a seeded vector per text"""
+
+    def encode(self, sentences, batch_size: int = 32, **kwargs):
+        vectors = np.stack([np.random.default_rng(abs(hash(text)) % 2**32).standard_normal(16) for text in sentences])
+        return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def write_catalog(path, rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    categories = ['Electronics', 'Home & Kitchen', 'Sports', 'Books']
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("Skip this line\nSkip this line too\nSkip this third line\n")
+        f.write("name,main_category,sub_category,description,actual_price,ratings,no_of_ratings\n")
+        for i in range(rows):
+            category = categories[i % len(categories)]
+            f.write(f"Product {i},{category},Sub {i % 7},Description of product {i},"
+                    f"\"₹{int(rng.lognormal(7, 1)):,}\",{rng.uniform(2.5, 5):.1f},{int(rng.lognormal(4, 2))}\n")
+
+@pytest.fixture(scope='session')
+def service(tmp_path_factory):
+    """recommendation_service loaded with a synthetic catalog, a stub encoder and an in-memory user store"""
+    import recommendation_service
+
+    csv_path = tmp_path_factory.mktemp('catalog') / 'products.csv'
+    write_catalog(csv_path, 3000)
+    recommendation_service.CSV_PATH = str(csv_path)
+    recommendation_service.load_query_encoder = lambda backend=None: HashEncoder()
+    recommendation_service.load_products()
+    assert recommendation_service.load_state['status'] == 'ready'
+    return recommendation_service
@@ -0,0 +1,85 @@
+import pytest
+
+import query_encoder
+from artifact_bundle import VARIANTS_FILE, build_bundle, load_bundle
+from conftest import HashEncoder
+
+CSV = """junk
+junk
+junk
+name,main_category,sub_category,link,actual_price,ratings
+Cotton Bedsheet Set (Blue),Home & Kitchen,Bedding,https://example.com/blue,"₹1,299",4.2
+Cotton Bedsheet Set (Red),Home & Kitchen,Bedding,https://example.com/red,"₹1,349",4.0
+Cotton Bedsheet Set (Green),Home & Kitchen,Bedding,https://example.com/green,"₹1,299",4.1
+Steel Water Bottle 1L,Sports,Fitness,https://example.com/bottle,₹499,4.5
+"""
+
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(query_encoder, 'load_query_encoder', lambda backend=None: HashEncoder())
+    monkeypatch.setattr(query_encoder, 'ONNX_MODEL_DIR', str(tmp_path / 'no-encoder'))
+    path = tmp_path / 'products.csv'
+    path.write_text(CSV, encoding='utf-8')
+    return str(path)
+
+def test_dedup_bundle_keeps_variants(csv_path, tmp_path):
+    build_bundle(csv_path, str(tmp_path / 'bundle'), dedup=True)
+    bundle = load_bundle(str(tmp_path / 'bundle'))
+    assert len(bundle) == 2
+    assert bundle.manifest['variants'] == VARIANTS_FILE
+    (row, listings), = bundle.variants.items()
+    assert bundle.rows([row])[0]['name'] == 'Cotton Bedsheet Set (Blue)'
+    assert sorted(listing['name'] for listing in listings) == ['Cotton Bedsheet Set (Green)', 'Cotton Bedsheet Set (Red)']
+    assert all(len(listing['product_id']) == 16 for listing in listings)
+
+def test_plain_bundle_has_no_variants(csv_path, tmp_path):
+    build_bundle(csv_path, str(tmp_path / 'bundle'))
+    bundle = load_bundle(str(tmp_path / 'bundle'))
+    assert len(bundle) == 4 and bundle.manifest['variants'] is None
+    assert bundle.variants == {}
+    assert not (tmp_path / 'bundle' / VARIANTS_FILE).exists()
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    from retrieval_engine import RetrievalEngine
+
+    monkeypatch.setattr(query_encoder, 'load_query_encoder', lambda backend=None: HashEncoder())
+    monkeypatch.setattr(query_encoder, 'ONNX_MODEL_DIR', str(tmp_path / 'no-encoder'))
+    lines = ["junk", "junk", "junk", "name,main_category,sub_category,description,actual_price,ratings,no_of_ratings"]
+    for i in range(40):
+        description = "Made from recycled steel" if i % 4 == 0 else "Sturdy steel build"
+        lines.append(f"Steel Bottle {i},Sports,Fitness,{description},\"₹{(i * 37) % 900 + 100:,}\",4.{i % 10},\"{i * 101:,}\"")
+    path = tmp_path / 'products.csv'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    build_bundle(str(path), str(tmp_path / 'bundle'))
+    return RetrievalEngine(load_bundle(str(tmp_path / 'bundle')), HashEncoder())
+
+def test_bundle_carries_scoring_signals(engine):
+    from scoring import ATTRIBUTE_BITS
+
+    bundle = engine.bundle
+    assert bundle.popularity.argmax() == 39 and bundle.popularity[0] == 0
+    assert (bundle.flags & ATTRIBUTE_BITS['eco_friendly'] > 0).nonzero()[0].tolist() == list(range(0, 40, 4))
+
+def test_engine_applies_sort_by_and_attribute_scoring(engine, monkeypatch):
+    from schemas import FilterOptions
+
+    rows = engine.top_products("steel bottle", FilterOptions(sort_by='price'), top_n=8)
+    prices = engine.bundle.prices[rows]
+    assert len(rows) == 8 and (prices[:-1] <= prices[1:]).all()
+
+    monkeypatch.setitem(engine.scorer.weights, 'attributes', 10.0)
+    rows = engine.top_products("steel bottle", FilterOptions(eco_friendly=True), top_n=5)
+    assert all(row % 4 == 0 for row in rows)
+
+def test_old_bundles_are_rejected(engine):
+    import json
+    import os
+
+    manifest_path = os.path.join(engine.bundle.directory, 'manifest.json')
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({**manifest, 'version': 1}, f)
+    with pytest.raises(ValueError, match="rebuild"):
+        load_bundle(engine.bundle.directory)
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from schemas import PromptRequest, RecipientProfile
+
+class FakeResponse:
+    status_code = 200
+    text = ''
+
+    def json(self):
+        return {'choices': [{'message': {'content': 'ok'}}]}
+
+@pytest.fixture
+def llm(service, monkeypatch):
+    """Stub LLM: analysis of prompts starting with "slow" blocks until release is set"""
+    release = threading.Event()
+    calls = {'analyse': [], 'recommend': 0}
+
+    def analyse(prompt):
+        calls['analyse'].append(prompt)
+        if prompt.startswith('slow'):
+            release.wait(5)
+        return RecipientProfile(interests=['tea'])
+
+    def complete(messages, **kwargs):
+        calls['recommend'] += 1
+        return FakeResponse()
+
+    monkeypatch.setattr(service, 'analyze_recipient_from_prompt', analyse)
+    monkeypatch.setattr(service, 'chat_completion', complete)
+    monkeypatch.setattr(service, 'BATCH_LLM_CONCURRENCY', 2)
+    monkeypatch.setattr(service, 'BATCH_RETRIEVAL_WAIT', 0.05)
+    yield release, calls
+    release.set()
+
+def test_streams_before_slow_analyses_finish(service, llm):
+    release, calls = llm
+    profile = RecipientProfile(interests=['tea'])
+    reqs = [PromptRequest(prompt='slow gift'), PromptRequest(prompt='mug for my aunt', recipient_profile=profile),
+            PromptRequest(prompt='tea set', recipient_profile=profile)]
+    results = service.recommend_batch(reqs)
+    first, second = next(results), next(results)
+    assert {first['index'], second['index']} == {1, 2} and not release.is_set()
+    release.set()
+    assert next(results)['index'] == 0
+    assert calls['recommend'] == 3
+
+@pytest.fixture
+def retrievals(service, monkeypatch):
+    """Sizes of the find_top_products_batch calls made"""
+    sizes = []
+    retrieve = service.find_top_products_batch
+
+    def spy(reqs, top_n=100):
+        sizes.append(len(reqs))
+        return retrieve(reqs, top_n)
+
+    monkeypatch.setattr(service, 'find_top_products_batch', spy)
+    return sizes
+
+def test_profiled_requests_are_retrieved_in_one_call(service, llm, retrievals):
+    _, calls = llm
+    reqs = [PromptRequest(prompt=f'gift {i}', recipient_profile=RecipientProfile(interests=['tea'])) for i in range(200)]
+    results = list(service.recommend_batch(reqs))
+    assert sorted(result['index'] for result in results) == list(range(200))
+    assert retrievals == [200]
+    assert calls['analyse'] == []
+
+def test_analysed_requests_are_retrieved_in_groups(service, llm, retrievals, monkeypatch):
+    _, calls = llm
+    monkeypatch.setattr(service, 'BATCH_RETRIEVAL_GROUP', 16)
+    monkeypatch.setattr(service, 'BATCH_RETRIEVAL_WAIT', 60)
+    reqs = [PromptRequest(prompt=f'gift {i}') for i in range(40)]
+    reqs += [PromptRequest(prompt='mug', recipient_profile=RecipientProfile(interests=['tea']))] * 5
+    assert len(list(service.recommend_batch(reqs))) == 45
+    assert retrievals == [5, 16, 16, 8]
+    assert len(calls['analyse']) == 40
+
+def test_closing_cancels_outstanding_requests(service, llm):
+    release, calls = llm
+    reqs = [PromptRequest(prompt='quick', recipient_profile=RecipientProfile())]
+    reqs += [PromptRequest(prompt=f'slow {i}') for i in range(6)]
+    results = service.recommend_batch(reqs)
+    assert next(results)['index'] == 0
+    results.close()
+    release.set()
+    time.sleep(0.1)
+    assert len(calls['analyse']) < len(reqs)
+    assert calls['recommend'] == 1
+
+def test_batch_job_completes(service, llm, monkeypatch, tmp_path):
+    monkeypatch.setattr(service, 'BATCH_JOB_DIR', str(tmp_path))
+    client = TestClient(service.app)
+    job = client.post('/recommend/jobs', json={'requests': [{'prompt': 'mug'}, {'prompt': 'tea'}]}).json()
+    assert job['total'] == 2
+    for _ in range(100):
+        status = client.get(f"/recommend/jobs/{job['job_id']}").json()
+        if status['status'] == 'done':
+            break
+        time.sleep(0.02)
+    assert status['completed'] == 2 and status['failed'] == 0 and status['finished_at']
+    assert len(client.get(f"/recommend/jobs/{job['job_id']}/results").text.splitlines()) == 2
@@ -0,0 +1,73 @@
+import json
+import threading
+
+import pytest
+
+import openrouter_client
+from openrouter_client import generate_greeting_cards, generate_thank_you_notes
+
+class FakeResponse:
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.text = content
+
+    def json(self):
+        return {'choices': [{'message': {'content': self.content}}]}
+
+@pytest.fixture
+def llm(monkeypatch):
+    """Stub chat_completion; reply(payload, call) builds each response from the request's JSON payload"""
+    calls = []
+    lock = threading.Lock()
+    state = {'reply': None}
+
+    def complete(messages, **kwargs):
+        payload = json.loads(messages[-1]['content'])
+        with lock:
+            calls.append(payload)
+            call = len(calls)
+        return state['reply'](payload, call)
+
+    monkeypatch.setattr(openrouter_client, 'chat_completion', complete)
+    monkeypatch.setattr(openrouter_client, 'CARD_BATCH_SIZE', 2)
+    monkeypatch.setattr(openrouter_client, 'CARD_BATCH_RETRIES', 1)
+    return state, calls
+
+def _notes(count):
+    return [{"gift_name": f"gift {i}", "sender_name": "Sam", "occasion": "birthday", "message_style": "warm"}
+            for i in range(count)]
+
+def test_replies_map_back_by_id(llm):
+    state, calls = llm
+    # Replies come back out of order and fenced
+    state['reply'] = lambda payload, call: FakeResponse(
+        "```json\n" + json.dumps([{"id": item["id"], "note": f"thanks for {item['gift_name']}"}
+                                 for item in reversed(payload)]) + "\n```")
+    notes = generate_thank_you_notes(_notes(5))
+    assert notes == [f"thanks for gift {i}" for i in range(5)]
+    assert sorted(len(payload) for payload in calls) == [1, 2, 2]
+
+def test_missing_and_malformed_items_are_retried(llm):
+    state, calls = llm
+
+    def reply(payload, call):
+        replies = [{"id": item["id"], "note": item['gift_name']} for item in payload if item['gift_name'] != 'gift 1']
+        if call <= 2:
+            # First round: gift 1 comes back with a bogus id or without a note
+            replies += [{"id": 7, "note": "stray"}, {"id": 1, "note": None}]
+        else:
+            replies += [{"id": item["id"], "note": item['gift_name']} for item in payload if item['gift_name'] == 'gift 1']
+        return FakeResponse(json.dumps(replies))
+
+    state['reply'] = reply
+    assert generate_thank_you_notes(_notes(3)) == ['gift 0', 'gift 1', 'gift 2']
+    assert calls[-1] == [{"id": 0, **_notes(3)[1]}]
+
+def test_fallback_after_retries(llm):
+    state, calls = llm
+    state['reply'] = lambda payload, call: FakeResponse('rate limited', status_code=429) if call % 2 else \
+        FakeResponse('not json')
+    cards = generate_greeting_cards([{"recipient_name": "Ana", "occasion": "wedding", "message_style": "formal"}])
+    assert cards == [{"title": "Greeting Card", "message": "Happy occasion!", "signature": "Best wishes"}]
+    assert len(calls) == 2
@@ -0,0 +1,52 @@
+import io
+
+import pandas as pd
+import pytest
+
+from compact_catalog import CompactCatalog
+
+CSV = """name,main_category,sub_category,description,actual_price,ratings,no_of_ratings
+Chocolate ÉCLAIR Gift Box,Grocery,Sweets,Twelve handmade éclairs,"₹1,299",4.5,120
+Crème Brûlée Torch,Home & Kitchen,Kitchen Tools,,₹899,4.1,35
+Wireless Mouse,Electronics,Accessories,Quiet clicks for the office,₹499,,1021
+STRASSE Street Map,Books,Travel,Maps of every Straße in Berlin,₹350,3.9,
+Yoga Mat,Sports,Fitness,Non-slip mat,₹999,4.8,88
+Ceramic Mug,Home & Kitchen,Dining,Holds 350 ml,₹249,4.0,15
+"""
+
+@pytest.fixture
+def frames():
+    df = pd.read_csv(io.StringIO(CSV))
+    # Repeat the rows so low-cardinality columns are stored as codes and the rest as arenas
+    df = pd.concat([df] * 3, ignore_index=True)
+    df['name'] = df['name'] + [f" #{i}" for i in range(len(df))]
+    df['description'] = df['description'] + [f" (lot {i})" for i in range(len(df))]
+    return df, CompactCatalog.from_dataframe(df)
+
+def test_storage_split(frames):
+    _, catalog = frames
+    assert {'main_category', 'sub_category'} <= set(catalog.codes)
+    assert {'name', 'description'} <= set(catalog.arenas)
+    assert {'ratings'} <= set(catalog.numeric)
+
+def test_rows_and_describe_match_dataframe(frames):
+    df, catalog = frames
+    rows = [4, 0, 9, 1, 3]
+    expected = [{col: value for col, value in values.items() if pd.notnull(value)}
+                for values in df.iloc[rows].to_dict('records')]
+    assert catalog.rows(rows) == expected
+    assert catalog.describe(rows) == '\n'.join(
+        ', '.join(f"{col}: {row[col]}" for col in df.columns if pd.notnull(row[col]))
+        for _, row in df.iloc[rows].iterrows()
+    )
+
+@pytest.mark.parametrize("column", ['name', 'main_category', 'description', 'ratings'])
+@pytest.mark.parametrize("needle", ['mouse', 'ÉCLAIR', 'éclair', 'brûlée', 'KITCHEN', '4.5', ' #1', 'x-ray', ''])
+def test_contains_matches_dataframe(frames, column, needle):
+    df, catalog = frames
+    expected = df[column].astype(str).where(df[column].notna()).str.contains(needle, case=False, na=False, regex=False)
+    assert catalog.contains(column, needle).tolist() == expected.tolist()
+
+def test_contains_unknown_column(frames):
+    _, catalog = frames
+    assert not catalog.contains('brand', 'mouse').any()
@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+import cursor_cache
+from cursor_cache import CursorCache, decode_cursor, encode_cursor
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor("abc_-9", 120)) == ("abc_-9", 120)
+
+@pytest.mark.parametrize("cursor", ["", "not base64!", encode_cursor("abc", 0)[:-3] + "@@", "YWJj"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+def test_negative_offset_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor(encode_cursor("abc", -5))
+
+def _entry_bytes(rows):
+    return rows * (4 + 4) + cursor_cache.CONTEXT_BYTES  # int32 ids + float32 scores
+
+def test_evicts_least_recently_used_over_byte_budget():
+    cache = CursorCache(max_bytes=2 * _entry_bytes(100), ttl=60)
+    first = cache.put(np.arange(100), np.zeros(100), "first")
+    second = cache.put(np.arange(100), np.zeros(100), "second")
+    assert cache.get(first).context == "first"  # now most recently used
+    third = cache.put(np.arange(100), np.zeros(100), "third")
+    assert cache.get(second) is None
+    assert cache.get(first) is not None and cache.get(third) is not None
+    assert cache.stats() == {"entries": 2, "bytes": 2 * _entry_bytes(100)}
+
+def test_expires_entries_idle_past_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cursor_cache.time, 'monotonic', lambda: now[0])
+    cache = CursorCache(ttl=10)
+    key = cache.put(np.arange(5), np.zeros(5), None)
+    now[0] += 9
+    assert cache.get(key) is not None  # refreshes last use
+    now[0] += 9
+    assert cache.get(key) is not None
+    now[0] += 11
+    assert cache.get(key) is None
+    assert len(cache) == 0
@@ -0,0 +1,97 @@
+import pandas as pd
+
+import numpy as np
+
+from dedup import collapse_duplicates, duplicate_share, name_key
+
+def test_names_without_tokens_do_not_crash_or_merge():
+    products_df = pd.DataFrame({'name': ['Mug', 'Pen', '!!!'], 'main_category': ['a'] * 3})
+    assert collapse_duplicates(products_df).clusters.tolist() == [0, 1, 2]
+
+    products_df = pd.DataFrame({'name': ['!!!', 'Mug', '???', '电水壶'], 'main_category': ['a'] * 4})
+    assert collapse_duplicates(products_df).clusters.tolist() == [0, 1, 2, 3]
+
+def _clusters(rows):
+    products_df = pd.DataFrame(rows, columns=['name', 'main_category', 'sub_category', 'actual_price'])
+    return collapse_duplicates(products_df).clusters.tolist()
+
+def test_name_key_keeps_materials_and_nouns():
+    assert name_key("Gold Coin 10g") != name_key("Silver Coin 10g")
+    assert name_key("Desk Light") != name_key("Desk")
+    assert name_key("Rose Gold Earrings") != name_key("Silver Earrings")
+    assert name_key("Set of 6 Glasses") != name_key("Glasses")
+    assert name_key("boAt Rockerz 450 Headphones (Luscious Black)") == name_key("boAt Rockerz 450 Headphones - Blue")
+    assert name_key("Cotton T-Shirt, Large, Navy") == name_key("Cotton T-Shirt Small Maroon")
+
+def test_colour_variants_collapse_with_variant_links():
+    products_df = pd.DataFrame({
+        'name': ["boAt Rockerz 450 Bluetooth On Ear Headphones with Mic (Luscious Black)",
+                 "boAt Rockerz 450 Bluetooth On Ear Headphones with Mic (Aqua Blue)",
+                 "Milton Thermosteel Flask 1000 ml"],
+        'main_category': ['Electronics', 'Electronics', 'Home & Kitchen'],
+        'sub_category': ['Headphones', 'Headphones', 'Kitchen'],
+        'actual_price': ['₹1,499', '₹1,399', '₹899'],
+        'no_of_ratings': ['1,000', '20,000', '50'],
+    })
+    result = collapse_duplicates(products_df)
+    assert result.clusters.tolist() == [0, 0, 2]
+    # The most rated listing represents the cluster; the other becomes its variant
+    assert result.products_df['name'].tolist()[0].endswith("(Aqua Blue)")
+    assert result.variants == {0: [{'name': products_df['name'][0], 'actual_price': '₹1,499'}]}
+    assert result.stats()['rows_after'] == 2
+
+def test_different_materials_do_not_merge():
+    assert len(set(_clusters([
+        ["MMTC-PAMP Gold Coin 10g 24k", "Jewellery", "Coins", "₹62,000"],
+        ["MMTC-PAMP Silver Coin 10g 999", "Jewellery", "Coins", "₹950"],
+        ["Rose Gold Plated Hoop Earrings", "Jewellery", "Earrings", "₹499"],
+        ["Silver Plated Hoop Earrings", "Jewellery", "Earrings", "₹499"],
+    ]))) == 4
+
+def test_price_or_sub_category_mismatch_blocks_merge():
+    assert _clusters([
+        ["Wipro 9W LED Desk Lamp - White", "Home", "Lighting", "₹799"],
+        ["Wipro 9W LED Desk Lamp - Black", "Home", "Lighting", "₹849"],
+        ["Wipro 9W LED Desk Lamp - Blue", "Home", "Lighting", "₹7,999"],
+        ["Wipro 9W LED Desk Lamp - Red", "Home", "Spare Parts", "₹799"],
+    ]) == [0, 0, 2, 3]
+
+def test_seller_copies_merge_and_neighbouring_models_do_not():
+    name = "Prestige Iris 750 Watt Mixer Grinder with 3 Stainless Steel Jars and 1 Juicer Jar"
+    assert _clusters([
+        [name + " (Purple)", "Home & Kitchen", "Kitchen Appliances", "₹3,199"],
+        [name.replace(" with", ", with") + " [Pack]", "Home & Kitchen", "Kitchen Appliances", "₹3,299"],
+        [name.replace("750", "550"), "Home & Kitchen", "Kitchen Appliances", "₹2,999"],
+        ["Bajaj Rex 500 Watt Mixer Grinder with 3 Jars", "Home & Kitchen", "Kitchen Appliances", "₹2,199"],
+    ]) == [0, 0, 2, 3]
+
+def test_positions_and_variant_ids_follow_the_representative():
+    products_df = pd.DataFrame({
+        'name': ["Milton Thermosteel Flask 1000 ml", "Prestige Iris 750 W Mixer Grinder",
+                 "Milton Thermosteel Flask 1000 ml (Red)", "Milton Thermosteel Flask 1000 ml (Blue)"],
+        'main_category': ['Home & Kitchen'] * 4,
+        'sub_category': ['Flasks', 'Mixers', 'Flasks', 'Flasks'],
+        'actual_price': ['₹899', '₹3,299', '₹949', '₹899'],
+        'no_of_ratings': ['10', '500', '9,000', '40'],
+    })
+    ids = np.array([b'a0', b'b1', b'c2', b'd3'])
+    result = collapse_duplicates(products_df, product_ids=ids)
+    assert result.keep.tolist() == [1, 2]
+    assert result.positions.tolist() == [1, 0, 1, 1]
+    assert result.products_df['name'][result.positions[0]] == products_df['name'][2]
+    assert [variant['product_id'] for variant in result.variants[1]] == ['a0', 'd3']
+    assert duplicate_share([0, 2, 1, 3], result.clusters) == 0.5
+    assert duplicate_share([], result.clusters) == 0.0
+
+def test_absorbed_leader_brings_its_followers(monkeypatch):
+    import dedup
+
+    # Group 1 leads group 2 after band 0; band 1 then puts group 1 under group 0
+    monkeypatch.setattr(dedup, 'simhashes', lambda texts: np.array([0, 1, 1 | 1 << 16], dtype=np.uint64))
+    products_df = pd.DataFrame({
+        'name': ["Ceramic Coffee Mug", "Stoneware Coffee Mug", "Porcelain Coffee Mug"],
+        'main_category': ['Home & Kitchen'] * 3,
+        'sub_category': ['Drinkware'] * 3,
+        'actual_price': ['₹499'] * 3,
+    })
+    assert dedup.cluster_products(products_df).tolist() == [0, 0, 0]
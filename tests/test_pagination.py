@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from schemas import FilterOptions, OccasionInfo, RecipientProfile
+
+@pytest.mark.parametrize("options", [{}, {"sort_by": "price"}, {"sort_by": "rating", "price_max": 2000}])
+def test_first_page_does_not_depend_on_cursor_depth(service, options):
+    args = ("gift for my brother", RecipientProfile(), OccasionInfo(occasion="birthday"), FilterOptions(**options))
+    head, head_scores = service.find_ranked_products(*args, top_n=service.CANDIDATE_COUNT)
+    ranked, scores = service.find_ranked_products(*args, top_n=service.CANDIDATE_COUNT, depth=service.CURSOR_DEPTH)
+    assert len(head) == service.CANDIDATE_COUNT
+    assert ranked[:len(head)].tolist() == head.tolist()
+    assert np.allclose(scores[:len(head)], head_scores)
+    assert len(ranked) > len(head) and len(set(ranked.tolist())) == len(ranked)
+
+def test_page_endpoint_rejects_negative_offset(service):
+    from fastapi.testclient import TestClient
+    from cursor_cache import encode_cursor
+
+    key = service.cursor_cache.put(np.arange(50), np.zeros(50), None)
+    client = TestClient(service.app)
+    assert client.get('/recommend/page', params={'cursor': encode_cursor(key, -5)}).status_code == 400
+    page = client.get('/recommend/page', params={'cursor': encode_cursor(key, 45), 'page_size': 10}).json()
+    assert len(page['products']) == 5 and page['next_cursor'] is None
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from catalog import assign_product_ids
+from compact_catalog import ProductIdIndex
+from dedup import collapse_duplicates
+
+def _catalog():
+    return pd.DataFrame({
+        'name': ["Yoga Mat - Blue", "Yoga Mat - Black", "Coffee Mug", "Desk Lamp"],
+        'main_category': ['Sports', 'Sports', 'Home', 'Home'],
+        'sub_category': ['Yoga', 'Yoga', 'Drinkware', 'Lighting'],
+        'actual_price': ['₹500', '₹520', '₹300', '₹900'],
+    })
+
+def test_ids_do_not_depend_on_row_order():
+    products_df = _catalog()
+    ids = dict(zip(products_df['name'], assign_product_ids(products_df)))
+    shuffled = products_df.iloc[[3, 1, 0]].reset_index(drop=True)
+    assert dict(zip(shuffled['name'], assign_product_ids(shuffled))) == {name: ids[name] for name in shuffled['name']}
+
+def test_id_column_wins_over_hash():
+    products_df = _catalog().assign(product_id=['A1', None, 'C3', 'D4'])
+    ids = assign_product_ids(products_df)
+    assert ids[0] == b'A1' and ids[2] == b'C3'
+    assert ids[1] == assign_product_ids(_catalog())[1]
+
+def test_index_resolves_ids_and_collapsed_variants():
+    products_df = _catalog()
+    ids = assign_product_ids(products_df)
+    result = collapse_duplicates(products_df, product_ids=ids)
+    index = ProductIdIndex(ids, result.positions)
+    rows = index.rows_for([product_id.decode() for product_id in ids] + ['unknown'])
+    assert rows == [0, 0, 1, 2, None]
+    assert result.variants[0][0]['product_id'] == ids[1].decode()
+
+def test_index_without_dedup_is_identity():
+    ids = np.array([b'b', b'a', b'c'])
+    index = ProductIdIndex(ids, np.arange(3))
+    assert index.rows_for(['a', 'b', 'c', 'ab', '']) == [1, 0, 2, None, None]
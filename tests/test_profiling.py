@@ -0,0 +1,36 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import profiling
+
+def _client(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, 'PROFILE_TOKEN', 'secret')
+    monkeypatch.setattr(profiling, 'PROFILE_DIR', str(tmp_path))
+    monkeypatch.setattr(profiling, '_last_profile_at', -profiling.PROFILE_MIN_INTERVAL)
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware)
+
+    @app.get('/plain')
+    def plain():
+        return {}
+
+    @app.get('/profiled')
+    @profiling.profiled
+    def slow():
+        return {}
+
+    return TestClient(app)
+
+def test_unprofiled_route_does_not_take_the_slot(monkeypatch, tmp_path):
+    client = _client(monkeypatch, tmp_path)
+    headers = {'X-Profile': 'secret'}
+    assert 'x-profile-file' not in client.get('/plain', headers=headers).headers
+    first = client.get('/profiled', headers=headers).headers
+    assert (tmp_path / first['x-profile-file']).exists()
+    # The next profile has to wait for PROFILE_MIN_INTERVAL
+    assert 'x-profile-file' not in client.get('/profiled', headers=headers).headers
+
+def test_requires_matching_token(monkeypatch, tmp_path):
+    client = _client(monkeypatch, tmp_path)
+    assert 'x-profile-file' not in client.get('/profiled', headers={'X-Profile': 'wrong'}).headers
+    assert list(tmp_path.iterdir()) == []
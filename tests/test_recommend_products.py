@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+
+import pytest
+import requests
+
+import recommend_products
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ''
+
+    def json(self):
+        return {'choices': [{'message': {'content': 'ok'}}]}
+
+class FakeEngine:
+    class bundle:
+        @staticmethod
+        def describe(rows):
+            return 'name: Mug'
+
+    def top_products(self, query, filter_options, top_n):
+        return [0, 1]
+
+class Limiter:
+    def wait(self):
+        pass
+
+@pytest.fixture
+def replies(monkeypatch):
+    """Queue of responses (or exceptions) returned by request_recommendations; records the sleeps"""
+    queue, sleeps = [], []
+
+    def request(*args):
+        reply = queue.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(recommend_products, 'request_recommendations', request)
+    monkeypatch.setattr(recommend_products.time, 'sleep', sleeps.append)
+    return queue, sleeps
+
+def _recommend():
+    return recommend_products.recommend_one(FakeEngine(), {'prompt': 'mug'}, Limiter(), None)
+
+def test_retries_connection_errors(replies):
+    queue, sleeps = replies
+    queue += [requests.ConnectionError('reset'), requests.Timeout('slow'), FakeResponse(200)]
+    assert _recommend() == {'recommendations': 'ok', 'candidates': 2}
+    assert sleeps == [1, 2]
+
+def test_gives_up_after_max_retries(replies):
+    queue, _ = replies
+    queue += [requests.ConnectionError('reset')] * (recommend_products.MAX_RETRIES + 1)
+    with pytest.raises(requests.ConnectionError):
+        _recommend()
+
+def test_retry_after_seconds_or_backoff(replies):
+    queue, sleeps = replies
+    queue += [FakeResponse(429, {'Retry-After': '3'}),
+              FakeResponse(503, {'Retry-After': 'Wed, 21 Oct 2026 07:28:00 GMT'}),
+              FakeResponse(500), FakeResponse(200)]
+    assert _recommend()['recommendations'] == 'ok'
+    assert sleeps == [3.0, 2, 4]
+
+def test_client_errors_are_not_retried(replies):
+    queue, sleeps = replies
+    queue += [FakeResponse(400)]
+    with pytest.raises(RuntimeError):
+        _recommend()
+    assert sleeps == []
+
+def test_retrieval_engine_does_not_import_the_app():
+    code = "import sys, retrieval_engine; assert 'fastapi' not in sys.modules and 'slim_service' not in sys.modules"
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
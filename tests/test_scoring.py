@@ -0,0 +1,18 @@
+import pandas as pd
+
+from scoring import ATTRIBUTE_BITS, attribute_flags
+
+def _flags(name, description=''):
+    return int(attribute_flags(pd.DataFrame({'name': [name], 'description': [description]}))[0])
+
+def test_keywords_match_whole_words_only():
+    local = ATTRIBUTE_BITS['local']
+    assert _flags('Bluetooth tracker', 'Shows your location on a map') & local == 0
+    assert _flags('Keyboard', 'Supports every locale') & local == 0
+    assert _flags('Honey', 'Sourced from local farms') & local
+    assert _flags('Tea', 'Made in India, sourced locally') & local
+
+def test_groups_combine_and_ignore_case():
+    flags = _flags('HANDMADE Bamboo Basket', None)
+    assert flags == ATTRIBUTE_BITS['handmade'] | ATTRIBUTE_BITS['eco_friendly']
+    assert _flags('Artisanal cheese board') & ATTRIBUTE_BITS['handmade'] == 0
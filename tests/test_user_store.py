@@ -0,0 +1,52 @@
+import pytest
+
+from user_store import MemoryUserStore, SQLiteUserStore, UserStore
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryUserStore()
+    return SQLiteUserStore(str(tmp_path / 'users.db'))
+
+def test_interface_is_abstract():
+    with pytest.raises(TypeError):
+        UserStore()
+
+    class Partial(UserStore):
+        def get_wishlist(self, user_id):
+            return []
+
+    with pytest.raises(TypeError):
+        Partial()
+
+def test_wishlist_is_an_ordered_set(store):
+    assert store.add_to_wishlist('u1', ['a', 'b', 'a']) == ['a', 'b']
+    assert store.add_to_wishlist('u1', ['c', 'b']) == ['a', 'b', 'c']
+    assert store.remove_from_wishlist('u1', ['b', 'missing']) == ['a', 'c']
+    assert store.get_wishlists(['u1', 'u2']) == {'u1': ['a', 'c'], 'u2': []}
+
+def test_cart_adds_quantities(store):
+    assert store.add_to_cart('u1', {'a': 1, 'b': 2}) == {'a': 1, 'b': 2}
+    assert store.add_to_cart('u1', {'a': 2}) == {'a': 3, 'b': 2}
+    assert store.remove_from_cart('u1', ['b']) == {'a': 3}
+    assert store.get_carts(['u1']) == {'u1': {'a': 3}}
+
+def test_write_on_another_connection_invalidates_the_cache(tmp_path):
+    path = str(tmp_path / 'users.db')
+    here, elsewhere = SQLiteUserStore(path), SQLiteUserStore(path)
+    here.add_to_wishlist('u1', ['a'])
+    assert elsewhere.get_wishlist('u1') == ['a']
+    assert elsewhere.get_cart('u1') == {}
+    # Both are now cached on the second connection; writes on the first must still show up
+    here.add_to_wishlist('u1', ['b'])
+    here.add_to_cart('u1', {'a': 2})
+    assert elsewhere.get_wishlist('u1') == ['a', 'b']
+    assert elsewhere.get_cart('u1') == {'a': 2}
+    version = elsewhere.version()
+    here.remove_from_wishlist('u1', ['a'])
+    assert elsewhere.version() != version
+    assert elsewhere.get_wishlist('u1') == ['b']
+    # Its own writes don't move its version
+    version = here.version()
+    here.add_to_wishlist('u2', ['c'])
+    assert here.version() == version
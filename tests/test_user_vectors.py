@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from user_store import SQLiteUserStore
+
+@pytest.fixture
+def stores(service, monkeypatch, tmp_path):
+    """Two SQLite stores on one file, as two workers would open it; the service uses the first"""
+    path = str(tmp_path / 'users.db')
+    here, elsewhere = SQLiteUserStore(path), SQLiteUserStore(path)
+    monkeypatch.setattr(service, 'get_user_store', lambda: here)
+    return here, elsewhere
+
+def _direction(service, rows):
+    vector = service.product_embeddings[rows].astype(np.float32).mean(axis=0)
+    return vector / np.linalg.norm(vector)
+
+def test_write_from_another_worker_invalidates_vectors(service, stores):
+    _, elsewhere = stores
+    first, second = service.product_catalog.product_ids([0, 1])
+    service._add_to_wishlist('ana', [first])
+    assert np.allclose(service._user_vector('ana'), _direction(service, [0]), atol=1e-2)
+
+    elsewhere.remove_from_wishlist('ana', [first])
+    elsewhere.add_to_wishlist('ana', [second])
+    assert np.allclose(service._user_vector('ana'), _direction(service, [1]), atol=1e-2)
+
+def test_users_without_history_are_cached(service, stores, monkeypatch):
+    here, _ = stores
+    reads = []
+    get_wishlist = here.get_wishlist
+    monkeypatch.setattr(here, 'get_wishlist', lambda user_id: reads.append(user_id) or get_wishlist(user_id))
+    for _ in range(3):
+        assert service._user_vector('new-user') is None
+    assert reads == ['new-user']
+
+    service._add_to_wishlist('new-user', service.product_catalog.product_ids([2]))
+    assert np.allclose(service._user_vector('new-user'), _direction(service, [2]), atol=1e-2)
+
+def test_non_positive_cart_quantities_are_ignored(service, stores):
+    here, _ = stores
+    first, second = service.product_catalog.product_ids([3, 4])
+    here.add_to_cart('bo', {first: -2, second: 1})
+    assert np.allclose(service._user_vector('bo'), _direction(service, [4]), atol=1e-2)
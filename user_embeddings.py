@@ -0,0 +1,156 @@
+"""
+Per-user preference vectors for personalised retrieval
+
+Each active user gets a running centroid of the embeddings of the products
+they wishlisted or added to the cart (cart adds weigh more, per unit). An
+event updates the centroid in O(dim) without touching the rest of the
+history: new = (w * old + sum(w_i * e_i)) / (w + sum(w_i)). The service
+blends the centroid into the encoded query, so personalisation costs one
+vector add rather than an extra encode.
+
+Centroids live in one float16 matrix indexed through a slot table, about
+768 bytes per user at 384 dimensions. Users idle for longer than
+USER_VECTOR_TTL seconds, or the least recently active once
+USER_VECTOR_CAPACITY is reached, are evicted; their vectors are rebuilt
+from the wishlist/cart store the next time they are needed. Users without
+history keep a zero-weight slot, so they are not rebuilt on every request.
+Vectors are per process: sync() drops them all when the store reports a
+commit from another worker (UserStore.version), and they are rebuilt on
+next use.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import numpy as np
+
+USER_VECTOR_CAPACITY = int(os.getenv('USER_VECTOR_CAPACITY', '100000'))
+USER_VECTOR_TTL = float(os.getenv('USER_VECTOR_TTL', str(7 * 24 * 3600)))
+USER_BLEND_WEIGHT = float(os.getenv('USER_BLEND_WEIGHT', '0.3'))
+EVENT_WEIGHTS = {"wishlist": 1.0, "cart": 2.0}
+INITIAL_SLOTS = 1024
+
+class UserEmbeddings:
+    """Running centroids keyed by user id, in least-recently-active order"""
+
+    def __init__(self, dim: int, capacity: int = USER_VECTOR_CAPACITY, ttl: float = USER_VECTOR_TTL):
+        self.dim = dim
+        self.capacity = capacity
+        self.ttl = ttl
+        size = min(INITIAL_SLOTS, capacity)
+        self.vectors = np.zeros((size, dim), dtype=np.float16)
+        self.weights = np.zeros(size, dtype=np.float32)
+        self.slots: OrderedDict = OrderedDict()  # user_id -> slot, oldest activity first
+        self.last_active: Dict[str, float] = {}
+        self.free = list(range(size - 1, -1, -1))
+        self.store_version = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.slots
+
+    def _touch(self, user_id: str):
+        self.slots.move_to_end(user_id)
+        self.last_active[user_id] = time.monotonic()
+
+    def _release(self, user_id: str):
+        slot = self.slots.pop(user_id)
+        self.last_active.pop(user_id, None)
+        self.weights[slot] = 0
+        self.free.append(slot)
+
+    def _evict_inactive(self):
+        cutoff = time.monotonic() - self.ttl
+        while self.slots:
+            user_id = next(iter(self.slots))
+            if self.last_active[user_id] >= cutoff:
+                break
+            self._release(user_id)
+
+    def _allocate(self, user_id: str) -> int:
+        self._evict_inactive()
+        if not self.free:
+            size = len(self.vectors)
+            if size < self.capacity:
+                grown = min(size * 2, self.capacity)
+                self.vectors = np.concatenate([self.vectors, np.zeros((grown - size, self.dim), dtype=np.float16)])
+                self.weights = np.concatenate([self.weights, np.zeros(grown - size, dtype=np.float32)])
+                self.free = list(range(grown - 1, size - 1, -1))
+            else:
+                self._release(next(iter(self.slots)))
+        slot = self.free.pop()
+        self.slots[user_id] = slot
+        self.vectors[slot] = 0
+        self.weights[slot] = 0
+        return slot
+
+    def add(self, user_id: str, product_vectors: np.ndarray, weight: float = 1.0):
+        """Fold product embeddings into the user's centroid, each with the given weight"""
+        product_vectors = np.asarray(product_vectors, dtype=np.float32).reshape(-1, self.dim)
+        if not len(product_vectors) or weight <= 0:
+            return
+        with self.lock:
+            slot = self.slots.get(user_id)
+            if slot is None:
+                slot = self._allocate(user_id)
+            old_weight = float(self.weights[slot])
+            added = weight * len(product_vectors)
+            centroid = (old_weight * self.vectors[slot].astype(np.float32) + weight * product_vectors.sum(axis=0)) / (old_weight + added)
+            self.vectors[slot] = centroid
+            self.weights[slot] = old_weight + added
+            self._touch(user_id)
+
+    def rebuild(self, user_id: str, product_vectors: np.ndarray, weights: np.ndarray):
+        """Replace the centroid with a weighted mean computed from scratch; an empty history keeps a zero-weight slot"""
+        weights = np.asarray(weights, dtype=np.float32)
+        with self.lock:
+            if user_id in self.slots:
+                self._release(user_id)
+            slot = self._allocate(user_id)
+            total = float(weights.sum())
+            if total > 0:
+                self.vectors[slot] = (weights[:, None] * np.asarray(product_vectors, dtype=np.float32)).sum(axis=0) / total
+                self.weights[slot] = total
+            self._touch(user_id)
+
+    def sync(self, store_version):
+        """Drop every vector if the store changed version since the last call"""
+        with self.lock:
+            if store_version != self.store_version:
+                for user_id in list(self.slots):
+                    self._release(user_id)
+                self.store_version = store_version
+
+    def get(self, user_id: str) -> Optional[np.ndarray]:
+        """The user's unit-length preference vector, or None if they have no active history"""
+        with self.lock:
+            slot = self.slots.get(user_id)
+            if slot is None or self.weights[slot] <= 0:
+                return None
+            self._touch(user_id)
+            vector = self.vectors[slot].astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else None
+
+    def discard(self, user_id: str):
+        with self.lock:
+            if user_id in self.slots:
+                self._release(user_id)
+
+    def stats(self) -> Dict:
+        with self.lock:
+            return {"users": len(self.slots), "slots": len(self.vectors), "bytes": int(self.vectors.nbytes + self.weights.nbytes)}
+
+def blend(query_vectors: np.ndarray, user_vector: Optional[np.ndarray], weight: float = USER_BLEND_WEIGHT) -> np.ndarray:
+    """Mix a unit-length user vector into unit-length query vectors"""
+    if user_vector is None or weight <= 0:
+        return query_vectors
+    query_vectors = np.asarray(query_vectors, dtype=np.float32)
+    query_vectors = query_vectors / np.maximum(np.linalg.norm(query_vectors, axis=-1, keepdims=True), 1e-12)
+    return (1 - weight) * query_vectors + weight * user_vector
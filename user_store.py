@@ -0,0 +1,255 @@
+"""
+Wishlist and cart storage behind a small pluggable interface
+
+USER_STORE_URL picks the backend:
+
+    sqlite:///user_store.db    (default) SQLite in WAL mode, shared by every
+                               worker process on the host
+    memory://                  process-local dicts, for tests and single-worker dev
+
+Wishlists are sets of product ids and carts map product ids to quantities;
+both keep insertion order. The SQLite backend keys rows on (user_id,
+product_id), so adds are idempotent upserts rather than list scans, and
+caches reads per user. Writes from this process update the cache directly;
+writes from other processes are detected with PRAGMA data_version, which
+changes whenever another connection commits, and drop the whole cache.
+"""
+
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from metrics import record_cache
+
+USER_STORE_URL = os.getenv('USER_STORE_URL', 'sqlite:///user_store.db')
+USER_STORE_CACHE_SIZE = int(os.getenv('USER_STORE_CACHE_SIZE', '10000'))
+
+class UserStore(ABC):
+    """Interface shared by the backends; every method takes a user id and returns that user's new state"""
+
+    @abstractmethod
+    def get_wishlist(self, user_id: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def add_to_wishlist(self, user_id: str, product_ids: Iterable[str]) -> List[str]:
+        ...
+
+    @abstractmethod
+    def remove_from_wishlist(self, user_id: str, product_ids: Iterable[str]) -> List[str]:
+        ...
+
+    @abstractmethod
+    def get_cart(self, user_id: str) -> Dict[str, int]:
+        ...
+
+    @abstractmethod
+    def add_to_cart(self, user_id: str, items: Dict[str, int]) -> Dict[str, int]:
+        """Increase quantities, adding products not yet in the cart"""
+        ...
+
+    @abstractmethod
+    def remove_from_cart(self, user_id: str, product_ids: Iterable[str]) -> Dict[str, int]:
+        ...
+
+    def get_wishlists(self, user_ids: Iterable[str]) -> Dict[str, List[str]]:
+        return {user_id: self.get_wishlist(user_id) for user_id in user_ids}
+
+    def version(self) -> int:
+        """Changes whenever another process commits; constant for backends that are not shared"""
+        return 0
+
+    def get_carts(self, user_ids: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        return {user_id: self.get_cart(user_id) for user_id in user_ids}
+
+class MemoryUserStore(UserStore):
+    """Dict-backed store; state is per process and lost on restart"""
+
+    def __init__(self):
+        self.wishlists: Dict[str, Dict[str, None]] = {}
+        self.carts: Dict[str, Dict[str, int]] = {}
+        self.lock = threading.Lock()
+
+    def get_wishlist(self, user_id: str) -> List[str]:
+        with self.lock:
+            return list(self.wishlists.get(user_id, {}))
+
+    def add_to_wishlist(self, user_id: str, product_ids: Iterable[str]) -> List[str]:
+        with self.lock:
+            wishlist = self.wishlists.setdefault(user_id, {})
+            for product_id in product_ids:
+                wishlist[product_id] = None
+            return list(wishlist)
+
+    def remove_from_wishlist(self, user_id: str, product_ids: Iterable[str]) -> List[str]:
+        with self.lock:
+            wishlist = self.wishlists.get(user_id, {})
+            for product_id in product_ids:
+                wishlist.pop(product_id, None)
+            return list(wishlist)
+
+    def get_cart(self, user_id: str) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.carts.get(user_id, {}))
+
+    def add_to_cart(self, user_id: str, items: Dict[str, int]) -> Dict[str, int]:
+        with self.lock:
+            cart = self.carts.setdefault(user_id, {})
+            for product_id, quantity in items.items():
+                cart[product_id] = cart.get(product_id, 0) + quantity
+            return dict(cart)
+
+    def remove_from_cart(self, user_id: str, product_ids: Iterable[str]) -> Dict[str, int]:
+        with self.lock:
+            cart = self.carts.get(user_id, {})
+            for product_id in product_ids:
+                cart.pop(product_id, None)
+            return dict(cart)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wishlist_items (
+    user_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, product_id)
+);
+CREATE TABLE IF NOT EXISTS cart_items (
+    user_id TEXT NOT NULL,
+    product_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    PRIMARY KEY (user_id, product_id)
+);
+"""
+
+class SQLiteUserStore(UserStore):
+    """SQLite (WAL) store with a per-user read cache kept coherent across processes"""
+
+    def __init__(self, path: str, cache_size: int = USER_STORE_CACHE_SIZE):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One connection per process, serialised by a lock; statements take microseconds
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5.0)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.cache_size = cache_size
+        self.cache: OrderedDict = OrderedDict()  # (kind, user_id) -> list or dict
+        self.data_version = self._read_data_version()
+
+    def _read_data_version(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _sync(self):
+        """Drop the cache if another process committed since our last look; caller holds the lock"""
+        version = self._read_data_version()
+        if version != self.data_version:
+            self.cache.clear()
+            self.data_version = version
+
+    def _cached(self, kind: str, user_id: str):
+        """Cached value, or None after a miss; caller holds the lock"""
+        self._sync()
+        value = self.cache.get((kind, user_id))
+        record_cache(f"user_{kind}", value is not None)
+        if value is not None:
+            self.cache.move_to_end((kind, user_id))
+        return value
+
+    def _store(self, kind: str, user_id: str, value):
+        self.cache[(kind, user_id)] = value
+        self.cache.move_to_end((kind, user_id))
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _load_wishlist(self, user_id: str) -> List[str]:
+        rows = self.conn.execute(
+            "SELECT product_id FROM wishlist_items WHERE user_id = ? ORDER BY rowid", (user_id,))
+        return [product_id for (product_id,) in rows]
+
+    def _load_cart(self, user_id: str) -> Dict[str, int]:
+        rows = self.conn.execute(
+            "SELECT product_id, quantity FROM cart_items WHERE user_id = ? ORDER BY rowid", (user_id,))
+        return {product_id: quantity for product_id, quantity in rows}
+
+    def _write(self, kind: str, user_id: str, statement: str, params: List[tuple]):
+        """Run a write in one transaction and refresh this user's cache entry"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany(statement, params)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        # Our own commit doesn't bump data_version, so this only catches other writers
+        self._sync()
+        value = self._load_wishlist(user_id) if kind == 'wishlist' else self._load_cart(user_id)
+        self._store(kind, user_id, value)
+        return value
+
+    def version(self) -> int:
+        with self.lock:
+            self._sync()
+            return self.data_version
+
+    def get_wishlist(self, user_id: str) -> List[str]:
+        with self.lock:
+            value = self._cached('wishlist', user_id)
+            if value is None:
+                value = self._load_wishlist(user_id)
+                self._store('wishlist', user_id, value)
+            return list(value)
+
+    def add_to_wishlist(self, user_id: str, product_ids: Iterable[str]) -> List[str]:
+        with self.lock:
+            return list(self._write('wishlist', user_id,
+                                    "INSERT OR IGNORE INTO wishlist_items (user_id, product_id) VALUES (?, ?)",
+                                    [(user_id, product_id) for product_id in product_ids]))
+
+    def remove_from_wishlist(self, user_id: str, product_ids: Iterable[str]) -> List[str]:
+        with self.lock:
+            return list(self._write('wishlist', user_id,
+                                    "DELETE FROM wishlist_items WHERE user_id = ? AND product_id = ?",
+                                    [(user_id, product_id) for product_id in product_ids]))
+
+    def get_cart(self, user_id: str) -> Dict[str, int]:
+        with self.lock:
+            value = self._cached('cart', user_id)
+            if value is None:
+                value = self._load_cart(user_id)
+                self._store('cart', user_id, value)
+            return dict(value)
+
+    def add_to_cart(self, user_id: str, items: Dict[str, int]) -> Dict[str, int]:
+        with self.lock:
+            return dict(self._write('cart', user_id,
+                                    "INSERT INTO cart_items (user_id, product_id, quantity) VALUES (?, ?, ?) "
+                                    "ON CONFLICT (user_id, product_id) DO UPDATE SET quantity = quantity + excluded.quantity",
+                                    [(user_id, product_id, quantity) for product_id, quantity in items.items()]))
+
+    def remove_from_cart(self, user_id: str, product_ids: Iterable[str]) -> Dict[str, int]:
+        with self.lock:
+            return dict(self._write('cart', user_id,
+                                    "DELETE FROM cart_items WHERE user_id = ? AND product_id = ?",
+                                    [(user_id, product_id) for product_id in product_ids]))
+
+def open_user_store(url: str = USER_STORE_URL) -> UserStore:
+    if url == 'memory://':
+        return MemoryUserStore()
+    if url.startswith('sqlite:///'):
+        return SQLiteUserStore(url[len('sqlite:///'):])
+    raise ValueError(f"Unsupported USER_STORE_URL: {url}")
+
+_store: Optional[UserStore] = None
+_store_lock = threading.Lock()
+
+def get_user_store() -> UserStore:
+    """The process-wide store, opened on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = open_user_store()
+    return _store